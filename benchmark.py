@@ -0,0 +1,186 @@
+import pandas as pd
+import numpy as np
+import contextlib
+import tracemalloc
+import argparse
+import tempfile
+import shutil
+import time
+import io
+import os
+import util as ut
+import krx
+import raw_data as rt
+from fake_krx import FakeKrxServer
+
+
+# 벤치마크용 가상 데이터 생성
+
+def make_month_end(months=240, n_symbols=2500, seed=0):
+    """month_end 테이블과 같은 형태의 가상 데이터 (월말 영업일 x 종목)"""
+    rng = np.random.default_rng(seed)
+    dates = pd.date_range('2000-01-01', periods=months, freq='BME')
+    symbols = pd.Series(np.arange(n_symbols)).map('{:05d}0'.format)
+    sectors = np.array(['전기전자', '화학', '서비스업', '의약품', '운수장비', '유통업', '철강금속', '기계'])
+
+    base_dt = np.repeat(dates.strftime('%Y%m%d'), n_symbols)
+    data = pd.DataFrame({'base_mt': np.repeat((dates.to_period('M') + 1).strftime('%Y-%m'), n_symbols),
+                         'base_dt': base_dt,
+                         'sym_cd': np.tile(symbols, months),
+                         'sym_nm': np.tile('종목' + symbols, months),
+                         'mkt_cd': rng.choice(['KOSPI', 'KOSDAQ'], len(base_dt)),
+                         'sec_krx': rng.choice(sectors, len(base_dt)),
+                         'mkt_cap': rng.integers(10 ** 9, 10 ** 13, len(base_dt)),
+                         'ksp_200': rng.random(len(base_dt)) < 0.1,
+                         'ksq_bc': rng.random(len(base_dt)) < 0.05,
+                         'inv_com': False,
+                         'sym_obj': rng.random(len(base_dt)) < 0.9})
+    return data
+
+
+def make_daily(days=1250, n_symbols=2500, seed=0):
+    """daily 테이블과 같은 형태의 가상 데이터 (영업일 x 종목)"""
+    rng = np.random.default_rng(seed)
+    dates = pd.bdate_range('2016-01-01', periods=days)
+    symbols = pd.Series(np.arange(n_symbols)).map('{:05d}0'.format)
+    n = days * n_symbols
+    data = pd.DataFrame({'base_dt': np.repeat(dates.strftime('%Y%m%d'), n_symbols),
+                         'sym_cd': np.tile(symbols, days),
+                         'close': rng.integers(1000, 10 ** 6, n),
+                         'volume': rng.integers(0, 10 ** 7, n),
+                         'ret': rng.normal(0, 0.02, n)})
+    return data
+
+
+# 저장소 백엔드 비교
+
+def _timeit(func):
+    start = time.perf_counter()
+    result = func()
+    return time.perf_counter() - start, result
+
+
+def _disk_size(path):
+    if os.path.isfile(path):
+        return os.path.getsize(path)
+    return sum(os.path.getsize(os.path.join(d, f)) for d, _, files in os.walk(path) for f in files)
+
+
+def bench_storage(tables=None, repeat=3):
+    """
+    DbTools(HDF5)와 ArrowTools(Parquet / Arrow IPC) 백엔드의 쓰기/읽기 시간과 디스크 크기를 비교
+
+    Parameters
+    ----------
+    tables : dict, optional
+        {테이블명: 데이터프레임}. 생략하면 month_end(20년)와 daily(5년) 가상 데이터를 사용
+    repeat : int
+        읽기 시간 측정 반복 횟수 (최소값을 사용)
+
+    Returns
+    -------
+    pd.DataFrame
+    """
+    tables = tables if tables else {'month_end': make_month_end(), 'daily': make_daily()}
+    tmp = tempfile.mkdtemp()
+    backends = {'hdf': lambda table: ut.DbTools('bench_' + table, path=tmp + '/'),
+                'parquet': lambda table: ut.ArrowTools('bench_pq', 'parquet', 'year', path=tmp),
+                'arrow': lambda table: ut.ArrowTools('bench_ipc', 'arrow', 'year', path=tmp)}
+    result = []
+
+    try:
+        for name, data in tables.items():
+            start, end = data.base_dt.iloc[len(data) // 2], data.base_dt.iloc[-1]
+            query = f'base_dt >= "{start}" & base_dt <= "{end}"'
+
+            for backend, make in backends.items():
+                db = make(name)
+                t_put, _ = _timeit(lambda: db.put(name, data))
+                t_all = min(_timeit(lambda: db.read(name))[0] for _ in range(repeat))
+                t_col = min(_timeit(lambda: db.read(name, ['sym_cd', 'base_dt']))[0] for _ in range(repeat))
+                t_rng = min(_timeit(lambda: db.read(name, query=query))[0] for _ in range(repeat))
+                t_last = min(_timeit(lambda: db.read(name, 'base_dt', start=-1))[0] for _ in range(repeat))
+                path = db.path if backend == 'hdf' else db._dir(name)
+                result.append({'table': name, 'backend': backend, 'rows': len(data),
+                               'put(s)': t_put, 'read_all(s)': t_all, 'read_cols(s)': t_col,
+                               'read_range(s)': t_rng, 'read_last(s)': t_last,
+                               'size(MB)': _disk_size(path) / 2 ** 20})
+    finally:
+        shutil.rmtree(tmp, ignore_errors=True)
+
+    return pd.DataFrame(result)
+
+
+# 스크래핑 처리량 비교 (로컬 KRX 대역 서버 사용)
+
+def _scrape(date_range, workers):
+    # 진행 메시지를 숨기고 get_month_end_table 실행 (지수 목록은 실행마다 새로 조회됨)
+    with contextlib.redirect_stdout(io.StringIO()):
+        return rt.get_month_end_table(date_range, workers)
+
+
+def bench_scraping(date_range=None, workers=(1, 4, 8), latency=0.05, error_rate=0.0, memory=True):
+    """
+    로컬 KRX 대역 서버(fake_krx)를 상대로 get_month_end_table의 순차/동시 스크래핑 성능을 비교.
+    응답 캐시는 끄고 실행하며, 요청 속도 제한도 두지 않음
+
+    Parameters
+    ----------
+    date_range : str or list, optional
+        workdays_offset의 입력 형식 (생략하면 1년치 월말)
+    workers : tuple of int
+        비교할 동시 처리 수 (1은 순차 처리)
+    latency : float
+        대역 서버의 응답 지연(초)
+    error_rate : float
+        대역 서버의 503 오류 비율 (재시도 비용 측정용)
+    memory : bool
+        True이면 tracemalloc으로 최대 메모리를 따로 한 번 더 측정 (시간 측정과 분리)
+
+    Returns
+    -------
+    pd.DataFrame
+    """
+    date_range = date_range if date_range else ['2020-01', '2020-12']
+    session, mode = krx.session, krx.cache.mode
+    result = []
+
+    try:
+        krx.cache.mode = 'off'
+        with FakeKrxServer(latency=latency, error_rate=error_rate) as server:
+            for n in workers:
+                krx.session = krx.KrxSession(urls=server.urls, rate=None, backoff=0.01, pool_size=max(n, 1) * 2)
+                start_requests = server.requests
+                elapsed, data = _timeit(lambda: _scrape(date_range, n))
+                requests = server.requests - start_requests
+                stats = krx.session.stats()
+
+                peak = np.nan
+                if memory:
+                    tracemalloc.start()
+                    _scrape(date_range, n)
+                    peak = tracemalloc.get_traced_memory()[1] / 2 ** 20
+                    tracemalloc.stop()
+
+                result.append({'workers': n, 'dates': data.base_dt.nunique(), 'rows': len(data),
+                               'requests': requests, 'wall(s)': elapsed, 'req/s': requests / elapsed,
+                               'p50_latency(s)': stats['p50'].median(), 'peak_mem(MB)': peak})
+                krx.session.close()
+    finally:
+        krx.session, krx.cache.mode = session, mode
+
+    return pd.DataFrame(result)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='저장소 / 스크래핑 성능 비교')
+    parser.add_argument('suite', nargs='?', choices=['storage', 'scraping', 'all'], default='all')
+    parser.add_argument('--latency', type=float, default=0.05, help='스크래핑: 대역 서버 응답 지연(초)')
+    parser.add_argument('--error-rate', type=float, default=0.0, help='스크래핑: 503 오류 비율')
+    args = parser.parse_args()
+
+    pd.set_option('display.width', 200)
+    if args.suite in ['storage', 'all']:
+        print(bench_storage().round(3).to_string(index=False))
+    if args.suite in ['scraping', 'all']:
+        print(bench_scraping(latency=args.latency, error_rate=args.error_rate).round(3).to_string(index=False))
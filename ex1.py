@@ -1,45 +1,177 @@
 import sys
+import threading
+import traceback
+from concurrent.futures import ThreadPoolExecutor
 from PyQt5.QtWidgets import *
+from PyQt5.QtCore import QObject, QRunnable, QThreadPool, pyqtSignal
 from PyQt5 import uic
 import util as ut
 import pandas as pd
 import raw_data as rd
-from gtabview import view
+import krx
+import viewer
 
 raw = ut.DbTools('inp_raw')
 form_class = uic.loadUiType("./ui_form/ex1.ui")[0]
 
 
+# 스크래핑 작업 (백그라운드 스레드에서 실행되며, 단위 작업마다 progress로 진행상황을 알리고 cancelled를 확인)
+
+def scrap_holidays(years, progress, cancelled):
+    frames = []
+    for year, holidays in zip(years, rd.iter_holidays(years)):
+        frames.append(holidays)
+        progress(f'- {year}년 휴장일 {len(holidays)}일')
+        if cancelled():
+            return None
+    return pd.concat(frames, ignore_index=True).to_frame('h_day')
+
+
+def scrap_month_end(month, progress, cancelled, workers=4):
+    # 월말 영업일이 하나뿐이므로 날짜 사이뿐 아니라 하루치의 하위 요청(산업분류/지수/투자회사) 사이에서도 취소를 확인
+    frames = []
+    workdays = list(ut.workdays_offset(month, freq='ME').strftime('%Y%m%d'))
+    run = krx.RunCache()
+    with ThreadPoolExecutor(workers) as pool, krx.session.fanout(workers):
+        for date in workdays:
+            data = krx.get_symbols_data_by_date(date, pool, cancelled, run)
+            if data is None:
+                return None
+            frames.append(data)
+            progress(f'- {date} 종목 {len(data)}개')
+            if cancelled():
+                return None
+    return pd.concat(frames, ignore_index=True) if frames else pd.DataFrame()
+
+
+class WorkerSignals(QObject):
+    # 작업 스레드에서 보내면 GUI 스레드의 이벤트 루프에서 받음 (tbox 갱신 등은 GUI 스레드에서만 가능)
+    progress = pyqtSignal(str, str)
+    result = pyqtSignal(str, object)
+    error = pyqtSignal(str, str)
+    finished = pyqtSignal(str)
+
+
+class Worker(QRunnable):
+    """
+    QThreadPool에서 func(*args, progress=, cancelled=)를 실행하는 작업.
+    실행이 끝나면 스레드 풀이 지우므로(autoDelete) Form은 작업 객체 대신 signals와 취소 이벤트(cancel_event)만 보관하고,
+    취소는 cancel_event로 요청하며 작업 함수가 단위 작업(연도, 하위 요청)을 마칠 때마다 확인해서 중단함
+    """
+
+    def __init__(self, name, func, *args):
+        super().__init__()
+        self.name = name
+        self.func = func
+        self.args = args
+        self.signals = WorkerSignals()
+        self.cancel_event = threading.Event()
+
+    def run(self):
+        signals, cancel = self.signals, self.cancel_event
+        try:
+            data = self.func(*self.args, progress=lambda text: signals.progress.emit(self.name, text),
+                             cancelled=cancel.is_set)
+            if not cancel.is_set():
+                signals.result.emit(self.name, data)
+        except Exception:
+            signals.error.emit(self.name, traceback.format_exc(limit=3))
+        finally:
+            signals.finished.emit(self.name)
+
+
 class Form(QDialog, form_class):
 
     def __init__(self):
         super().__init__()
         self.setupUi(self)
+        self.cancelButton.setEnabled(False)
         self.show()
         self._holidays = None
         self._stock_info = None
         self._returns = None
 
+        # 체크된 스크래핑 작업들은 서로 다른 스레드에서 동시에 실행
+        self.pool = QThreadPool(self)
+        self.pool.setMaxThreadCount(2)
+        # 실행 중인 작업별 (signals, 취소 이벤트). finished를 받을 때까지 signals를 보관함
+        self._jobs = {}
+
     def scrap_data(self):
+        if self._jobs:
+            return
         year = pd.Timestamp.today().year
-        month = pd.Timestamp.today().month
+        month = pd.Timestamp.today().strftime('%Y-%m')
 
         if self.ckb1.isChecked():
             self.tbox.append(f'{year}년 이후 KRX 휴장일 정보 스크래핑')
-            self._holidays = rd.get_holidays_table(year)
-            self.tbox.append('- 종료!')
+            self._start(Worker('휴장일', scrap_holidays, [year]))
 
         if self.ckb2.isChecked():
-            self.tbox.append(f'{year}-{month}월 KRX 종목 정보 스크래핑')
-            self._stock_info = rd.get_month_end_table(f'{year}-{month}')
-            self.tbox.append('- 종료!')
+            self.tbox.append(f'{month}월 KRX 종목 정보 스크래핑')
+            self._start(Worker('종목정보', scrap_month_end, month))
+
+        if self._jobs:
+            self.pushButton.setEnabled(False)
+            self.cancelButton.setEnabled(True)
+
+    def _start(self, worker):
+        worker.signals.progress.connect(self.on_progress)
+        worker.signals.result.connect(self.on_result)
+        worker.signals.error.connect(self.on_error)
+        worker.signals.finished.connect(self.on_finished)
+        self._jobs[worker.name] = (worker.signals, worker.cancel_event)
+        self.pool.start(worker)
+
+    def cancel_scrap(self):
+        for _, cancel in self._jobs.values():
+            cancel.set()
+        if self._jobs:
+            self.tbox.append('- 중지 요청 (진행 중인 요청까지 마친 후 중지)')
+            self.cancelButton.setEnabled(False)
+
+    def on_progress(self, name, text):
+        self.tbox.append(f'[{name}] {text}')
+
+    def on_result(self, name, data):
+        if name == '휴장일':
+            self._holidays = data
+        elif name == '종목정보':
+            self._stock_info = data
+        self.tbox.append(f'[{name}] 종료!')
+
+    def on_error(self, name, message):
+        self.tbox.append(f'[{name}] 오류\n{message}')
+
+    def on_finished(self, name):
+        job = self._jobs.pop(name, None)
+        if job is not None and job[1].is_set():
+            self.tbox.append(f'[{name}] 중지됨')
+        if not self._jobs:
+            self.pushButton.setEnabled(True)
+            self.cancelButton.setEnabled(False)
+
+    def closeEvent(self, event):
+        # 창을 닫으면 진행 중인 작업을 중지하고 스레드가 끝날 때까지 기다림
+        self.cancel_scrap()
+        self.pool.waitForDone()
+        super().closeEvent(event)
 
     def view_data(self):
+        # 스크래핑 결과가 있으면 그 데이터를, 없으면 DB에 저장된 테이블을 쪽 단위로 읽어서 보여줌
         view_text = self.vbox.currentText()
-        view_dict = {'휴장일': self._holidays,
-                     '종목정보': self._stock_info,
-                     '수익률': self._returns}
-        view(view_dict[view_text], recycle=False, title=view_text)
+        view_dict = {'휴장일': (self._holidays, 'holidays'),
+                     '종목정보': (self._stock_info, 'month_end'),
+                     '수익률': (self._returns, 'returns')}
+        if view_text not in view_dict:
+            return
+        data, table = view_dict[view_text]
+        if data is not None:
+            viewer.view(data, title=view_text, parent=self)
+        elif '/' + table in raw.tables:
+            viewer.view(raw, table, title=f'{view_text} ({table})', parent=self)
+        else:
+            self.tbox.append(f'{view_text}: 스크래핑 결과와 저장된 {table} 테이블이 없습니다')
         # raw.remove('holidays', f'h_day>="{year}"')
         # raw.append('holidays', holidays_current_year)
 
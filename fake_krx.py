@@ -0,0 +1,229 @@
+import numpy as np
+import threading
+import argparse
+import random
+import json
+import time
+import zlib
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qsl, urlsplit
+
+
+# KRX 사이트를 흉내 내는 로컬 HTTP 서버 (krx.py / raw_data.py 스크래핑의 오프라인 테스트 및 벤치마크용)
+
+SECTORS = ['음식료·담배', '섬유·의류', '종이·목재', '제약', '비금속', '금속', '기계·장비', '일반전기전자',
+           '의료·정밀기기', '운송장비·부품', '기타제조', '전기·가스·수도', '건설', '유통', '숙박·음식', '운송',
+           '금융', '기타서비스', '오락·문화', '통신서비스', '인터넷', '소프트웨어', '반도체', 'IT부품']
+
+INDICES = [('1001', '001', '코스피'), ('1028', '028', '코스피 200'), ('1034', '034', '코스피 100'),
+           ('1035', '035', '코스피 50'), ('2001', '001', '코스닥'), ('2203', '203', '코스닥 150'),
+           ('2181', '181', '코스닥 우량기업부'), ('2182', '182', '코스닥 벤처기업부')]
+
+# 투자회사 화면(bld)별로 해당 종목을 고르는 간격
+INVESTMENT_BLD = {'MDCSTAT02901': 97, 'MDCSTAT02801': 89, 'MDCSTAT03001': 83}
+
+
+class FakeKrxServer:
+    """
+    data.krx.co.kr(getJsonData.cmd), open.krx.co.kr(OPN99000001.jspx, GenerateOTP.jspx)와 같은 경로와
+    응답 형식을 제공하는 로컬 서버. 같은 요청에는 항상 같은 응답을 주며(날짜별 난수 시드),
+    응답 지연과 오류(503) 비율을 설정할 수 있음
+
+    Examples
+    --------
+    >>> with FakeKrxServer(latency=0.05) as server:
+    ...     krx.session = krx.KrxSession(urls=server.urls, rate=None)
+    ...     data = krx.get_symbols_data(['20210129'])
+    """
+
+    def __init__(self, n_stk=950, n_ksq=1550, latency=0.0, jitter=0.0, error_rate=0.0, port=0, seed=0):
+        """
+        Parameters
+        ----------
+        n_stk, n_ksq : int
+            유가증권 / 코스닥 종목 수
+        latency : float
+            응답마다 추가하는 지연시간(초)
+        jitter : float
+            지연시간에 더하는 0 ~ jitter초의 무작위 지연
+        error_rate : float
+            503 오류로 응답하는 요청의 비율 (0 ~ 1)
+        port : int
+            0이면 사용 가능한 포트를 자동으로 선택
+        seed : int
+            응답 데이터 생성용 난수 시드
+        """
+        self.n_stk = n_stk
+        self.n_ksq = n_ksq
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.seed = seed
+        self.requests = 0
+        self.errors = 0
+        self._lock = threading.Lock()
+        self._random = random.Random(seed)
+        self._symbols = self._make_symbols()
+        self.httpd = ThreadingHTTPServer(('127.0.0.1', port), self._handler())
+        self.httpd.daemon_threads = True
+        self._thread = None
+
+    @property
+    def url(self):
+        return f'http://127.0.0.1:{self.httpd.server_port}'
+
+    @property
+    def urls(self):
+        """krx.KrxSession(urls=...)에 그대로 넣을 수 있는 사이트별 주소"""
+        return {'data': self.url + '/comm/bldAttendant/getJsonData.cmd',
+                'open': self.url + '/contents/OPN/99/OPN99000001.jspx',
+                'otp': self.url + '/contents/COM/GenerateOTP.jspx'}
+
+    def start(self):
+        self._thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    # 응답 데이터 생성
+
+    def _make_symbols(self):
+        # 시장별 종목 목록 (보통주는 끝자리 0, 우선주는 5, 일부는 스팩)
+        rng = np.random.default_rng(self.seed)
+        symbols = {}
+        for mkt, n, start in [('STK', self.n_stk, 0), ('KSQ', self.n_ksq, 10000)]:
+            codes = [f'{start + i + 1:05d}' + ('5' if i % 15 == 14 else '0') for i in range(n)]
+            names = [(f'스팩{i}호' if i % 40 == 39 else f'종목{code}') + ('우' if code[-1] == '5' else '')
+                     for i, code in enumerate(codes)]
+            symbols[mkt] = {'codes': codes, 'names': names,
+                            'sectors': rng.choice(SECTORS, n), 'shares': rng.integers(10 ** 6, 10 ** 9, n)}
+        return symbols
+
+    def _rng(self, *key):
+        return np.random.default_rng([self.seed, zlib.crc32(repr(key).encode())])
+
+    @staticmethod
+    def _fmt(values):
+        return [f'{v:,}' for v in values]
+
+    def _sector(self, mkt, date):
+        sym = self._symbols[mkt]
+        rng = self._rng('sector', mkt, date)
+        close = rng.integers(1000, 500000, len(sym['codes']))
+        change = rng.integers(-5000, 5000, len(sym['codes']))
+        rate = np.char.mod('%.2f', change / close * 100)
+        mkt_name = 'KOSPI' if mkt == 'STK' else 'KOSDAQ'
+        return [{'ISU_SRT_CD': code, 'ISU_ABBRV': name, 'MKT_TP_NM': mkt_name, 'IDX_IND_NM': str(sector),
+                 'TDD_CLSPRC': c, 'CMPPREVDD_PRC': d, 'FLUC_RT': str(r), 'MKTCAP': m,
+                 'FLUC_TP_CD': '2' if d.startswith('-') else '1'}
+                for code, name, sector, c, d, r, m in zip(sym['codes'], sym['names'], sym['sectors'],
+                                                          self._fmt(close), self._fmt(change), rate,
+                                                          self._fmt(close * sym['shares']))]
+
+    def _index_members(self, index, date):
+        mkt, n = ('STK', 200) if index.startswith('1') else ('KSQ', 300)
+        sym = self._symbols[mkt]
+        rng = self._rng('index', index, date)
+        picked = np.sort(rng.choice(len(sym['codes']), min(n, len(sym['codes'])), replace=False))
+        return [{'ISU_SRT_CD': sym['codes'][i], 'ISU_ABBRV': sym['names'][i],
+                 'TDD_CLSPRC': f'{int(rng.integers(1000, 500000)):,}', 'FLUC_TP_CD': '1'} for i in picked]
+
+    def _investment(self, bld, date):
+        sym = self._symbols['STK']
+        step = INVESTMENT_BLD[bld]
+        return [{'ISU_SRT_CD': sym['codes'][i], 'ISU_NM': sym['names'][i] + '투자회사', 'LIST_DD': date}
+                for i in range(step - 1, len(sym['codes']), step)]
+
+    @staticmethod
+    def _holidays(year):
+        days = [f'{year}-01-01', f'{year}-03-01', f'{year}-05-05', f'{year}-06-06', f'{year}-08-15',
+                f'{year}-10-03', f'{year}-10-09', f'{year}-12-25', f'{year}-12-31']
+        days = [d for d in days if np.is_busday(np.datetime64(d))]
+        return [{'calnd_dd': d, 'kr_dy_tp': '', 'dy_tp_cd': '', 'holdy_nm': '휴장일'} for d in days]
+
+    def respond(self, path, params):
+        """요청 경로와 파라미터에 대한 응답 (상태코드, 본문 bytes)"""
+        if path.endswith('GenerateOTP.jspx'):
+            return 200, ''.join(self._random.choices('abcdefghijklmnopqrstuvwxyz0123456789', k=64)).encode()
+
+        if path.endswith('OPN99000001.jspx'):
+            body = {'block1': self._holidays(params.get('search_bas_yy', '2021'))}
+        elif path.endswith('getJsonData.cmd'):
+            bld = params.get('bld', '').rsplit('/', 1)[-1]
+            date = params.get('trdDd', '')
+            if bld == 'finder_equidx':
+                body = {'block1': [{'full_code': f, 'short_code': s, 'codeName': n, 'marketCode': f[0]}
+                                   for f, s, n in INDICES]}
+            elif bld == 'MDCSTAT03901':
+                body = {'OutBlock_1': self._sector(params.get('mktId', 'STK'), date)}
+            elif bld == 'MDCSTAT00601':
+                body = {'output': self._index_members(params.get('indIdx', '1028'), date)}
+            elif bld in INVESTMENT_BLD:
+                body = {'output': self._investment(bld, date)}
+            else:
+                return 400, b'unknown bld'
+            body['CURRENT_DATETIME'] = '2021.01.29 PM 04:36:50'
+        else:
+            return 404, b'not found'
+        return 200, json.dumps(body, ensure_ascii=False).encode()
+
+    def _handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def _reply(self, params):
+                with server._lock:
+                    server.requests += 1
+                    delay = server.latency + server._random.random() * server.jitter
+                    fail = server._random.random() < server.error_rate
+                    server.errors += fail
+                if delay:
+                    time.sleep(delay)
+                try:
+                    status, body = (503, b'service unavailable') if fail else \
+                        server.respond(urlsplit(self.path).path, params)
+                except Exception as e:
+                    status, body = 500, repr(e).encode()
+                self.send_response(status)
+                self.send_header('Content-Type', 'application/json; charset=UTF-8')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def do_GET(self):
+                self._reply(dict(parse_qsl(urlsplit(self.path).query)))
+
+            def do_POST(self):
+                length = int(self.headers.get('Content-Length', 0))
+                self._reply(dict(parse_qsl(self.rfile.read(length).decode())))
+
+            def log_message(self, *args):
+                pass
+
+        return Handler
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='로컬 KRX 대역 서버')
+    parser.add_argument('--port', type=int, default=8800)
+    parser.add_argument('--latency', type=float, default=0.0)
+    parser.add_argument('--error-rate', type=float, default=0.0)
+    args = parser.parse_args()
+
+    fake = FakeKrxServer(latency=args.latency, error_rate=args.error_rate, port=args.port)
+    print(f'{fake.url} 에서 KRX 대역 서버 실행 중 (종료: Ctrl+C)')
+    try:
+        fake.httpd.serve_forever()
+    except KeyboardInterrupt:
+        fake.httpd.server_close()
@@ -1,203 +1,310 @@
 import pandas as pd
+import functools
 import util as ut
+import perf
 import input.krx as krx
 import input.fn as fn
 import input.raw_data as rt
 import input.derive as derive
 import input.factor as factor
+import input.planner as planner
+import input.pipeline as pipeline
+import input.sharding as sharding
 
-# HDF5 DB 접근 객체 생성
-raw = ut.DbTools('inp_raw')
-pre = ut.DbTools('inp_preprocess')
+# HDF5 DB 접근 객체 생성 (삭제/교체로 생긴 빈 공간이 파일의 30% 이상이면 갱신 작업이 끝난 뒤 maintain에서 repack)
+raw = ut.DbTools('inp_raw', compact=True, profile='zstd', repack_threshold=0.3)
+pre = ut.DbTools('inp_preprocess', compact=True, profile='zstd', repack_threshold=0.3)
+
+
+# 원천데이터/파생데이터 테이블 생성 단계 그래프 (서로 의존하지 않는 단계는 동시에 실행)
+
+# 종목별 시계열 원천데이터 테이블과 생성 함수
+raw_table_funcs = {'daily': rt.get_daily_table, 'quarterly': rt.get_quarterly_table,
+                   'quarterly_prv': rt.get_quarterly_prv_table, 'annual': rt.get_annual_table,
+                   'returns': rt.get_returns_table}
+
+
+def _quarterly_prep(df_q, df_q_prv, add=False):
+    # 종목별로 나누어 여러 프로세스에서 계산 (결과는 한 프로세스에서 계산한 것과 같음)
+    return sharding.run_sharded(derive.get_quarterly_prep_table, [df_q, df_q_prv], add=add)
+
+
+def _annual_prep(df_y, df_q, df_q_prv):
+    return sharding.run_sharded(derive.get_annual_prep_table, [df_y, df_q, df_q_prv])
+
+
+def _store_month_end(date_range):
+    # 월말별로 스크래핑하는 대로 저장하며, 중단된 경우 다시 실행하면 이어서 진행
+    return rt.store_month_end_table(raw, date_range)
+
+
+def _object_symbols(month_end):
+    # month_end 테이블에 저장된 분석대상 종목 (종목 등록부 사용)
+    return planner.CrawlPlanner(raw).object_symbols()
+
+
+def _filter_factors(*tables):
+    # 원천/파생 테이블이 모두 저장된 뒤 DB에서 읽어서 생성
+    return factor.get_filter_factors_table(None)
+
+
+def _update_month_end(month):
+    # 같은 달을 다시 실행해도 행이 중복되지 않도록 해당 월의 기존 행을 교체
+    month_end_updated = rt.get_month_end_table(month)
+    raw.upsert('month_end', month_end_updated, ['base_mt', 'sym_cd'], scope=f'base_mt = "{month}"')
+    return month_end_updated
+
+
+def _split_symbols(month_end):
+    # 새롭게 크롤링된 종목들을 종목별 테이블(daily)에 이미 있는 유지종목과 신규종목으로 구분
+    symbols = month_end.loc[month_end.sym_obj, 'sym_cd']
+    return planner.CrawlPlanner(raw).split_symbols(symbols, 'daily')
+
+
+def _quarter_month(month):
+    # 5월에는 4월 기준으로 분기 자료를 가져옴 (5월의 경우 전분기(1Q)와 전전분기(4Q)를 다 가져와야함)
+    return month[:5] + '04' if month[5:] == '05' else month
+
+
+def _update_table(table, month, symbols):
+    """
+    종목별 원천데이터 테이블 하나를 월초에 갱신
+
+    Parameters
+    ----------
+    table : str
+        'daily', 'quarterly', 'quarterly_prv', 'annual'
+    month : str
+        MP적용월 (yyyy-mm)
+    symbols : (pd.Series, pd.Series)
+        (유지종목, 신규종목)
+
+    Returns
+    -------
+    int (저장한 행 수)
+    """
+    symbols_remain, symbols_new = symbols
+    rows = 0
+
+    # 중단된 뒤 다시 실행해도 행이 중복되지 않도록 모두 upsert로 저장
+    # 1) 유지종목 : 최근 데이터만 업데이트
+    #  - 일간 : 지난달 한달치 (DB에서 삭제할꺼 없음), 분기_확정 : 1, 5, 7, 10월,
+    #  - 분기_잠정 : 1, 7, 10월 외 (기존 행 교체), 연간 : 5월
+    updated = {'daily': True,
+               'quarterly': month[5:] in ['01', '05', '07', '10'],
+               'quarterly_prv': month[5:] not in ['01', '07', '10'],
+               'annual': month[5:] == '05'}[table]
+    if updated:
+        base_month = month if table in ['daily', 'annual'] else _quarter_month(month)
+        data = raw_table_funcs[table](base_month, symbols_remain, offset=0)
+        if table == 'quarterly_prv':
+            # 유지종목의 갱신 분기 이후 잠정 자료는 새로 가져온 자료에 없더라도 모두 교체
+            update_q = ut.date_offset(base_month, True, 'Q')[0]
+            raw.upsert(table, data, ['sym_cd', 'base_dt'],
+                       scope=f'sym_cd in {symbols_remain.to_list()} & base_dt >= "{update_q}"')
+        else:
+            raw.upsert(table, data, ['sym_cd', 'base_dt'])
+        rows += len(data)
+
+    # 2) 신규종목 : 모든 기간 업데이트
+    if symbols_new.shape[0] > 0:
+        date_range = [raw.first(table, 'base_dt'), raw.last(table, 'base_dt')]
+        data = raw_table_funcs[table](date_range, symbols_new, offset=0, last=False)
+        raw.upsert(table, data, ['sym_cd', 'base_dt'], scope=f'sym_cd in {symbols_new.to_list()}')
+        rows += len(data)
+    return rows
+
+
+def _update_quarterly_prep(month, *tables):
+    # 전월말 기준으로 전분기 자료(DB에서 삭제)
+    month = _quarter_month(month)
+    update_q_prv = ut.date_offset(month, True, 'Q', 0)[0]
+    offset_det = 3 if month[5:] == '04' else 2
+    update_q_det = ut.date_offset(month, False, 'Q', offset_det)[0]
+    start = ut.date_offset(update_q_det, False, 'Q', '1Y')[0]
+    df_q = raw.read('quarterly', query=f'base_dt >= "{start}"').reset_index(drop=True)
+    df_q_prv = raw.read('quarterly_prv', query=f'base_dt >= "{start}"').reset_index(drop=True)
+
+    df_q_prep = _quarterly_prep(df_q, df_q_prv)
+    if month in ['01', '05', '07', '10']:
+        start = update_q_det[:6]
+    else:
+        start = update_q_prv[:6]
+    df_q_prep = df_q_prep[(df_q_prep.quarter >= start)].copy()
+    pre.upsert('quarterly_prep', df_q_prep, ['sym_cd', 'quarter'], scope=f'quarter >= "{start}"')
+    return len(df_q_prep)
+
+
+def _update_annual_prep(month, *tables):
+    # 2~5월(전월말이 1~4월)의 경우에 전년말 자료(DB에서 삭제)
+    if not '02' <= month[5:] <= '05':
+        return 0
+    update_y_1 = ut.date_offset(month, True, 'Y', 0)[0]
+    update_y_2 = ut.date_offset(month, True, 'Y', 1)[0]
+    update_y_3 = ut.date_offset(month, True, 'Y', 2)[0]
+    df_q = raw.read('quarterly', query=f'base_dt = "{update_y_1}" | base_dt = "{update_y_2}"')\
+        .reset_index(drop=True)
+    df_q_prv = raw.read('quarterly_prv', query=f'base_dt = "{update_y_1}" | base_dt = "{update_y_2}"') \
+        .reset_index(drop=True)
+    df_y = raw.read('annual', query=f'base_dt >= "{update_y_3}" & base_dt <= "{update_y_1}"')\
+        .reset_index(drop=True)
+
+    df_y_prep = _annual_prep(df_y, df_q, df_q_prv)
+    df_y_prep = df_y_prep[df_y_prep.year == update_y_1[:4]].copy()
+    pre.upsert('annual_prep', df_y_prep, ['sym_cd', 'year'], scope=f'quarter >= "{update_y_1[:4]}"')
+    return len(df_y_prep)
+
+
+def _update_filter_factors(month, *tables):
+    df_uni_fac = factor.get_filter_factors_table(month)
+    pre.upsert('filter_factors', df_uni_fac, ['base_dt', 'sym_cd'])
+    return len(df_uni_fac)
+
+
+def raw_data_graph(incremental=False, workers=4):
+    """
+    원천/파생 테이블 생성 단계들의 의존 관계 그래프.
+    최초 적재와 월초 증분 갱신이 같은 구성(month_end → symbols → 종목별 원천 테이블 → 파생 테이블)을 사용하고
+    단계 함수와 저장 방식만 다름. symbols에만 의존하는 원천 테이블들은 동시에 스크래핑하며,
+    실패한 뒤 같은 입력값으로 다시 실행하면 끝나지 않은 단계부터 진행함
+
+    Parameters
+    ----------
+    incremental : bool
+        False - 최초 적재 (입력값: date_range, holidays_start). 단계 결과를 테이블로 put
+        True - 월초 증분 갱신 (입력값: month). 단계마다 upsert까지 처리하므로 다시 실행해도 행이 중복되지 않음
+        (returns, holidays 제외)
+    workers : int
+        동시에 실행할 최대 단계 수
+
+    Returns
+    -------
+    pipeline.Pipeline
+    """
+    if incremental:
+        pipe = pipeline.Pipeline('update_raw_data', workers)
+        pipe.add('month_end', _update_month_end, ['month'])
+        pipe.add('symbols', _split_symbols, ['month_end'])
+        for table in ['daily', 'quarterly', 'quarterly_prv', 'annual']:
+            pipe.add(table, functools.partial(_update_table, table), ['month', 'symbols'])
+        pipe.add('quarterly_prep', _update_quarterly_prep, ['month', 'quarterly', 'quarterly_prv'])
+        pipe.add('annual_prep', _update_annual_prep, ['month', 'annual', 'quarterly', 'quarterly_prv'])
+        pipe.add('filter_factors', _update_filter_factors, ['month', 'daily', 'quarterly_prep', 'annual_prep'])
+        return pipe
+
+    pipe = pipeline.Pipeline('initial_raw_data', workers)
+    pipe.add('holidays', rt.get_holidays_table, ['holidays_start'], store=functools.partial(raw.put, 'holidays'))
+    pipe.add('month_end', _store_month_end, ['date_range'])
+    pipe.add('symbols', _object_symbols, ['month_end'])
+    for table, func in raw_table_funcs.items():
+        pipe.add(table, func, ['date_range', 'symbols'], store=functools.partial(raw.put, table))
+    pipe.add('quarterly_prep', _quarterly_prep, ['quarterly', 'quarterly_prv'],
+             store=functools.partial(pre.put, 'quarterly_prep'))
+    pipe.add('annual_prep', _annual_prep, ['annual', 'quarterly', 'quarterly_prv'],
+             store=functools.partial(pre.put, 'annual_prep'))
+    pipe.add('filter_factors', _filter_factors, ['holidays', 'daily', 'returns', 'quarterly_prep', 'annual_prep'],
+             store=functools.partial(pre.put, 'filter_factors'))
+    return pipe
 
 
 # 원천데이터/파생데이터 관련 함수 (get, update, add)
-def get_initial_raw_data(date_range):
+def get_initial_raw_data(date_range, workers=4):
     """
     원천 데이터의 최초 적재 및 전처리를 통한 파생 데이터 생성 함수.
     6개 원천데이터 테이블(holidays, month_end, daily, quarterly, annual, returns)와
-    2개의 파생데이터 테이블(quarterly_prep, annual_prep)을 생성함
+    2개의 파생데이터 테이블(quarterly_prep, annual_prep)을 생성함.
+    테이블 간 의존 관계에 따라 서로 무관한 테이블은 동시에 생성하며(raw_data_graph),
+    중간에 실패한 경우 같은 date_range로 다시 실행하면 실패한 단계부터 이어서 진행함
 
     Parameters
     ----------
     date_range : list [str, str]
         MP적용월 기준으로 적재하려는 기간을 ['시작연월(yyyy-mm)','종료연월(yyyy-mm)'] 형태의 리스트로 입력
+    workers : int
+        동시에 생성할 최대 테이블 수
     """
 
-    # 1. 2000년 이후 holidays 테이블 생성
+    # holidays 테이블은 2009년 이후 휴장일로 생성
     #  - 실제 KRX에서는 2009년 이후 휴장일만 정확히 제공하고 있음
     #  - 2000년~2008년 휴장일은 별도 조사후 수동으로 추가했음...
+    raw_data_graph(workers=workers).run(date_range=date_range, holidays_start=2009)
+    raw.maintain()
+    pre.maintain()
 
-    df_h = rt.get_holidays_table(2009)
-    # df_h_2 = 수동조사한 휴장일
-    # df_h = df_h_2.append(df_h)
-    raw.put('holidays', df_h)
-
-    # 2. month_end 테이블 생성
-    df_me, symbols = rt.get_month_end_table(date_range)
-    raw.put('month_end', df_me)
-
-    # 3. daily 테이블 생성
-    df_d = rt.get_daily_table(date_range, symbols)
-    raw.put('daily', df_d)
-
-    # 4. quarterly 테이블 생성
-    df_q = rt.get_quarterly_table(date_range, symbols)
-    raw.put('quarterly', df_q)
-
-    # 5. quarterly_prv 테이블 생성
-    df_q_prv = rt.get_quarterly_prv_table(date_range, symbols)
-    raw.put('quarterly_prv', df_q_prv)
-
-    # 6. annual 테이블 생성
-    df_y = rt.get_annual_table(date_range, symbols)
-    raw.put('annual', df_y)
-
-    # 4. returns 테이블 생성
-    df_r = rt.get_returns_table(date_range, symbols)
-    raw.put('returns', df_r)
 
-    # 5. quarterly_prep 테이블 생성 - 분기 데이터 전처리(파생 데이터 생성)
-    df_q_prep = derive.get_quarterly_prep_table(df_q, df_q_prv)
-    pre.put('quarterly_prep', df_q_prep)
-
-    # 6. annual_prep 테이블 생성 - 연간 데이터 전처리(파생 데이터 생성)
-    df_y_prep = derive.get_annual_prep_table(df_y, df_q, df_q_prv)
-    pre.put('annual_prep', df_y_prep)
-
-    # 7. filter_factors 테이블 생성 - 유니버스 선별기준 및 팩터 전처리
-    df_uni_fac = factor.get_filter_factors_table(None)
-    pre.put('filter_factors', df_uni_fac)
+def update_raw_data(month=None, trace=None):
+    """
+    원천/파생 데이터 갱신 (휴장일, 월초 원천/파생 테이블, 매일 수익률)
 
+    Parameters
+    ----------
+    month : str, optional
+        MP적용월 (yyyy-mm, 기본값은 이번 달)
+    trace : str, optional
+        주어지면 KRX 요청, DbTools 호출, 단계별 소요시간과 최대 메모리를 계측해서
+        이 경로에 Chrome trace 파일로 저장하고 요약표를 출력
+    """
+    if trace:
+        perf.enable(memory=True)
+        try:
+            return update_raw_data(month)
+        finally:
+            perf.export(trace)
+            print(perf.summary().round(3).to_string(index=False))
+            perf.disable()
+            perf.reset()
 
-def update_raw_data(month=None):
     today = pd.Timestamp.today().strftime('%Y%m%d')
-    year = today[:4]
     month = month if month else pd.Timestamp.today().strftime('%Y-%m')
 
-    # 1. 휴장일 정보(매일)
-    holidays_current_year = rt.get_holidays_table(year)
-    raw.remove('holidays', f'h_day>="{year}"')
-    raw.append('holidays', holidays_current_year)
+    # 저장된 데이터와 비교해 필요한 요청만 계획 (저장값 조회 결과는 갱신 작업 동안 재사용)
+    plan = planner.CrawlPlanner(raw)
+
+    # 1. 휴장일 정보 (저장되지 않은 연도, 올해는 마지막 갱신 후 일주일이 지난 경우에만)
+    with raw.session():
+        for holiday_year in plan.holiday_years():
+            holidays_updated = rt.get_holidays_table(holiday_year, [holiday_year])
+            raw.upsert('holidays', holidays_updated, ['h_day'],
+                       scope=f'h_day>="{holiday_year}" & h_day<"{holiday_year + 1}"')
 
     # 2. 월말, 일간, 분기(확정/잠정), 연간 및 파생데이터 테이블 업데이트(매월 초)
-    last_update_month = raw.read('month_end', 'base_mt', start=-1).iloc[0]
-    if last_update_month >= month:
+    #  - 최초 적재와 같은 단계 그래프를 증분 갱신용 단계로 실행 (중간에 실패한 달은 남은 단계부터 이어서 진행)
+    #  - 단계의 완료 표시가 DB 반영 이후에 기록되도록 그래프 실행 동안에는 세션을 열어두지 않음
+    graph = raw_data_graph(incremental=True)
+    status = graph.status(month=month)
+    last_update_month = raw.last('month_end', 'base_mt')
+    if all(status.values()) or (last_update_month > month and not any(status.values())):
         print(month+"까지 원천데이터 업데이트가 이미 완료됐습니다")
-        pass
 
     else:
-        # 2-1) month_end 테이블 추가
-        month_end_updated, symbols = rt.get_month_end_table(month)
-        symbols_saved = raw.read('month_end', ['sym_cd'], 'sym_obj = "True"').sym_cd.drop_duplicates()
-        raw.append('month_end', month_end_updated)
-
-        # 2-2) 새롭게 크롤링된 종목들을 유지종목과 신규종목으로 구분
-        symbols_remain = symbols[symbols.isin(symbols_saved)]
-        symbols_new = symbols[~symbols.isin(symbols_saved)]
-
-        # 2-3) 유지종목(symbols_remain) : 최근 데이터만 업데이트
-
-        #  a) 일간 : 지난달 한달치 (DB에서 삭제할꺼 없음)
-        daily_updated = rt.get_daily_table(month, symbols_remain, offset=0)
-        raw.append('daily', daily_updated)
-
-        #  b) 분기_확정
-        if month[5:] in ['01', '05', '07', '10']:
-            if month[5:] == '05':
-                month = month[:5] + '04'
-            quarterly_updated = rt.get_quarterly_table(month, symbols_remain, offset=0)
-            raw.append('quarterly', quarterly_updated)
-
-        #  c) 분기_잠정
-        if month[5:] not in ['01', '07', '10']:
-            quarterly_prv_updated = rt.get_quarterly_prv_table(month, symbols_remain, offset=0)
-            update_q = ut.date_offset(month, True, 'Q')[0]
-            raw.remove('quarterly_prv', f'sym_cd in {symbols_remain.to_list()} & base_dt >= "{update_q}"')
-            raw.append('quarterly_prv', quarterly_prv_updated)
-
-        #  d) 연간
-        if month[5:] == '05':
-            annual_updated = rt.get_annual_table(month, symbols_remain, offset=0)
-            raw.append('annual', annual_updated)
-
-        # 2-4) 신규종목 : 모든 기간 업데이트
-        if symbols_new.shape[0] > 0:
-
-            table_dict = {'daily': rt.get_daily_table, 'quarterly': rt.get_quarterly_table,
-                          'quarterly_prv': rt.get_quarterly_prv_table, 'annual': rt.get_annual_table}
-            updated_new = {}
-
-            for table in table_dict.keys():
-                start = raw.read(table, 'base_dt', stop=1).iloc[0]
-                end = raw.read(table, 'base_dt', start=-1).iloc[0]
-                date_range = [start, end]
-                updated_new[table] = table_dict[table](date_range, symbols_new, offset=0, last=False)
-                raw.append(table, updated_new[table])
-
-        # 2-5) 파생데이터 업데이트
-
-        #   a) 분기간 : 전월말 기준으로 전분기 자료(DB에서 삭제), 5월의 경우 전분기(1Q)와 전전분기(4Q)를 다 가져와야함
-        update_q_prv = ut.date_offset(month, True, 'Q', 0)[0]
-        offset_det = 3 if month[5:] == '04' else 2
-        update_q_det = ut.date_offset(month, False, 'Q', offset_det)[0]
-        start = ut.date_offset(update_q_det, False, 'Q', '1Y')[0]
-        df_q = raw.read('quarterly', query=f'base_dt >= "{start}"').reset_index(drop=True)
-        df_q_prv = raw.read('quarterly_prv', query=f'base_dt >= "{start}"').reset_index(drop=True)
-
-        df_q_prep = derive.get_quarterly_prep_table(df_q, df_q_prv)
-        if month in ['01', '05', '07', '10']:
-            start = update_q_det[:6]
-        else:
-            start = update_q_prv[:6]
-        df_q_prep = df_q_prep[(df_q_prep.quarter >= start)].copy()
-        pre.remove('quarterly_prep', f'quarter >= "{start}"')
-        pre.append('quarterly_prep', df_q_prep)
-
-        #   b) 연간 : 2~5월(전월말이 1~4월)의 경우에 전년말 자료(DB에서 삭제)
-        if '02' <= month[5:] <= '05':
-            update_y_1 = ut.date_offset(month, True, 'Y', 0)[0]
-            update_y_2 = ut.date_offset(month, True, 'Y', 1)[0]
-            update_y_3 = ut.date_offset(month, True, 'Y', 2)[0]
-            df_q = raw.read('quarterly', query=f'base_dt = "{update_y_1}" | base_dt = "{update_y_2}"')\
-                .reset_index(drop=True)
-            df_q_prv = raw.read('quarterly_prv', query=f'base_dt = "{update_y_1}" | base_dt = "{update_y_2}"') \
-                .reset_index(drop=True)
-            df_y = raw.read('annual', query=f'base_dt >= "{update_y_3}" & base_dt <= "{update_y_1}"')\
-                .reset_index(drop=True)
-
-            df_y_prep = derive.get_annual_prep_table(df_y, df_q, df_q_prv)
-            df_y_prep = df_y_prep[df_y_prep.year == update_y_1[:4]].copy()
-            pre.remove('annual_prep', f'quarter >= "{update_y_1[:4]}"')
-            pre.append('annual_prep', df_y_prep)
-
-        # 2-6) 유니버스 선별기준 및 팩터 테이블 업데이트
-            df_uni_fac = factor.get_filter_factors_table(month)
-            pre.append('filter_factors', df_uni_fac)
+        graph.run(month=month)
 
     # 3. 종목/지수 수익률 테이블 (월초 원천데이터 업데이트 후 매일)
-    first_day = raw.read('returns', 'base_dt', stop=1).iloc[0]
-    last_update_day = raw.read('returns', 'base_dt', start=-1).iloc[0]
-    last_update_next_day = ut.all_workdays[ut.all_workdays.get_loc(last_update_day) + 1]
-    last_workday = ut.all_workdays[ut.all_workdays.get_loc(today) - 1]
+    with raw.session():
+        first_day = raw.first('returns', 'base_dt')
+        last_update_day = raw.last('returns', 'base_dt')
+        last_update_next_day = ut.calendar.shift(last_update_day, 1)
+        last_workday = ut.calendar.shift(today, -1, roll='forward')
 
-    if last_update_next_day.strftime('%Y%m%d') > last_workday.strftime('%Y%m%d'):
-        print(last_update_day+"까지 일별수익률 업데이트가 이미 완료됐습니다")
+        if last_update_next_day.strftime('%Y%m%d') > last_workday.strftime('%Y%m%d'):
+            print(last_update_day+"까지 일별수익률 업데이트가 이미 완료됐습니다")
 
-    else:
-        sym_saved_r = raw.read('returns', 'sym_cd').drop_duplicates()
-        sym_saved_me = raw.read('month_end', ['sym_cd'], 'sym_obj = "True"').sym_cd.drop_duplicates()
-        sym_saved = sym_saved_me[sym_saved_me.isin(sym_saved_r)]
-        sym_new = sym_saved_me[~sym_saved_me.isin(sym_saved_r)]
+        else:
+            sym_saved_me = plan.object_symbols()
+            sym_saved, sym_new = plan.split_symbols(sym_saved_me, 'returns')
+
+            date_range_saved = [last_update_next_day.strftime('%Y%m%d'), last_workday.strftime('%Y%m%d')]
+            ret = rt.get_returns_table(date_range_saved, sym_saved, 0)
+            raw.append('returns', ret)
 
-        date_range_saved = [last_update_next_day.strftime('%Y%m%d'), last_workday.strftime('%Y%m%d')]
-        ret = rt.get_returns_table(date_range_saved, sym_saved, 0)
-        raw.append('returns', ret)
+            if not sym_new.empty:
+                date_range_new = [first_day, last_workday.strftime('%Y%m%d')]
+                ret_new = rt.get_returns_table(date_range_new, sym_new, 0, False)
+                raw.append('returns', ret_new)
 
-        if not sym_new.empty:
-            date_range_new = [first_day, last_workday.strftime('%Y%m%d')]
-            ret_new = rt.get_returns_table(date_range_new, sym_new, 0, False)
-            raw.append('returns', ret_new)
+    # 4. 갱신으로 빈 공간이 많이 생긴 파일은 갱신 작업이 끝난 뒤 정리 (repack_threshold)
+    raw.maintain()
+    pre.maintain()
 
 
 def add_columns_to_raw_data():
@@ -207,26 +314,20 @@ def add_columns_to_raw_data():
     else:
         for table in add_item_list.groupby('테이블명_물리'):
             if table[0] == 'month_end':
-                month_end_saved = raw.read('month_end').reset_index(drop=True)
-                df_dt_sym = month_end_saved[month_end_saved.sym_obj][['base_dt', 'sym_cd']].copy()
+                df_dt_sym = raw.read('month_end', ['base_dt', 'sym_cd'], 'sym_obj = "True"').reset_index(drop=True)
                 month_end_new = fn.get_cross_section_data(df_dt_sym, add=True)
-                raw.put('month_end', month_end_saved.merge(month_end_new, how='left', on=['base_dt', 'sym_cd']))
+                raw.add_columns('month_end', month_end_new, on=['base_dt', 'sym_cd'])
             else:
-                ts_data_saved = raw.read(table[0])
-                start = ts_data_saved.base_dt.iloc[0]
-                end = ts_data_saved.base_dt.iloc[-1]
+                start = raw.first(table[0], 'base_dt')
+                end = raw.last(table[0], 'base_dt')
                 date_range = [start, end]
-                symbols = ts_data_saved.sym_cd.drop_duplicates()
+                symbols = raw.unique(table[0], 'sym_cd')
 
                 table_dict = {'daily': rt.get_daily_table, 'quarterly': rt.get_quarterly_table,
                               'quarterly_prv': rt.get_quarterly_prv_table, 'annual': rt.get_annual_table}
                 ts_data_new = table_dict[table[0]](date_range, symbols, offset=0, last=False)
-                ts_data_updated = ts_data_saved.merge(ts_data_new, how='left', on=['base_dt', 'sym_cd'])
-                raw.put(table[0], ts_data_updated)
+                raw.add_columns(table[0], ts_data_new, on=['base_dt', 'sym_cd'])
 
                 if table[0] == 'quarterly':
-                    quarterly_prep_new = derive.get_quarterly_prep_table(ts_data_new, None, add=True)
-                    quarterly_prep_saved = pre.read('quarterly_prep').reset_index(drop=True)
-                    quarterly_prep_added = quarterly_prep_saved.merge(quarterly_prep_new,
-                                                                      how='left', on=['sym_cd', 'quarter'])
-                    pre.put('quarterly_prep', quarterly_prep_added)
+                    quarterly_prep_new = _quarterly_prep(ts_data_new, None, add=True)
+                    pre.add_columns('quarterly_prep', quarterly_prep_new, on=['sym_cd', 'quarter'])
@@ -1,10 +1,354 @@
 import requests as req
 import pandas as pd
+import numpy as np
+import collections
+import contextlib
+import threading
+import shutil
 import functools
+import hashlib
+import gzip
+import json
 import time
+import os
+from concurrent.futures import ThreadPoolExecutor
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+import perf
 
+try:
+    import orjson
+    _loads = orjson.loads
+except ImportError:
+    _loads = json.loads
 
-def krx_req_post(site, params):
+
+# KRX 요청 세션 (연결 재사용, 타임아웃, 재시도, 요청 속도 제한, 엔드포인트별 응답시간 통계)
+
+class KrxSession:
+    """
+    data.krx.co.kr / open.krx.co.kr 요청에 공통으로 사용하는 세션.
+    같은 호스트로의 TCP 연결을 재사용(keep-alive)하고, 일시적인 오류(연결 실패, 429/5xx 응답)는
+    지수 백오프로 재시도하며, 초당 요청 수를 rate * 동시 요청 수(fanout으로 등록, 기본 1) 이하로 제한함
+    """
+
+    urls = {'data': 'http://data.krx.co.kr/comm/bldAttendant/getJsonData.cmd',
+            'open': 'http://open.krx.co.kr/contents/OPN/99/OPN99000001.jspx',
+            'otp': 'http://open.krx.co.kr/contents/COM/GenerateOTP.jspx'}
+    headers = {'User-Agent': "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) "
+                             "Chrome/89.0.4389.82 Safari/537.36 "}
+
+    def __init__(self, timeout=(5, 30), retries=5, backoff=0.5, rate=5, pool_size=10, urls=None):
+        """
+        Parameters
+        ----------
+        timeout : float or tuple
+            (연결, 응답) 타임아웃(초)
+        retries : int
+            일시적인 오류에 대한 최대 재시도 횟수
+        backoff : float
+            재시도 대기시간 계수 (backoff * 2 ** (재시도 횟수 - 1)초 대기)
+        rate : float
+            동시 요청 하나당 초당 최대 요청 수 (None이면 제한 없음). fanout으로 동시 요청 수를 등록하는 동안은
+            세션 전체 한도가 그 배수로 늘어남
+        pool_size : int
+            호스트별로 유지하는 연결 수
+        urls : dict, optional
+            사이트별 주소를 바꿀 때 사용 ({'data': ..., 'open': ..., 'otp': ...}, 테스트용 서버 등)
+        """
+        self.urls = dict(self.urls, **urls) if urls else self.urls
+        self.timeout = timeout
+        self.rate = rate
+        self.session = req.Session()
+        self.session.headers.update(self.headers)
+        retry = Retry(total=retries, backoff_factor=backoff, status_forcelist=[429, 500, 502, 503, 504],
+                      allowed_methods=['GET', 'POST'], respect_retry_after_header=True)
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=retry)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+
+        self._lock = threading.Lock()
+        self._next = 0.0
+        self._fanout = 0
+        self._latency = collections.defaultdict(list)
+        self._errors = collections.Counter()
+
+    def _throttle(self):
+        # 요청 시작 시각이 1 / rate초 간격이 되도록 대기 (여러 스레드가 같이 써도 간격 유지)
+        if not self.rate:
+            return
+        with self._lock:
+            now = time.monotonic()
+            start = max(now, self._next)
+            self._next = start + 1 / (self.rate * max(self._fanout, 1))
+        if start > now:
+            time.sleep(start - now)
+
+    @contextlib.contextmanager
+    def fanout(self, workers):
+        """
+        with 블록 동안 동시 요청 수 workers를 등록해서 요청 속도 한도를 rate * workers로 늘림
+        (여러 실행이 동시에 등록하면 합산)
+        """
+        with self._lock:
+            self._fanout += workers
+        try:
+            yield self
+        finally:
+            with self._lock:
+                self._fanout -= workers
+
+    def request(self, method, site, endpoint=None, **kwargs):
+        """
+        KRX 사이트로 요청을 보내고 응답(requests.Response)을 반환
+
+        Parameters
+        ----------
+        method : str
+            'GET' 또는 'POST'
+        site : str
+            'data', 'open', 'otp' 중 하나 (urls 참고)
+        endpoint : str, optional
+            응답시간 통계를 모을 이름 (생략하면 site)
+        kwargs :
+            requests.Session.request에 그대로 전달 (params, data 등)
+        """
+        endpoint = endpoint if endpoint else site
+        self._throttle()
+        with perf.span(endpoint, 'krx', site=site) as info:
+            start = time.perf_counter()
+            try:
+                res = self.session.request(method, self.urls[site], timeout=self.timeout, **kwargs)
+                res.raise_for_status()
+            except req.RequestException:
+                with self._lock:
+                    self._errors[endpoint] += 1
+                raise
+            with self._lock:
+                self._latency[endpoint].append(time.perf_counter() - start)
+            info['bytes'] = len(res.content)
+        return res
+
+    def stats(self):
+        """엔드포인트별 요청 수, 오류 수, 응답시간(초) 통계를 데이터프레임으로 반환"""
+        with self._lock:
+            latency = {k: np.array(v) for k, v in self._latency.items()}
+            errors = dict(self._errors)
+        rows = []
+        for endpoint in sorted(set(latency) | set(errors)):
+            lat = latency.get(endpoint, np.array([np.nan]))
+            rows.append({'endpoint': endpoint, 'count': len(latency.get(endpoint, [])),
+                         'errors': errors.get(endpoint, 0), 'mean': np.mean(lat), 'p50': np.median(lat),
+                         'p95': np.percentile(lat, 95), 'max': np.max(lat), 'total': np.sum(lat)})
+        cols = ['endpoint', 'count', 'errors', 'mean', 'p50', 'p95', 'max', 'total']
+        return pd.DataFrame(rows, columns=cols)
+
+    def reset_stats(self):
+        with self._lock:
+            self._latency.clear()
+            self._errors.clear()
+
+    def close(self):
+        self.session.close()
+
+
+# 모듈 전체에서 공유하는 세션 (설정을 바꾸려면 krx.session = krx.KrxSession(rate=2, ...)처럼 교체)
+session = KrxSession()
+
+
+class ResponseCache:
+    """
+    KRX 응답 원문(JSON)을 gzip으로 압축해 저장하는 디스크 캐시.
+    (site, 요청 파라미터)의 해시를 키로 사용하며, 매번 바뀌는 파라미터(OTP 코드, 타임스탬프)는 키에서 제외함.
+    과거 날짜의 응답은 바뀌지 않으므로 계속 사용하고, 최근 기간(recent_days 이내 또는 날짜 파라미터가 없는
+    요청)의 응답만 ttl초가 지나면 다시 요청함
+
+    mode
+        'on'     : 캐시에 있으면 사용, 없으면 요청 후 저장
+        'off'    : 캐시를 사용하지 않음
+        'replay' : 캐시에서만 응답 (네트워크 요청 없음, 캐시에 없으면 FileNotFoundError)
+    """
+
+    volatile = ['_', 'code']
+
+    # replay 모드에서 OTP 요청 대신 사용하는 코드
+    replay_otp = 'replay'
+    date_params = ['trdDd', 'search_bas_yy']
+
+    def __init__(self, path=None, mode=None, ttl=6 * 3600, recent_days=7):
+        self.path = path if path else os.path.dirname(__file__) + '/external_files/krx_cache/'
+        self.mode = mode if mode else os.environ.get('KRX_CACHE_MODE', 'on')
+        self.ttl = ttl
+        self.recent_days = recent_days
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def key(self, site, params):
+        """요청을 식별하는 해시 (파라미터 순서와 매번 바뀌는 파라미터는 무시)"""
+        params = {k: str(v) for k, v in params.items() if k not in self.volatile}
+        text = json.dumps([site, params], sort_keys=True, ensure_ascii=False)
+        return hashlib.sha1(text.encode()).hexdigest()
+
+    def file(self, site, params, empty=False):
+        # 결과가 빈 응답은 별도 파일로 저장하고 과거 날짜라도 ttl을 적용함 (일시적인 빈 응답이 계속 남지 않도록)
+        key = self.key(site, params)
+        return os.path.join(self.path, site, key[:2], key + ('.empty' if empty else '') + '.json.gz')
+
+    def _is_recent(self, params):
+        # 날짜 파라미터가 없거나 최근 기간에 해당하면 ttl을 적용할 요청
+        date = next((str(params[k]) for k in self.date_params if k in params), None)
+        if date is None:
+            return True
+        cutoff = time.strftime('%Y%m%d', time.localtime(time.time() - self.recent_days * 86400))
+        return date >= cutoff[:len(date)]
+
+    def get(self, site, params):
+        """캐시된 응답 원문(bytes). 없거나 만료됐으면 None (replay 모드는 만료를 무시)"""
+        file = self.file(site, params)
+        expires = self._is_recent(params)
+        if not os.path.isfile(file):
+            file, expires = self.file(site, params, empty=True), True
+            if not os.path.isfile(file):
+                return None
+        if self.mode != 'replay' and expires and time.time() - os.path.getmtime(file) > self.ttl:
+            return None
+        with open(file, 'rb') as f:
+            return gzip.decompress(f.read())
+
+    def put(self, site, params, content, empty=False):
+        file = self.file(site, params, empty)
+        os.makedirs(os.path.dirname(file), exist_ok=True)
+        # 동시에 같은 요청을 저장해도 깨진 파일이 남지 않도록 임시 파일에 쓴 뒤 교체
+        tmp = f'{file}.{os.getpid()}.{threading.get_ident()}.tmp'
+        with open(tmp, 'wb') as f:
+            f.write(gzip.compress(content))
+        os.replace(tmp, file)
+
+    def fetch(self, site, params, request, parse=None):
+        """
+        캐시에 있으면 캐시된 응답을, 없으면 request()로 받은 응답을 저장 후 반환
+
+        Parameters
+        ----------
+        site : str
+        params : dict
+        request : callable
+            실제 요청을 보내 응답 원문(bytes)을 반환하는 함수
+        parse : callable, optional
+            응답 원문을 변환하는 함수 (ex. parse_krx_json). 변환에 성공한 응답만 저장하며,
+            결과가 비어 있으면 과거 날짜라도 ttl이 지나면 다시 요청함
+
+        Returns
+        -------
+        bytes (parse가 주어지면 parse의 결과)
+        """
+        parse = parse if parse else (lambda content: content)
+        if self.mode == 'off':
+            return parse(request())
+
+        content = self.get(site, params)
+        with self._lock:
+            if content is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+        if content is not None:
+            return parse(content)
+        if self.mode == 'replay':
+            raise FileNotFoundError(f'replay 모드에서 캐시에 없는 요청입니다: {site} {params}')
+
+        # 과거 날짜의 응답은 만료되지 않으므로 오류 응답이 영구히 남지 않도록 변환이 끝난 뒤에 저장
+        content = request()
+        result = parse(content)
+        self.put(site, params, content, empty=not len(result))
+        return result
+
+    def clear(self):
+        """저장된 응답을 모두 삭제"""
+        shutil.rmtree(self.path, ignore_errors=True)
+
+
+# 모듈 전체에서 공유하는 응답 캐시 (오프라인 실행은 krx.cache.mode = 'replay' 또는 환경변수 KRX_CACHE_MODE=replay)
+cache = ResponseCache()
+
+
+class RunCache:
+    """
+    한 번의 실행(iter_symbols_data 등) 동안만 날짜와 무관한 조회 결과(지수 목록 등)를 재사용하는 캐시.
+    여러 스레드가 같은 키를 동시에 요청해도 잠금으로 한 번만 요청함
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._data = {}
+
+    def get(self, key, load):
+        """key의 값을 반환 (없으면 load()로 받아 보관)"""
+        with self._lock:
+            if key not in self._data:
+                self._data[key] = load()
+            return self._data[key]
+
+
+def _map(func, items, pool=None):
+    # pool이 주어지면 동시에 실행하되, 결과는 항상 입력 순서대로 반환
+    return list(pool.map(func, items)) if pool else [func(item) for item in items]
+
+
+def _imap(func, items, pool, ahead):
+    # pool.map과 같지만 최대 ahead개까지만 미리 실행하고, 결과를 입력 순서대로 하나씩 반환하는 제너레이터
+    futures = collections.deque()
+    for item in items:
+        futures.append(pool.submit(func, item))
+        if len(futures) >= ahead:
+            yield futures.popleft().result()
+    while futures:
+        yield futures.popleft().result()
+
+
+def _parse_numbers(values, dtype):
+    # '1,234' 형식의 숫자 문자열 목록 -> 숫자 배열 (정규식 없이 쉼표만 제거, 빈 값/'-'는 NaN)
+    values = [v.replace(',', '') if isinstance(v, str) else v for v in values]
+    try:
+        return np.array(values, dtype='U').astype(dtype)
+    except ValueError:
+        numbers = pd.to_numeric(pd.Series(values, dtype='object').replace({'': None, '-': None}), errors='coerce')
+        return numbers.to_numpy(dtype='float64' if numbers.isna().any() else dtype)
+
+
+def parse_krx_json(content, columns=None, dtypes=None):
+    """
+    KRX 응답 원문(JSON)을 데이터프레임으로 변환 (orjson이 설치되어 있으면 orjson으로 읽음)
+
+    Parameters
+    ----------
+    content : bytes or str
+        응답 원문. 첫 번째 키의 레코드 목록을 데이터프레임으로 만듦
+    columns : dict, optional
+        {원본 필드명: 새 컬럼명}. 주어지면 해당 필드만 순서대로 골라 이름을 바꿈 (생략하면 모든 필드)
+    dtypes : dict, optional
+        {새 컬럼명: 'int64' 또는 'float64'}. 쉼표가 들어간 숫자 문자열을 바로 숫자로 변환
+
+    Returns
+    -------
+    pd.DataFrame
+    """
+    res = _loads(content)
+    records = res[next(iter(res))]
+    if columns is None:
+        data = pd.DataFrame(records)
+        return data.astype(dtypes) if dtypes else data
+
+    dtypes = dtypes if dtypes else {}
+    data = {}
+    for field, name in columns.items():
+        values = [record.get(field) for record in records]
+        data[name] = _parse_numbers(values, dtypes[name]) if name in dtypes else values
+    return pd.DataFrame(data, columns=list(columns.values()))
+
+
+def krx_req_post(site, params, columns=None, dtypes=None):
     """
     krx 사이트에서 POST 요청을 통해 얻은 JSON 파일을 데이터프레임으로 반환
 
@@ -17,17 +361,18 @@ def krx_req_post(site, params):
     params : dict
         POST 요청 시 세부정보를 담은 딕셔너리
 
+    columns, dtypes : dict, optional
+        필요한 필드와 숫자형 변환 정보 (parse_krx_json 참고)
+
     Returns
     -------
     pd.DataFrame (데이터프레임 형식)
     """
 
-    url = {'data': 'http://data.krx.co.kr/comm/bldAttendant/getJsonData.cmd',
-           'open': 'http://open.krx.co.kr/contents/OPN/99/OPN99000001.jspx'}
-    res = req.post(url[site], data=params).json()
-    key = list(res.keys())[0]
-    data = pd.DataFrame(res[key])
-    return data
+    endpoint = params.get('bld', params.get('pagePath'))
+    return cache.fetch(site, params, lambda: session.request('POST', site, endpoint=f'{site}:{endpoint}',
+                                                             data=params).content,
+                       parse=lambda content: parse_krx_json(content, columns, dtypes))
 
 
 def krx_req_get(otp_params):
@@ -44,10 +389,13 @@ def krx_req_get(otp_params):
     str (문자열 형식)
 
     """
-    url = 'http://open.krx.co.kr/contents/COM/GenerateOTP.jspx'
-    headers = {'User-Agent': "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) "
-                "Chrome/89.0.4389.82 Safari/537.36 "}
-    otp_code = req.get(url, params=otp_params, headers=headers).text
+    # OTP는 일회용이므로 캐시하지 않음. replay 모드에서는 요청하지 않고 고정값을 사용
+    # (OTP 코드는 캐시 키에서 제외되므로(ResponseCache.volatile) 저장된 open 사이트 응답과 그대로 매칭됨)
+    if cache.mode == 'replay':
+        return cache.replay_otp
+    endpoint = otp_params.get('bld')
+    content = session.request('GET', 'otp', endpoint=f'otp:{endpoint}', params=otp_params).content
+    otp_code = content.decode()
     return otp_code
 
 
@@ -67,11 +415,13 @@ def get_holidays_from_krx(year):
     return holidays
 
 
-def get_krx_sector(date):
+def get_krx_sector(date, pool=None):
     """
     KRX정보데이터시스템(data.krx.co.kr) 기본통계 - 주식 - 세부안내 - [12025]업종분류현황
+    (pool이 주어지면 시장별 요청을 동시에 보내며, 진행 메시지는 출력하지 않음)
     """
-    print('KRX 산업분류기준 스크래핑 시작', end='...')
+    if pool is None:
+        print('KRX 산업분류기준 스크래핑 시작', end='...')
     sector_match = {'음식료·담배': '음식료품', '섬유·의류': '섬유의복', '종이·목재': '종이목재',
                     '출판·매체복제': '종이목재', '제약': '의약품', '비금속': '비금속광물', '금속': '철강금속',
                     '기계·장비': '기계', '일반전기전자': '전기전자', '의료·정밀기기': '의료정밀',
@@ -86,57 +436,70 @@ def get_krx_sector(date):
         params = {'bld': "dbms/MDC/STAT/standard/MDCSTAT03901",
                   'mktId': mkt,
                   'trdDd': date}
-        data = krx_req_post('data', params)
-        col = ['ISU_SRT_CD', 'ISU_ABBRV', 'MKT_TP_NM', 'IDX_IND_NM', 'MKTCAP']
-        col_new = ['sym_cd', 'sym_nm', 'mkt_cd', 'sec_krx', 'mkt_cap']
-        data = data[col].set_axis(col_new, axis=1)
+        columns = {'ISU_SRT_CD': 'sym_cd', 'ISU_ABBRV': 'sym_nm', 'MKT_TP_NM': 'mkt_cd',
+                   'IDX_IND_NM': 'sec_krx', 'MKTCAP': 'mkt_cap'}
+        data = krx_req_post('data', params, columns, {'mkt_cap': 'int64'})
         data['sec_krx'] = data.sec_krx.replace(sector_match)
-        return data.replace(',', '', regex=True).astype({'mkt_cap': 'int64'})
+        return data
 
-    df1 = read('STK')
-    df2 = read('KSQ')
-    print('종료!')
+    df1, df2 = _map(read, ['STK', 'KSQ'], pool)
+    if pool is None:
+        print('종료!')
     return pd.concat([df1, df2]).reset_index(drop=True)
 
 
-def get_symbols_in_index(date):
+def get_index_list(mktsel='1', run=None):
+    """
+    지수 검색(finder_equidx) 목록. 날짜와 무관한 정보이므로 run(RunCache)이 주어지면 그 실행 동안 한 번만 요청함
+    """
+    def load():
+        col = ['indIdx', 'indIdx2', 'tboxindIdx_finder_equidx0_2', 'codeNmindIdx_finder_equidx0_2']
+        idx_list = krx_req_post('data', {'bld': "dbms/comm/finder/finder_equidx", 'mktsel': mktsel})
+        return idx_list[['full_code', 'short_code', 'codeName', 'codeName']].set_axis(col, axis=1)
+
+    return run.get(('index_list', mktsel), load) if run is not None else load()
+
+
+def get_symbols_in_index(date, pool=None, run=None):
     """
     KRX정보데이터시스템(data.krx.co.kr) 기본통계 - 주식 - 세부안내 - [11006]지수구성종목
+    (pool이 주어지면 지수별 요청을 동시에 보내며, 진행 메시지는 출력하지 않음. run은 get_index_list 참고)
     """
-    print('코스피200/코스닥우량 지수 구성종목 정보 스크래핑 시작', end='...')
-    col = ['indIdx', 'indIdx2', 'tboxindIdx_finder_equidx0_2', 'codeNmindIdx_finder_equidx0_2']
-    idx_list = krx_req_post('data', {'bld': "dbms/comm/finder/finder_equidx", 'mktsel': '1'})
-    idx = idx_list[['full_code', 'short_code', 'codeName', 'codeName']].set_axis(col, axis=1)
+    if pool is None:
+        print('코스피200/코스닥우량 지수 구성종목 정보 스크래핑 시작', end='...')
+    idx = get_index_list('1', run)
 
     index_list = ['코스피 200', '코스닥 우량기업부']
-    df_list = []
-    col = ['ISU_SRT_CD', 'ISU_ABBRV']
-    col_new = ['sym_cd', 'sym_nm']
+    columns = {'ISU_SRT_CD': 'sym_cd', 'ISU_ABBRV': 'sym_nm'}
+    col_new = list(columns.values())
 
-    for index in index_list:
+    def read(index):
         try:
             params = idx[idx.tboxindIdx_finder_equidx0_2 == index].iloc[0].to_dict()
             params.update(bld="dbms/MDC/STAT/standard/MDCSTAT00601",
                           trdDd=date)
-            df = krx_req_post('data', params)[col].set_axis(col_new, axis=1)
+            df = krx_req_post('data', params, columns)
             df[index.replace(' ', '')] = True
-            df_list.append(df)
+            return df
         except Exception:
             cols = col_new + [index.replace(' ', '')]
-            df = pd.DataFrame(columns=cols)
-            df_list.append(df)
+            return pd.DataFrame(columns=cols)
 
+    df_list = _map(read, index_list, pool)
     data = functools.reduce(lambda left, right: pd.merge(left, right, how='outer', on=col_new), df_list)
     data.columns = col_new + ['ksp_200', 'ksq_bc']
-    print('종료!')
+    if pool is None:
+        print('종료!')
     return data.fillna(False)
 
 
-def get_investment_company(date):
+def get_investment_company(date, pool=None):
     """
     KRX정보데이터시스템(data.krx.co.kr) 기본통계 - 주식 - 기타증권 - [12014],[12015],[12016]
+    (pool이 주어지면 화면별 요청을 동시에 보내며, 진행 메시지는 출력하지 않음)
     """
-    print('KRX 투자회사(뮤추얼펀드/선박투자/인프라투자) 목록 스크래핑 시작', end='...')
+    if pool is None:
+        print('KRX 투자회사(뮤추얼펀드/선박투자/인프라투자) 목록 스크래핑 시작', end='...')
     bld = {"12014": "dbms/MDC/STAT/standard/MDCSTAT02901",
            "12015": "dbms/MDC/STAT/standard/MDCSTAT02801",
            "12016": "dbms/MDC/STAT/standard/MDCSTAT03001"}
@@ -144,38 +507,82 @@ def get_investment_company(date):
     def read(num):
         params = {'bld': bld[num],
                   'trdDd': date}
-        data = krx_req_post('data', params)
-        col = ['ISU_SRT_CD', 'ISU_NM']
-        col_new = ['sym_cd', 'sym_nm']
-        data = data[col].set_axis(col_new, axis=1)
+        data = krx_req_post('data', params, {'ISU_SRT_CD': 'sym_cd', 'ISU_NM': 'sym_nm'})
         data['inv_com'] = True
         return data
 
-    df1 = read('12014')
-    df2 = read('12015')
-    df3 = read('12016')
+    df1, df2, df3 = _map(read, ['12014', '12015', '12016'], pool)
     result = pd.concat([df1, df2, df3]).reset_index(drop=True)
-    print('종료!')
+    if pool is None:
+        print('종료!')
     return result.fillna(False)
 
 
-def get_symbols_data(workdays):
-    df = pd.DataFrame()
-
-    for date in workdays:
+def get_symbols_data_by_date(date, pool=None, cancelled=None, run=None):
+    """
+    하루(date)의 KRX 종목 정보(산업분류, 지수 구성종목, 투자회사 여부)를 합친 데이터프레임
+    (pool이 주어지면 하위 요청을 동시에 보냄. cancelled가 주어지면 세 가지 정보를 받는 사이마다 확인해서
+    취소되었으면 None을 반환. run은 get_index_list 참고)
+    """
+    if pool is None:
         print(f'@ {date} KRX 종목 정보 스크래핑 시작')
-        df1 = get_krx_sector(date)
-        df2 = get_symbols_in_index(date)
-        df3 = get_investment_company(date)
-        df_list = [df1, df2, df3]
-        data = functools.reduce(lambda left, right:
-                                pd.merge(left, right, how='left', on=['sym_cd', 'sym_nm']), df_list)
-        data[['ksp_200', 'ksq_bc', 'inv_com']] = \
-            data[['ksp_200', 'ksq_bc', 'inv_com']].fillna(False)
-        data['sym_obj'] = (data.sym_cd.str[-1] == '0') & (data.sym_cd.str[0] != '9') & \
-                          (~data.inv_com) & (~data.sym_nm.str.contains('스팩'))
-        data.insert(0, 'base_dt', date)
-        data.insert(0, 'base_mt', (pd.DatetimeIndex(data.base_dt).to_period('M') + 1).strftime('%Y-%m'))
-        df = df.append(data, ignore_index=True)
-
-    return df
+    requests = [get_krx_sector, functools.partial(get_symbols_in_index, run=run), get_investment_company]
+    df_list = []
+    for func in requests:
+        if cancelled is not None and cancelled():
+            return None
+        df_list.append(func(date, pool))
+    data = functools.reduce(lambda left, right:
+                            pd.merge(left, right, how='left', on=['sym_cd', 'sym_nm']), df_list)
+    data[['ksp_200', 'ksq_bc', 'inv_com']] = \
+        data[['ksp_200', 'ksq_bc', 'inv_com']].fillna(False).astype(bool)
+    data['sym_obj'] = (data.sym_cd.str[-1] == '0') & (data.sym_cd.str[0] != '9') & \
+                      (~data.inv_com) & (~data.sym_nm.str.contains('스팩'))
+    data.insert(0, 'base_dt', date)
+    data.insert(0, 'base_mt', (pd.DatetimeIndex(data.base_dt).to_period('M') + 1).strftime('%Y-%m'))
+    return data
+
+
+def iter_symbols_data(workdays, workers=1):
+    """
+    영업일별 KRX 종목 정보를 날짜 순서대로 하나씩 반환하는 제너레이터
+
+    Parameters
+    ----------
+    workdays : list of str
+        'YYYYMMDD' 형식의 영업일 목록
+    workers : int
+        1이면 날짜별로 순차 처리. 2 이상이면 날짜 workers개를 동시에 처리하고, 각 날짜의 하위 요청도
+        최대 workers개까지 동시에 보냄 (결과는 순차 처리와 동일, 요청 속도는 session.rate * workers로 제한)
+
+    Yields
+    ------
+    (str, pd.DataFrame)
+        (영업일, 해당일의 종목 정보)
+    """
+    # 지수 목록은 이번 실행 동안만 재사용
+    run = RunCache()
+    if workers <= 1:
+        for date in workdays:
+            yield date, get_symbols_data_by_date(date, run=run)
+        return
+
+    # 날짜 작업은 하위 요청이 끝나기를 기다리므로 서로 다른 풀을 사용 (같은 풀이면 교착 가능)
+    # 소비가 늦어져도 결과가 쌓이지 않도록 workers * 2개 날짜까지만 미리 스크래핑
+    with ThreadPoolExecutor(workers) as date_pool, ThreadPoolExecutor(workers) as request_pool, \
+            session.fanout(workers):
+        results = _imap(lambda date: get_symbols_data_by_date(date, request_pool, run=run), workdays, date_pool,
+                        workers * 2)
+        for date, data in zip(workdays, results):
+            print(f'@ {date} KRX 종목 정보 스크래핑 종료!')
+            yield date, data
+
+
+def get_symbols_data(workdays, workers=1):
+    """
+    여러 영업일의 KRX 종목 정보를 날짜 순서대로 이어붙인 데이터프레임 (workers는 iter_symbols_data 참고)
+    """
+    frames = [data for _, data in iter_symbols_data(workdays, workers)]
+    if not frames:
+        return pd.DataFrame()
+    return pd.concat(frames, ignore_index=True)
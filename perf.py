@@ -0,0 +1,209 @@
+import pandas as pd
+import numpy as np
+import contextlib
+import tracemalloc
+import threading
+import functools
+import json
+import time
+import os
+
+
+# 실행 시간 계측 (KRX 요청, DbTools 호출, 파이프라인 단계)
+#  - 기본값은 꺼져 있으며, 꺼져 있을 때 계측 지점의 비용은 속성 조회 한 번 수준
+#  - 결과는 Chrome trace-event 형식(chrome://tracing, Perfetto에서 열람) 또는 JSON으로 저장
+
+class Tracer:
+    """
+    구간(span)별 시작 시각, 소요시간, 스레드, 부가정보(행 수, 바이트 등)를 모으는 객체
+
+    Examples
+    --------
+    >>> perf.enable(memory=True)
+    >>> input.update_raw_data('2021-05')
+    >>> perf.export('update_2021-05.trace.json')
+    >>> perf.summary()
+    """
+
+    def __init__(self):
+        self.enabled = False
+        self.memory = False
+        self.events = []
+        self._lock = threading.Lock()
+        self._origin = time.perf_counter()
+
+    def enable(self, memory=False):
+        """
+        계측을 켬
+
+        Parameters
+        ----------
+        memory : bool
+            True이면 tracemalloc으로 파이프라인 단계별 최대 메모리를 함께 기록 (계측 비용이 커짐)
+        """
+        self.memory = memory
+        if memory and not tracemalloc.is_tracing():
+            tracemalloc.start()
+        self.enabled = True
+
+    def disable(self):
+        self.enabled = False
+        if self.memory and tracemalloc.is_tracing():
+            tracemalloc.stop()
+        self.memory = False
+
+    def reset(self):
+        with self._lock:
+            self.events = []
+        self._origin = time.perf_counter()
+
+    def add(self, name, cat, start, end, args):
+        event = {'name': name, 'cat': cat, 'ph': 'X', 'ts': (start - self._origin) * 1e6,
+                 'dur': (end - start) * 1e6, 'pid': os.getpid(), 'tid': threading.get_native_id(), 'args': args}
+        with self._lock:
+            self.events.append(event)
+
+    @contextlib.contextmanager
+    def _span(self, name, cat, memory, args):
+        if memory and self.memory:
+            # 동시에 실행되는 단계가 있으면 그 단계들의 할당도 포함된 프로세스 전체 기준 최대값
+            tracemalloc.reset_peak()
+            base = tracemalloc.get_traced_memory()[0]
+        start = time.perf_counter()
+        try:
+            yield args
+        except BaseException as e:
+            args['error'] = repr(e)
+            raise
+        finally:
+            end = time.perf_counter()
+            if memory and self.memory:
+                args['peak_mem'] = tracemalloc.get_traced_memory()[1] - base
+            self.add(name, cat, start, end, args)
+
+    def span(self, name, cat, memory=False, **args):
+        """
+        with 블록 하나를 구간으로 기록. 블록 안에서 반환값(dict)에 부가정보를 추가할 수 있음
+
+        Parameters
+        ----------
+        name : str
+            구간명 (ex. 엔드포인트, 메서드명, 단계명)
+        cat : str
+            분류 ('krx', 'db', 'stage' 등)
+        memory : bool
+            True이면 구간의 최대 메모리(peak_mem, 바이트)도 기록 (enable(memory=True)일 때만)
+        args :
+            부가정보
+
+        Examples
+        --------
+        >>> with perf.span('MDCSTAT03901', 'krx') as info:
+        ...     res = session.post(...)
+        ...     info['bytes'] = len(res.content)
+        """
+        if not self.enabled:
+            return contextlib.nullcontext(args)
+        return self._span(name, cat, memory, args)
+
+    def export(self, path, fmt='chrome'):
+        """
+        기록된 구간을 파일로 저장
+
+        Parameters
+        ----------
+        path : str
+        fmt : str
+            'chrome' - Chrome trace-event 형식 ({"traceEvents": [...]})
+            'json' - 구간 목록 (summary에 쓰이는 컬럼과 같은 키의 레코드)
+        """
+        with self._lock:
+            events = list(self.events)
+        if fmt == 'chrome':
+            body = {'traceEvents': events, 'displayTimeUnit': 'ms'}
+        else:
+            body = [{'name': e['name'], 'cat': e['cat'], 'start': e['ts'] / 1e6, 'seconds': e['dur'] / 1e6,
+                     'tid': e['tid'], **e['args']} for e in events]
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(body, f, ensure_ascii=False, default=str)
+
+    def frame(self):
+        """기록된 구간을 데이터프레임으로 반환 (구간 하나가 한 행)"""
+        with self._lock:
+            events = list(self.events)
+        rows = [{'cat': e['cat'], 'name': e['name'], 'seconds': e['dur'] / 1e6, **e['args']} for e in events]
+        return pd.DataFrame(rows)
+
+    def summary(self):
+        """
+        분류(cat), 구간명(name)별 호출 수와 소요시간(초), 처리한 행 수와 바이트, 최대 메모리 요약
+
+        Returns
+        -------
+        pd.DataFrame (총 소요시간 내림차순)
+        """
+        data = self.frame()
+        if data.empty:
+            return data
+        for c in ['rows', 'bytes', 'peak_mem']:
+            if c not in data.columns:
+                data[c] = np.nan
+        grouped = data.groupby(['cat', 'name'])
+        result = grouped.seconds.agg(['count', 'sum', 'mean', 'max'])
+        result['p95'] = grouped.seconds.quantile(0.95)
+        result['rows'] = grouped.rows.sum(min_count=1)
+        result['bytes'] = grouped.bytes.sum(min_count=1)
+        result['peak_mem'] = grouped.peak_mem.max()
+        result = result.rename(columns={'sum': 'total'})
+        return result.sort_values('total', ascending=False).reset_index()
+
+
+def _size(value):
+    # 데이터프레임 / 시리즈의 행 수와 메모리 바이트 (문자열 객체 내용은 세지 않음)
+    if isinstance(value, (pd.DataFrame, pd.Series)):
+        return len(value), int(np.sum(value.memory_usage(index=True, deep=False)))
+    return None
+
+
+def traced(cat, name=None):
+    """
+    함수 호출을 구간으로 기록하는 데코레이터. 첫 번째 문자열 인자는 table로,
+    데이터프레임 인자와 반환값은 행 수(rows)와 바이트(bytes)로 기록함
+
+    Parameters
+    ----------
+    cat : str
+        분류
+    name : str, optional
+        구간명 (기본값은 함수의 qualname)
+    """
+    def decorator(func):
+        label = name if name else func.__qualname__
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if not tracer.enabled:
+                return func(*args, **kwargs)
+            info = {}
+            table = next((a for a in args if isinstance(a, str)), None)
+            if table is not None:
+                info['table'] = table
+            with tracer.span(label, cat, **info) as info:
+                result = func(*args, **kwargs)
+                sizes = [s for s in map(_size, list(args) + list(kwargs.values()) + [result]) if s]
+                if sizes:
+                    info['rows'] = sum(s[0] for s in sizes)
+                    info['bytes'] = sum(s[1] for s in sizes)
+            return result
+        return wrapper
+    return decorator
+
+
+# 모듈 전체에서 공유하는 계측 객체와 단축 함수
+tracer = Tracer()
+enable = tracer.enable
+disable = tracer.disable
+reset = tracer.reset
+span = tracer.span
+export = tracer.export
+summary = tracer.summary
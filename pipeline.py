@@ -0,0 +1,261 @@
+import pandas as pd
+import functools
+import hashlib
+import shutil
+import time
+import os
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+import util as ut
+import perf
+
+
+# 테이블 생성 단계들의 의존 관계 그래프 실행기
+
+class Stage:
+    """
+    파이프라인의 한 단계
+
+    Parameters
+    ----------
+    name : str
+        단계명 (다른 단계의 args에서 이 이름으로 결과를 받음)
+    func : callable
+        args 순서대로 값을 받아 결과(보통 데이터프레임)를 반환하는 함수
+    args : list of str
+        func에 넘길 값의 이름. 다른 단계명이면 그 단계의 결과, 아니면 run에 넘긴 입력값
+    store : callable, optional
+        결과를 받아 DB에 저장하는 함수 (DbTools.lock을 잡은 상태에서 실행됨)
+    version : str
+        단계 로직이 바뀌었을 때 이전 캐시를 쓰지 않도록 바꾸는 값
+    """
+
+    def __init__(self, name, func, args=(), store=None, version='1'):
+        self.name = name
+        self.func = func
+        self.args = list(args)
+        self.store = store
+        self.version = version
+
+
+class Pipeline:
+    """
+    단계(Stage)들을 의존 관계 순서대로 실행하되, 서로 의존하지 않는 단계는 스레드 풀에서 동시에 실행.
+    단계마다 입력값과 선행 단계의 지문(fingerprint)으로 만든 지문을 붙여 결과를 디스크에 저장하므로,
+    중간에 실패한 뒤 같은 입력으로 다시 실행하면 이미 끝난 단계는 건너뛰고 실패한 단계부터 실행함.
+    단계의 완료 표시(.stored)는 store와 세션 중인 DB 파일의 flush가 끝난 뒤에 기록하므로, 표시가 있는 단계의
+    결과는 DB에 반영되어 있음. 모든 단계가 성공하면 단계 결과 파일(.pkl)만 삭제하고 완료 표시는 남겨서
+    같은 입력으로 다시 실행해도 이미 끝난 단계를 반복하지 않음
+
+    Examples
+    --------
+    >>> pipe = Pipeline('initial')
+    >>> pipe.add('month_end', rt.get_month_end_table, ['date_range'], store=lambda df: raw.put('month_end', df))
+    >>> pipe.add('symbols', get_object_symbols, ['month_end'])
+    >>> pipe.add('daily', rt.get_daily_table, ['date_range', 'symbols'], store=lambda df: raw.put('daily', df))
+    >>> pipe.run(date_range=['2021-01', '2021-12'])
+    """
+
+    def __init__(self, name, workers=4, path=None):
+        """
+        Parameters
+        ----------
+        name : str
+            파이프라인 이름 (캐시 디렉터리 이름으로 사용)
+        workers : int
+            동시에 실행할 최대 단계 수
+        path : str, optional
+            단계 결과 캐시 디렉터리 (기본값은 external_files/pipeline_cache/<name>/)
+        """
+        self.name = name
+        self.workers = workers
+        self.path = path if path else os.path.dirname(__file__) + f'/external_files/pipeline_cache/{name}/'
+        self.stages = {}
+
+    def add(self, name, func, args=(), store=None, version='1'):
+        """단계를 추가 (인자는 Stage와 동일). 선행 단계는 먼저 추가되어 있어야 함"""
+        if name in self.stages or name in args:
+            raise ValueError(f'중복되거나 자기 자신을 참조하는 단계입니다: {name}')
+        self.stages[name] = Stage(name, func, args, store, version)
+        return self.stages[name]
+
+    def deps(self, name):
+        return [a for a in self.stages[name].args if a in self.stages]
+
+    def _required(self, targets):
+        # targets와 그 선행 단계 전체
+        required, stack = set(), list(targets)
+        while stack:
+            name = stack.pop()
+            if name not in required:
+                required.add(name)
+                stack.extend(self.deps(name))
+        return required
+
+    # 지문(fingerprint)과 결과 캐시
+
+    @staticmethod
+    def _func_name(func):
+        # functools.partial로 감싼 함수는 원래 함수명과 미리 넣은 인자로 구분
+        if isinstance(func, functools.partial):
+            return f'{Pipeline._func_name(func.func)}{func.args!r}{func.keywords!r}'
+        return f'{func.__module__}.{func.__qualname__}'
+
+    @staticmethod
+    def _digest(value):
+        if isinstance(value, (pd.DataFrame, pd.Series, pd.Index)):
+            return hashlib.sha1(pd.util.hash_pandas_object(value).values.tobytes()).hexdigest()
+        return repr(value)
+
+    def _fingerprints(self, names, inputs):
+        fingerprints = {}
+        for name in self._order(names):
+            stage = self.stages[name]
+            parts = [stage.name, stage.version, self._func_name(stage.func)]
+            parts += [fingerprints[a] if a in self.stages else f'{a}={self._digest(inputs[a])}' for a in stage.args]
+            fingerprints[name] = hashlib.sha1('|'.join(parts).encode()).hexdigest()
+        return fingerprints
+
+    def _order(self, names):
+        # 선행 단계가 먼저 오는 순서 (추가된 순서 기준)
+        return [name for name in self.stages if name in names]
+
+    def _file(self, name, fingerprint):
+        return os.path.join(self.path, f'{name}-{fingerprint[:16]}.pkl')
+
+    def _done(self, name, fingerprint):
+        # 결과가 계산되고 저장(store)까지 끝난 단계 (결과 파일은 실행이 모두 성공하면 삭제되므로 완료 표시로 판단)
+        return os.path.isfile(self._file(name, fingerprint) + '.stored')
+
+    def status(self, targets=None, **inputs):
+        """
+        targets 단계와 그 선행 단계별로 같은 입력값의 이전 실행이 끝났는지 여부 {단계명: bool}
+        (모든 단계가 성공한 실행도 완료 표시를 남기므로 모든 단계가 True)
+        """
+        names = self._required(targets if targets else list(self.stages))
+        fingerprints = self._fingerprints(names, inputs)
+        return {name: self._done(name, fingerprints[name]) for name in self._order(names)}
+
+    def _prune(self, fingerprints):
+        # 실행이 모두 성공하면 이번 실행의 결과 파일을 삭제 (저장 완료 표시는 유지)
+        for name, fingerprint in fingerprints.items():
+            if os.path.isfile(self._file(name, fingerprint)):
+                os.remove(self._file(name, fingerprint))
+
+    def clear(self):
+        """저장된 단계 결과를 모두 삭제"""
+        shutil.rmtree(self.path, ignore_errors=True)
+
+    # 실행
+
+    def _run_stage(self, stage, fingerprint, values):
+        file = self._file(stage.name, fingerprint)
+        with perf.span(stage.name, 'stage', memory=True, pipeline=self.name) as info:
+            info['cached'] = os.path.isfile(file)
+            if info['cached']:
+                result = pd.read_pickle(file)
+            else:
+                result = stage.func(*[values[a] for a in stage.args])
+                os.makedirs(self.path, exist_ok=True)
+                pd.to_pickle(result, file + '.tmp')
+                os.replace(file + '.tmp', file)
+            if isinstance(result, pd.DataFrame):
+                info['rows'] = len(result)
+
+            if stage.store is not None and result is not None:
+                with ut.DbTools.lock:
+                    stage.store(result)
+            # 세션으로 열어둔 파일에 쓴 내용이 디스크에 반영된 뒤에 완료 표시를 기록
+            ut.DbTools.flush_sessions()
+            open(file + '.stored', 'w').close()
+        return result
+
+    def run(self, targets=None, **inputs):
+        """
+        targets 단계와 그 선행 단계를 실행하고 각 단계의 결과를 반환
+
+        Parameters
+        ----------
+        targets : list of str, optional
+            실행할 단계 (생략하면 전체)
+        inputs :
+            단계의 args에서 참조하는 입력값 (ex. date_range=[...], month='2021-05')
+
+        Returns
+        -------
+        dict
+            {targets 단계명: 결과} (이전 실행에서 끝난 선행 단계의 결과는 후속 단계가 필요로 할 때만 불러오고,
+            targets가 아닌 단계의 결과는 후속 단계가 모두 끝나면 메모리에서 내림.
+            이전에 모두 성공한 실행에서 끝난 단계는 결과 파일이 삭제되었으므로 None)
+        """
+        targets = targets if targets else list(self.stages)
+        names = self._required(targets)
+        missing = {a for n in names for a in self.stages[n].args if a not in self.stages and a not in inputs}
+        if missing:
+            raise ValueError(f'입력값이 없습니다: {sorted(missing)}')
+
+        fingerprints = self._fingerprints(names, inputs)
+        values, finished, failed, timings = dict(inputs), set(), {}, {}
+        pending = set(names)
+
+        # 끝나지 않은 단계가 필요로 하는 선행 단계의 결과 파일이 없으면 (이전 실행 성공 후 삭제) 그 단계도 다시 실행
+        done = {name for name in names if self._done(name, fingerprints[name])}
+        stale = True
+        while stale:
+            stale = {d for n in names - done for d in self.deps(n)
+                     if d in done and not os.path.isfile(self._file(d, fingerprints[d]))}
+            done -= stale
+
+        def load(name):
+            if name not in values:
+                file = self._file(name, fingerprints[name])
+                values[name] = pd.read_pickle(file) if os.path.isfile(file) else None
+            return values[name]
+
+        def release(name):
+            # 선행 단계의 결과는 그 결과를 쓰는 단계가 모두 끝나면 내림 (targets의 결과는 반환하므로 유지)
+            for d in self.deps(name):
+                if d not in targets and all(n in finished for n in names if d in self.deps(n)):
+                    values.pop(d, None)
+
+        with ThreadPoolExecutor(self.workers) as pool:
+            running = {}
+            while pending or running:
+                # 선행 단계가 모두 끝난 단계를 제출 (선행 단계가 실패했으면 건너뜀)
+                for name in self._order(pending):
+                    deps = self.deps(name)
+                    if any(d in failed for d in deps):
+                        failed[name] = RuntimeError(f'선행 단계 실패로 건너뜀: {name}')
+                        pending.discard(name)
+                    elif all(d in finished for d in deps):
+                        pending.discard(name)
+                        if name in done:
+                            finished.add(name)
+                            release(name)
+                            print(f'[{self.name}] {name} 단계는 이전 실행 결과를 사용')
+                            continue
+                        for d in deps:
+                            load(d)
+                        print(f'[{self.name}] {name} 단계 시작')
+                        timings[name] = time.perf_counter()
+                        running[pool.submit(self._run_stage, self.stages[name], fingerprints[name], values)] = name
+
+                if not running:
+                    continue
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    name = running.pop(future)
+                    try:
+                        values[name] = future.result()
+                        finished.add(name)
+                        release(name)
+                        print(f'[{self.name}] {name} 단계 종료! ({time.perf_counter() - timings[name]:.1f}초)')
+                    except Exception as e:
+                        failed[name] = e
+                        print(f'[{self.name}] {name} 단계 실패: {e!r}')
+
+        if failed:
+            first = next(e for e in failed.values() if not str(e).startswith('선행 단계 실패'))
+            raise RuntimeError(f'실패한 단계: {sorted(failed)} (다시 실행하면 실패한 단계부터 진행)') from first
+        results = {name: load(name) for name in targets}
+        self._prune(fingerprints)
+        return results
@@ -0,0 +1,194 @@
+import pandas as pd
+import time
+import util as ut
+
+
+# 증분 스크래핑 계획 (DB에 이미 있는 데이터는 다시 요청하지 않음)
+
+class CrawlPlanner:
+    """
+    요청한 기간(date_range)과 DbTools에 이미 저장된 데이터를 비교해 꼭 필요한 KRX 요청(날짜별, 연도별, 종목별)만
+    중복 없이 계획하는 객체. 저장된 값 조회 결과는 테이블이 다시 쓰이기 전까지(메타데이터의 updated 기준) 재사용함
+
+    Examples
+    --------
+    >>> planner = CrawlPlanner(raw)
+    >>> planner.report(['2021-01', '2021-12'], symbols)     # 실제 요청 없이 계획만 출력 (dry-run)
+    >>> planner.month_end_dates(['2021-01', '2021-12'])     # 아직 저장되지 않은 월말 영업일
+    """
+
+    # 월말 영업일 하루의 종목 정보 요청 수 (산업분류 2 + 지수구성종목 2 + 투자회사 3, 지수 목록은 실행당 1회)
+    requests_per_month_end = 7
+    # 휴장일 연도 하나의 요청 수 (OTP 1 + 휴장일 표 1)
+    requests_per_year = 2
+
+    def __init__(self, db, holidays_table='holidays', month_end_table='month_end', holidays_start=2009,
+                 refresh_days=7):
+        """
+        Parameters
+        ----------
+        db : ut.DbTools
+            원천데이터 DB
+        holidays_table, month_end_table : str
+            휴장일 / 월말 종목정보 테이블명
+        holidays_start : int
+            휴장일을 보관하는 첫 연도
+        refresh_days : int
+            올해 휴장일은 마지막 갱신 후 이 기간이 지났을 때만 다시 요청 (임시 휴장일 반영용)
+        """
+        self.db = db
+        self.holidays_table = holidays_table
+        self.month_end_table = month_end_table
+        self.holidays_start = holidays_start
+        self.refresh_days = refresh_days
+        self._memo = {}
+
+    def reset(self):
+        """저장값 조회 결과를 모두 버림"""
+        self._memo = {}
+
+    def _exists(self, table):
+        return '/' + table in self.db.tables
+
+    def stored(self, table, col, query=None):
+        """테이블에 저장된 col의 고유값 (테이블이 다시 쓰이지 않았으면 이전 조회 결과를 재사용)"""
+        if not self._exists(table):
+            return pd.Series(name=col, dtype='object')
+        key = (table, col, query, self.db.meta(table).get('updated'))
+        if key not in self._memo:
+            self._memo[key] = self.db.unique(table, col, query)
+        return self._memo[key]
+
+    def holiday_years(self):
+        """
+        휴장일을 요청해야 하는 연도 목록.
+        저장된 휴장일이 없는 연도와, 마지막 갱신 후 refresh_days가 지난 경우의 올해
+
+        Returns
+        -------
+        list of int
+        """
+        this_year = pd.Timestamp.today().year
+        stored = set(self.stored(self.holidays_table, 'h_day').str[:4])
+        years = [year for year in range(self.holidays_start, this_year + 1) if str(year) not in stored]
+
+        if this_year not in years:
+            updated = self.db.meta(self.holidays_table).get('updated', 0)
+            if time.time_ns() - updated > self.refresh_days * 86400 * 10 ** 9:
+                years.append(this_year)
+        return years
+
+    def month_end_dates(self, date_range, table=None):
+        """
+        date_range(MP적용월 기준)의 월말 영업일 중 아직 테이블에 저장되지 않은 날짜 목록
+
+        Returns
+        -------
+        list of str ('YYYYMMDD')
+        """
+        table = table if table else self.month_end_table
+        workdays = list(ut.workdays_offset(date_range, freq='ME').strftime('%Y%m%d'))
+        if not workdays:
+            return []
+        query = f'base_dt >= "{workdays[0]}" & base_dt <= "{workdays[-1]}"'
+        saved = set(self.stored(table, 'base_dt', query))
+        return [date for date in workdays if date not in saved]
+
+    def object_symbols(self, table=None):
+        """
+        분석대상(sym_obj)이었던 적이 있는 종목코드.
+        month_end 테이블의 종목 등록부를 사용하므로 테이블을 읽지 않음 (read(..., 'sym_obj = "True"')의 고유값과 같음)
+
+        Returns
+        -------
+        pd.Series (종목코드 순 정렬)
+        """
+        table = table if table else self.month_end_table
+        if not self._exists(table):
+            return pd.Series(name='sym_cd', dtype='object')
+        registry = self.db.registry(table)
+        return pd.Series(registry.index[registry.sym_obj], name='sym_cd')
+
+    def split_symbols(self, symbols, table, query=None):
+        """
+        종목 목록을 테이블에 이미 있는 종목(유지)과 없는 종목(신규)으로 나눔.
+        query가 없으면 테이블을 읽지 않고 종목 등록부(DbTools.registry)의 종목 목록을 사용
+
+        Parameters
+        ----------
+        symbols : pd.Series
+            나눌 종목코드
+        table : str
+            비교할 테이블명 (없는 테이블이면 모두 신규)
+        query : str, optional
+            저장된 종목 중 비교 대상을 제한하는 조건 (ex. 'sym_obj = "True"')
+
+        Returns
+        -------
+        (pd.Series, pd.Series)
+            (유지종목, 신규종목) - 입력 순서 유지, 중복 제거
+        """
+        symbols = pd.Series(symbols).drop_duplicates()
+        if not self._exists(table):
+            saved = []
+        elif query is None:
+            saved = self.db.symbols(table)
+        else:
+            saved = self.stored(table, 'sym_cd', query)
+        mask = symbols.isin(saved)
+        return symbols[mask], symbols[~mask]
+
+    def plan(self, date_range=None, symbols=None, symbol_tables=('daily', 'returns')):
+        """
+        실행할 요청 계획
+
+        Parameters
+        ----------
+        date_range : str or list, optional
+            월말 종목정보를 확인할 기간 (workdays_offset의 입력 형식). 생략하면 휴장일만 확인
+        symbols : pd.Series, optional
+            종목별 테이블에 대해 유지/신규를 나눌 종목코드
+        symbol_tables : tuple
+            종목별로 확인할 테이블명
+
+        Returns
+        -------
+        pd.DataFrame
+            table - 대상 테이블, unit - 요청 단위(year/date/symbol), items - 요청할 항목 목록,
+            skipped - 이미 저장되어 있어 건너뛰는 항목 수, requests - 예상 KRX 요청 수 (종목별 테이블은 None)
+        """
+        rows = []
+        this_year = pd.Timestamp.today().year
+        years = self.holiday_years()
+        rows.append({'table': self.holidays_table, 'unit': 'year', 'items': years,
+                     'skipped': this_year - self.holidays_start + 1 - len(years),
+                     'requests': len(years) * self.requests_per_year})
+
+        if date_range is not None:
+            dates = self.month_end_dates(date_range)
+            total = len(ut.workdays_offset(date_range, freq='ME'))
+            requests = len(dates) * self.requests_per_month_end
+            requests += 1 if dates else 0
+            rows.append({'table': self.month_end_table, 'unit': 'date', 'items': dates,
+                         'skipped': total - len(dates), 'requests': requests})
+
+        if symbols is not None:
+            for table in symbol_tables:
+                saved, new = self.split_symbols(symbols, table)
+                rows.append({'table': table, 'unit': 'symbol', 'items': list(new),
+                             'skipped': len(saved), 'requests': None})
+
+        plan = pd.DataFrame(rows, columns=['table', 'unit', 'items', 'skipped', 'requests'])
+        return plan.astype({'requests': 'Int64'})
+
+    def report(self, date_range=None, symbols=None, symbol_tables=('daily', 'returns')):
+        """plan의 결과를 출력만 하고 실제 요청은 하지 않음 (dry-run). 인자는 plan과 동일"""
+        plan = self.plan(date_range, symbols, symbol_tables)
+        unit_name = {'year': '연도', 'date': '월말', 'symbol': '신규종목'}
+        print('[dry-run] 스크래핑 계획')
+        for row in plan.itertuples():
+            items = ', '.join(map(str, row.items[:5])) + (' ...' if len(row.items) > 5 else '')
+            requests = f' / KRX 요청 {row.requests}건' if pd.notna(row.requests) else ''
+            print(f' - {row.table}: {unit_name[row.unit]} {len(row.items)}개 (저장됨 {row.skipped}개){requests}'
+                  + (f' [{items}]' if items else ''))
+        return plan
@@ -1,32 +1,35 @@
 import pandas as pd
 import util as ut
 import krx
+import planner
 # import input.fn as fn
 
 raw = ut.DbTools('inp_raw')
 
 
-def get_holidays_table(start_year):
-    print(f'{str(start_year)}년 이후 KRX 휴장일 정보 스크래핑 시작', end='...')
+def iter_holidays(years):
+    # 연도별 휴장일(Series)을 차례로 반환하는 제너레이터
+    for year in years:
+        yield krx.get_holidays_from_krx(year)
 
-    this_year = pd.Timestamp.today().year
-    holidays = pd.Series(dtype='str')
 
-    for year in pd.period_range(start_year, this_year, freq='Y'):
-        holidays_sr = krx.get_holidays_from_krx(year)
-        holidays = holidays.append(holidays_sr)
+def get_holidays_table(start_year, years=None):
+    """start_year부터 올해까지(years가 주어지면 해당 연도들만)의 KRX 휴장일 테이블"""
+    years = years if years is not None else range(int(start_year), pd.Timestamp.today().year + 1)
+    print(f'{str(start_year)}년 이후 KRX 휴장일 정보 스크래핑 시작', end='...')
 
-    data = holidays.to_frame('h_day').reset_index(drop=True)
+    holidays = pd.concat(list(iter_holidays(years)), ignore_index=True)
+    data = holidays.to_frame('h_day')
     print('종료!')
 
     return data
 
 
-def get_month_end_table(date_range):
+def get_month_end_table(date_range, workers=4):
 
-    # 1) kr x크롤링
+    # 1) kr x크롤링 (workers개 월말 영업일을 동시에 스크래핑)
     last_month_end_workdays = ut.workdays_offset(date_range, freq='ME').strftime('%Y%m%d')
-    krx_month_end = krx.get_symbols_data(last_month_end_workdays)
+    krx_month_end = krx.get_symbols_data(last_month_end_workdays, workers)
     #
     # # 2) fn가이드 크롤링(cross-sectional)
     # df_dt_sym = krx_month_end[krx_month_end.sym_obj][['base_dt', 'sym_cd']].copy()
@@ -37,6 +40,64 @@ def get_month_end_table(date_range):
 
     return krx_month_end
 
+
+def store_month_end_table(db, date_range, table='month_end', workers=4, batch_rows=200000):
+    """
+    월말 영업일별 KRX 종목 정보를 스크래핑하는 대로 적재용 테이블(<table>_load)에 batch_rows행 단위로 저장하고,
+    마지막 배치까지 저장되면 table로 옮김 (table이 이미 있으면 합쳐서 base_dt 순으로 다시 씀).
+    배치마다 저장이 끝난 마지막 날짜를 기록하므로, 중간에 멈춘 적재를 같은 인자로 다시 실행하면
+    기록된 날짜 이후부터 이어서 진행함 (기록되지 않은 배치의 행은 지우고 다시 스크래핑)
+
+    Parameters
+    ----------
+    db : ut.DbTools
+    date_range : str or list
+        workdays_offset의 입력 형식과 동일 (MP적용월 기준)
+    table : str
+        저장할 테이블명
+    workers, batch_rows :
+        krx.iter_symbols_data, DbTools.append_chunks 참고
+
+    Returns
+    -------
+    int (새로 저장한 행 수)
+    """
+    staging = table + '_load'
+    total = len(ut.workdays_offset(date_range, freq='ME'))
+    workdays = sorted(planner.CrawlPlanner(db, month_end_table=table).month_end_dates(date_range))
+    if len(workdays) < total:
+        print(f'{table} 테이블에 저장된 {total - len(workdays)}개 월말은 건너뜀')
+
+    # 중간에 멈춘 적재: 완료 표시 이후의 행(멈춘 배치의 일부)은 지우고 그 다음 날짜부터 이어서 진행
+    if '/' + staging in db.tables:
+        done = db.checkpoint(staging)
+        if done is None:
+            db.remove(staging)
+        else:
+            db.remove(staging, f'base_dt > "{done["base_dt"]}"')
+            workdays = [date for date in workdays if date > done['base_dt']]
+            print(f'{done["base_dt"]}까지 적재된 {staging} 테이블에 이어서 저장')
+
+    frames = (data for _, data in krx.iter_symbols_data(workdays, workers))
+    rows = db.append_chunks(staging, frames, batch_rows, checkpoint='base_dt')
+    if '/' + staging in db.tables:
+        _finish_load(db, staging, table)
+    return rows
+
+
+def _finish_load(db, staging, table):
+    # 적재용 테이블을 table로 옮김. table이 있으면 날짜 순서가 섞이지 않도록 합쳐서 base_dt 순으로 다시 씀
+    if '/' + table not in db.tables:
+        db.rename(staging, table)
+    else:
+        saved = db.read(table)
+        loaded = db.read(staging)
+        loaded = loaded[~loaded.base_dt.isin(saved.base_dt)]
+        data = pd.concat([saved, loaded], ignore_index=True).sort_values('base_dt', kind='stable', ignore_index=True)
+        db.put(table, data)
+        db.remove(staging)
+    db.set_checkpoint(table, None)
+
 #
 # def get_symbols(date_range):
 #     last_month_end_workdays = ut.workdays_offset(date_range, freq='ME').strftime('%Y%m%d')
@@ -0,0 +1,108 @@
+import pandas as pd
+import numpy as np
+import tempfile
+import shutil
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+
+# 종목(sym_cd) 단위로 나누어 여러 프로세스에서 실행하는 파생데이터 계산
+
+def _write_arrow(data, file):
+    # 압축하지 않은 Arrow IPC 파일로 저장 (자식 프로세스가 메모리 맵으로 복사 없이 읽음)
+    import pyarrow as pa
+    table = pa.Table.from_pandas(data, preserve_index=True)
+    with pa.OSFile(file, 'wb') as sink, pa.ipc.new_file(sink, table.schema) as writer:
+        writer.write_table(table)
+
+
+def _read_arrow(file, start, stop):
+    import pyarrow as pa
+    table = pa.ipc.open_file(pa.memory_map(file)).read_all()
+    return table.slice(start, stop - start).to_pandas()
+
+
+def _run_shard(func, files, bounds, dtypes, kwargs):
+    # 자식 프로세스에서 실행: 입력마다 자기 몫의 행 구간만 읽어서 원래 자료형(object, category 등)으로 되돌린 뒤 func 실행
+    frames = [None if file is None else _read_arrow(file, *bound).astype(dtype)
+              for file, bound, dtype in zip(files, bounds, dtypes)]
+    return func(*frames, **kwargs)
+
+
+def _shard_bounds(keys, shards):
+    """키 값의 분포(행 수 기준)로 구간 경계값을 정함. 같은 키는 항상 한 구간에 들어감"""
+    keys = np.sort(np.concatenate(keys))
+    if not len(keys):
+        return keys
+    cuts = keys[np.linspace(0, len(keys), shards + 1)[1:-1].astype(int)]
+    return np.unique(cuts)
+
+
+def run_sharded(func, frames, key='sym_cd', workers=None, shards=None, min_rows=100000, **kwargs):
+    """
+    func(*frames)를 key 값(종목코드) 구간별로 나누어 프로세스 풀에서 실행하고 결과를 key 순서대로 합침.
+    입력 데이터는 key로 정렬해 압축하지 않은 Arrow IPC 파일로 한 번만 저장하고,
+    자식 프로세스는 이를 메모리 맵으로 열어 자기 구간의 행만 읽음 (입력 데이터를 pickle로 넘기지 않음)
+
+    func는 종목마다 독립적으로 계산하고 결과를 key 순서로 정렬해 반환하는 함수여야 하며
+    (ex. derive.get_quarterly_prep_table), 입력 크기와 관계없이 항상 key로 안정 정렬한 입력으로 실행하므로
+    나누어 실행한 결과와 한 프로세스에서 실행한 결과가 같음
+
+    Parameters
+    ----------
+    func : callable
+        모듈 최상위에 정의된 함수 (자식 프로세스로 넘기기 위해 pickle 가능해야 함)
+    frames : list of pd.DataFrame
+        func의 위치 인자. None인 항목은 그대로 None으로 넘김
+    key : str
+        분할 기준 컬럼
+    workers : int, optional
+        프로세스 수 (기본값은 CPU 수)
+    shards : int, optional
+        나눌 구간 수 (기본값은 workers * 4, 구간별 계산량 차이를 줄이기 위해 프로세스 수보다 많이 나눔)
+    min_rows : int
+        입력 행 수의 합이 이보다 작으면 나누지 않고 현재 프로세스에서 실행
+    kwargs :
+        func의 키워드 인자
+
+    Returns
+    -------
+    pd.DataFrame (인덱스는 0부터 새로 매김)
+    """
+    workers = workers if workers else os.cpu_count()
+    shards = shards if shards else workers * 4
+    # key 기준 안정 정렬 (같은 종목 안에서는 원래 행 순서 유지). 나누지 않고 실행할 때도 같은 순서로 넘김
+    frames = [None if frame is None else frame.sort_values(key, kind='stable') for frame in frames]
+    rows = sum(len(frame) for frame in frames if frame is not None)
+    if workers <= 1 or rows < min_rows:
+        return func(*frames, **kwargs).reset_index(drop=True)
+
+    dtypes = [None if frame is None else frame.dtypes.to_dict() for frame in frames]
+    keys = [frame[key].to_numpy(dtype=str) for frame in frames if frame is not None]
+    cuts = _shard_bounds(keys, shards)
+
+    tmp = tempfile.mkdtemp(prefix='shard_')
+    try:
+        files, offsets = [], []
+        for i, frame in enumerate(frames):
+            if frame is None:
+                files.append(None)
+                offsets.append(None)
+                continue
+            files.append(os.path.join(tmp, f'{i}.arrow'))
+            _write_arrow(frame, files[-1])
+            positions = np.searchsorted(frame[key].to_numpy(dtype=str), cuts)
+            offsets.append(np.concatenate([[0], positions, [len(frame)]]))
+
+        with ProcessPoolExecutor(workers) as pool:
+            futures = []
+            for s in range(len(cuts) + 1):
+                bounds = [None if o is None else (int(o[s]), int(o[s + 1])) for o in offsets]
+                if all(b is None or b[0] == b[1] for b in bounds):
+                    continue
+                futures.append(pool.submit(_run_shard, func, files, bounds, dtypes, kwargs))
+            results = [future.result() for future in futures]
+    finally:
+        shutil.rmtree(tmp, ignore_errors=True)
+
+    return pd.concat(results, ignore_index=True)
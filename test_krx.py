@@ -0,0 +1,107 @@
+import pandas as pd
+import pytest
+import krx
+import raw_data as rd
+import util as ut
+from fake_krx import FakeKrxServer
+
+
+# KRX 응답 캐시: 'on' 모드로 기록한 실행을 서버 없이 'replay' 모드로 다시 실행
+
+@pytest.fixture
+def recorded(tmp_path, monkeypatch):
+    monkeypatch.setattr(krx, 'cache', krx.ResponseCache(path=str(tmp_path), mode='on'))
+    with FakeKrxServer(n_stk=30, n_ksq=30) as server:
+        monkeypatch.setattr(krx, 'session', krx.KrxSession(urls=server.urls, rate=None, retries=0))
+        holidays = rd.get_holidays_table(2020, [2020, 2021])
+        symbols = krx.get_symbols_data(['20210129', '20210226'], workers=2)
+    return holidays, symbols
+
+
+def test_replay_without_server(recorded):
+    holidays, symbols = recorded
+    krx.cache.mode = 'replay'
+    pd.testing.assert_frame_equal(rd.get_holidays_table(2020, [2020, 2021]), holidays)
+    pd.testing.assert_frame_equal(krx.get_symbols_data(['20210129', '20210226'], workers=2), symbols)
+
+
+def test_replay_missing_request(recorded):
+    krx.cache.mode = 'replay'
+    with pytest.raises(FileNotFoundError):
+        rd.get_holidays_table(2019, [2019])
+
+
+def test_error_response_not_cached(tmp_path):
+    cache = krx.ResponseCache(path=str(tmp_path), mode='on')
+    params = {'bld': 'x', 'trdDd': '20200102'}
+    with pytest.raises(ValueError):
+        cache.fetch('data', params, lambda: b'<html>error</html>', parse=krx.parse_krx_json)
+    assert cache.get('data', params) is None
+    # 빈 응답은 과거 날짜라도 ttl이 지나면 만료
+    cache.fetch('data', params, lambda: b'{"OutBlock_1": []}', parse=krx.parse_krx_json)
+    assert cache.get('data', params) is not None
+    cache.ttl = -1
+    assert cache.get('data', params) is None
+    cache.ttl = 3600
+    cache.fetch('data', params, lambda: b'{"OutBlock_1": [{"a": "1"}]}', parse=krx.parse_krx_json)
+    assert cache.get('data', params) is not None
+
+
+# 월말 종목 정보 적재: 중간에 멈추면 완료 표시된 배치 이후부터 이어서 진행하고, 끝나면 base_dt 순으로 합침
+
+def test_store_month_end_resume(tmp_path, monkeypatch):
+    monkeypatch.setattr(krx, 'cache', krx.ResponseCache(path=str(tmp_path), mode='off'))
+    db = ut.DbTools('month_end', path=str(tmp_path) + '/', compact=True)
+    scraped = []
+    iter_symbols_data = krx.iter_symbols_data
+
+    def interrupted(workdays, workers=1):
+        for i, (date, data) in enumerate(iter_symbols_data(workdays, workers)):
+            if i == 2:
+                raise KeyboardInterrupt
+            yield date, data
+
+    with FakeKrxServer(n_stk=10, n_ksq=10) as server:
+        monkeypatch.setattr(krx, 'session', krx.KrxSession(urls=server.urls, rate=None, retries=0))
+        monkeypatch.setattr(krx, 'iter_symbols_data', interrupted)
+        with pytest.raises(KeyboardInterrupt):
+            rd.store_month_end_table(db, ['2021-02', '2021-05'], workers=1, batch_rows=1)
+        assert db.tables == ['/month_end_load']
+        assert db.checkpoint('month_end_load') == {'base_dt': '20210226'}
+
+        monkeypatch.setattr(krx, 'iter_symbols_data', lambda workdays, workers=1:
+                            scraped.extend(workdays) or iter_symbols_data(workdays, workers))
+        rd.store_month_end_table(db, ['2021-02', '2021-05'], workers=1, batch_rows=1)
+        assert scraped == ['20210331', '20210430']
+        rd.store_month_end_table(db, ['2021-01', '2021-06'], workers=1, batch_rows=1)
+
+    assert db.tables == ['/month_end']
+    assert db.checkpoint('month_end') is None
+    dates = db.read('month_end', 'base_dt')
+    assert dates.is_monotonic_increasing
+    assert dates.value_counts().tolist() == [20] * 6
+    assert db.last('month_end', 'base_dt') == '20210531'
+
+
+# 지수 목록은 실행(iter_symbols_data)마다 한 번만 요청하고, 요청 속도 한도는 동시 요청 수만큼 늘어남
+
+def test_index_list_once_per_run(tmp_path, monkeypatch):
+    monkeypatch.setattr(krx, 'cache', krx.ResponseCache(path=str(tmp_path), mode='off'))
+    with FakeKrxServer(n_stk=10, n_ksq=10) as server:
+        monkeypatch.setattr(krx, 'session', krx.KrxSession(urls=server.urls, rate=None, retries=0))
+        for _ in range(2):
+            krx.get_symbols_data(['20210129', '20210226', '20210331'], workers=3)
+        stats = krx.session.stats().set_index('endpoint')['count']
+    assert stats['data:dbms/comm/finder/finder_equidx'] == 2
+    assert stats['data:dbms/MDC/STAT/standard/MDCSTAT00601'] == 12
+
+
+def test_rate_scales_with_fanout():
+    session = krx.KrxSession(rate=1000)
+    with session.fanout(4):
+        with session.fanout(4):
+            session._throttle()
+            start = session._next
+            session._throttle()
+            assert session._next - start == pytest.approx(1 / 8000)
+    assert session._fanout == 0
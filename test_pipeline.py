@@ -0,0 +1,92 @@
+import pandas as pd
+import os
+import pytest
+import util as ut
+import pipeline
+
+
+# 단계 결과 캐시와 완료 표시: 실패한 뒤 다시 실행하면 끝난 단계는 반복하지 않고, 저장은 중복되지 않음
+
+def _graph(tmp_path, db, calls, fail=None):
+    def month_end(month):
+        calls.append('month_end')
+        return pd.DataFrame({'base_mt': [month] * 2, 'sym_cd': ['000010', '000020'], 'v': [1.0, 2.0]})
+
+    def daily(month_end):
+        calls.append('daily')
+        if fail == 'daily':
+            raise ValueError('daily')
+        return month_end.assign(v=month_end.v * 10)
+
+    pipe = pipeline.Pipeline('test', workers=2, path=str(tmp_path / 'cache') + '/')
+    pipe.add('month_end', month_end, ['month'],
+             store=lambda df: db.upsert('month_end', df, ['base_mt', 'sym_cd']))
+    pipe.add('daily', daily, ['month_end'], store=lambda df: db.upsert('daily', df, ['base_mt', 'sym_cd']))
+    return pipe
+
+
+def test_resume_after_failure(tmp_path):
+    db = ut.DbTools('pipe', path=str(tmp_path) + '/')
+    calls = []
+    with pytest.raises(RuntimeError):
+        _graph(tmp_path, db, calls, fail='daily').run(month='2021-05')
+    assert _graph(tmp_path, db, []).status(month='2021-05') == {'month_end': True, 'daily': False}
+
+    calls = []
+    result = _graph(tmp_path, db, calls).run(month='2021-05')
+    assert calls == ['daily']
+    assert result['daily'].v.tolist() == [10.0, 20.0]
+    assert len(db.read('month_end')) == 2
+
+
+def test_completed_run_is_not_repeated(tmp_path):
+    db = ut.DbTools('pipe', path=str(tmp_path) + '/')
+    _graph(tmp_path, db, []).run(month='2021-05')
+    pipe = _graph(tmp_path, db, [])
+    assert all(pipe.status(month='2021-05').values())
+
+    # 결과 파일은 지워졌지만 완료 표시가 남아 있어 다시 실행하지 않음
+    calls = []
+    assert _graph(tmp_path, db, calls).run(month='2021-05') == {'month_end': None, 'daily': None}
+    assert calls == []
+
+    # 후속 단계만 완료 표시가 없으면 결과 파일이 지워진 선행 단계도 다시 실행하고, upsert라 행은 중복되지 않음
+    fingerprints = pipe._fingerprints({'month_end', 'daily'}, {'month': '2021-05'})
+    os.remove(pipe._file('daily', fingerprints['daily']) + '.stored')
+    calls = []
+    _graph(tmp_path, db, calls).run(month='2021-05')
+    assert calls == ['month_end', 'daily']
+    assert len(db.read('month_end')) == 2
+    assert len(db.read('daily')) == 2
+
+
+# 단계 결과 캐시 키: 입력값이나 단계 버전이 바뀌면 다시 실행하고, 같은 입력의 결과 파일은 다시 계산하지 않음
+
+def test_fingerprint_changes_rerun(tmp_path):
+    db = ut.DbTools('pipe', path=str(tmp_path) + '/')
+    _graph(tmp_path, db, []).run(month='2021-05')
+
+    calls = []
+    _graph(tmp_path, db, calls).run(month='2021-06')
+    assert calls == ['month_end', 'daily']
+    assert len(db.read('month_end')) == 4
+
+    # daily 버전만 바뀌면 결과 파일이 지워진 month_end도 다시 계산하지만 저장은 upsert라 중복되지 않음
+    calls = []
+    pipe = _graph(tmp_path, db, calls)
+    pipe.stages['daily'].version = '2'
+    assert pipe.status(month='2021-06') == {'month_end': True, 'daily': False}
+    pipe.run(month='2021-06')
+    assert calls == ['month_end', 'daily']
+    assert len(db.read('daily')) == 4
+
+    # 결과 파일이 남아 있으면 (실패한 실행) 다시 계산하지 않고 불러옴
+    calls = []
+    for fail in ['daily', None]:
+        pipe = _graph(tmp_path, db, calls, fail=fail)
+        pipe.stages['daily'].version = '3'
+        try:
+            pipe.run(month='2021-06')
+        except RuntimeError:
+            assert fail == 'daily'
+    assert calls == ['month_end', 'daily', 'daily']
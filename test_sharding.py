@@ -0,0 +1,26 @@
+import pandas as pd
+import numpy as np
+import sharding
+
+
+# 종목 구간별로 나누어 여러 프로세스에서 실행한 결과가 한 프로세스에서 실행한 결과와 같음
+
+def _cumulative(data, extra, scale=1):
+    # 종목별 누적합 (입력은 sym_cd로 안정 정렬되어 들어옴)
+    result = data.assign(c=data.groupby('sym_cd').v.cumsum() * scale)
+    return result if extra is None else result.merge(extra, how='left', on='sym_cd')
+
+
+def test_sharded_equals_single():
+    rng = np.random.default_rng(0)
+    symbols = np.array([f'{i:06d}' for i in range(40)])
+    data = pd.DataFrame({'sym_cd': rng.choice(symbols, 2000), 'v': rng.normal(size=2000)})
+    data['mkt_cd'] = pd.Categorical(np.where(data.index % 2, 'STK', 'KSQ'))
+    extra = pd.DataFrame({'sym_cd': symbols, 'nm': ['종목' + s for s in symbols]})
+
+    single = sharding.run_sharded(_cumulative, [data, extra], workers=1, scale=2)
+    sharded = sharding.run_sharded(_cumulative, [data, extra], workers=2, shards=5, min_rows=0, scale=2)
+    pd.testing.assert_frame_equal(sharded, single)
+    assert sharded.mkt_cd.dtype == 'category'
+    pd.testing.assert_frame_equal(sharding.run_sharded(_cumulative, [data, None], workers=2, min_rows=0),
+                                  sharding.run_sharded(_cumulative, [data, None], workers=1))
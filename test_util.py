@@ -0,0 +1,252 @@
+import pandas as pd
+import numpy as np
+import os
+import util as ut
+
+
+# DbTools 컬럼 그룹(add_columns) 테이블에 append할 때 저장된 자료형 유지
+
+def _grouped(tmp_path):
+    db = ut.DbTools('groups', path=str(tmp_path) + '/')
+    db.put('t', pd.DataFrame({'base_dt': ['20210104', '20210105'], 'sym_cd': ['000010', '000020'], 'v': [1.0, 2.0]}))
+    # 키가 없는 행이 있어 새 컬럼 x는 결측값이 포함된 float64로, nm은 문자열로 저장됨
+    db.add_columns('t', pd.DataFrame({'base_dt': ['20210104'], 'sym_cd': ['000010'], 'x': [7], 'nm': ['a']}),
+                   on=['base_dt', 'sym_cd'])
+    return db
+
+
+def test_append_int_into_float_group(tmp_path):
+    db = _grouped(tmp_path)
+    db.append('t', pd.DataFrame({'base_dt': ['20210106'], 'sym_cd': ['000010'], 'v': [3.0], 'x': [8]}))
+    data = db.read('t')
+    assert data.x.dtype == np.float64
+    assert data.x.iloc[-1] == 8
+    assert len(data) == 3
+
+
+def test_append_without_group_column(tmp_path):
+    db = _grouped(tmp_path)
+    db.append('t', pd.DataFrame({'base_dt': ['20210106'], 'sym_cd': ['000030'], 'v': [3.0]}))
+    data = db.read('t')
+    assert data.x.dtype == np.float64
+    assert np.isnan(data.x.iloc[-1])
+    assert data.nm.iloc[0] == 'a'
+    assert data.sym_cd.tolist() == ['000010', '000020', '000030']
+
+
+# 키 컬럼 인덱스: append는 점진 갱신, rebuild_indexes/append_chunks에서만 완전 정렬 인덱스로 다시 만듦
+
+def _frame(dates, symbols=3):
+    return pd.DataFrame({'base_dt': np.repeat(dates, symbols),
+                         'sym_cd': np.tile([f'{i:06d}' for i in range(symbols)], len(dates)),
+                         'v': np.arange(len(dates) * symbols, dtype=float)})
+
+
+def _csi(db, table):
+    db.open()
+    indexes = db.store.get_storer(table).table.colindexes
+    result = {c: bool(indexes[c].is_csi) for c in ['base_dt', 'sym_cd']}
+    db.close()
+    return result
+
+
+def test_append_keeps_index_usable(tmp_path):
+    db = ut.DbTools('index', path=str(tmp_path) + '/', compact=True)
+    db.put('t', _frame(['20210104', '20210105']))
+    assert _csi(db, 't') == {'base_dt': True, 'sym_cd': True}
+    db.append('t', _frame(['20210106']))
+    assert db.read('t', query='base_dt >= "20210105" & sym_cd == "000001"').v.tolist() == [4.0, 1.0]
+    assert db.meta('t')['max']['base_dt'] == '20210106'
+    db.rebuild_indexes('t')
+    assert _csi(db, 't') == {'base_dt': True, 'sym_cd': True}
+
+
+def test_append_chunks_rebuilds_index_once(tmp_path):
+    db = ut.DbTools('index', path=str(tmp_path) + '/', compact=True)
+    chunks = (_frame([d]) for d in ['20210104', '20210105', '20210106'])
+    assert db.append_chunks('t', chunks, batch_rows=1) == 9
+    assert _csi(db, 't') == {'base_dt': True, 'sym_cd': True}
+    assert sorted(db.index_positions('t', 'base_dt', 0, 3, ascending=False)) == [6, 7, 8]
+
+
+# 읽기 캐시: cached=True로 읽은 결과만 보관하고, 테이블의 마지막 쓰기 시각이 바뀌면 다시 읽음
+
+def test_read_cache_opt_in(tmp_path):
+    db = ut.DbTools('cache', path=str(tmp_path) + '/')
+    db.put('t', _frame(['20210104']))
+    hits = ut.DbTools.cache.hits
+    db.read('t')
+    db.read('t')
+    assert ut.DbTools.cache.hits == hits
+    db.read('t', cached=True)
+    assert len(db.read('t', cached=True)) == 3
+    assert ut.DbTools.cache.hits == hits + 1
+
+
+def test_read_cache_detects_outside_write(tmp_path, monkeypatch):
+    db = ut.DbTools('cache', path=str(tmp_path) + '/')
+    db.put('t', _frame(['20210104']))
+    assert len(db.read('t', cached=True)) == 3
+    # 다른 프로세스의 쓰기처럼 캐시 삭제 없이 테이블을 바꿈
+    monkeypatch.setattr(ut.DbTools.cache, 'invalidate', lambda *args, **kwargs: None)
+    ut.DbTools('cache', path=str(tmp_path) + '/').append('t', _frame(['20210105']))
+    assert len(db.read('t', cached=True)) == 6
+
+
+# 종목 등록부: remove/upsert는 지운 행이 속한 종목 중 경계값이 바뀐 종목만 다시 읽음
+
+def _registry(db, table):
+    db.open()
+    registry, scanned = db._get_meta(table)['registry'], db._scan_registry(table)
+    db.close()
+    return registry, scanned
+
+
+def test_upsert_updates_registry_without_scan(tmp_path, monkeypatch):
+    db = ut.DbTools('registry', path=str(tmp_path) + '/', compact=True)
+    db.put('t', _frame(['20210104', '20210105', '20210106']))
+    scans = []
+    scan = ut.DbTools._scan_registry
+    monkeypatch.setattr(ut.DbTools, '_scan_registry', lambda self, table, symbols=None:
+                        scans.append(symbols) or scan(self, table, symbols))
+
+    db.upsert('t', _frame(['20210106']).assign(v=-1.0), ['sym_cd', 'base_dt'])
+    assert scans == []
+    db.remove('t', 'base_dt >= "20210106" & sym_cd == "000001"')
+    assert [list(s) for s in scans] == [['000001']]
+    db.remove('t', 'sym_cd == "000002"')
+
+    registry, scanned = _registry(db, 't')
+    assert registry.index.tolist() == ['000000', '000001']
+    assert registry.last_dt.tolist() == [20210106, 20210105]
+    assert registry.first_dt.dtype == np.int32
+    pd.testing.assert_frame_equal(registry, scanned, check_index_type=False, check_names=False)
+
+
+# compact 저장: 사전 값 목록/종목 등록부 노드를 포함해도 파일 크기가 줄어듦
+
+def _month_end(months=6, symbols=2000):
+    dates = pd.date_range('2021-01-01', periods=months, freq='ME').strftime('%Y%m%d')
+    data = pd.DataFrame({'base_dt': np.repeat(dates, symbols),
+                         'sym_cd': np.tile([f'{i:06d}' for i in range(symbols)], months)})
+    return data.assign(sym_nm='종목' + data.sym_cd, mkt_cd=np.where(data.index % 2, 'STK', 'KSQ'),
+                       sym_obj='True', v=1.0)
+
+
+def test_compact_file_is_smaller(tmp_path):
+    data = _month_end()
+    plain = ut.DbTools('plain', path=str(tmp_path) + '/')
+    compact = ut.DbTools('compact', path=str(tmp_path) + '/', compact=True)
+    plain.put('month_end', data)
+    compact.put('month_end', data)
+    compact.append('month_end', data.assign(base_dt='20210730'))
+    plain.append('month_end', data.assign(base_dt='20210730'))
+    assert os.path.getsize(compact.path) < 0.9 * os.path.getsize(plain.path)
+    # 사전 값 목록과 등록부는 값 크기만큼만 차지
+    assert compact.stats().meta_bytes.iloc[0] < 100000
+    pd.testing.assert_frame_equal(compact.read('month_end'), plain.read('month_end'))
+    assert compact.registry('month_end').sym_obj.all()
+
+
+def test_rename_keeps_side_nodes(tmp_path):
+    db = _grouped(tmp_path)
+    db.rename('t', 'u')
+    assert db.tables == ['/u']
+    data = db.read('u')
+    assert data.nm.iloc[0] == 'a'
+    assert data.x.iloc[0] == 7
+
+
+# 컬럼 그룹의 컬럼을 참조하는 조건식: 필요한 컬럼만 읽어 합친 뒤 pandas로 조건을 적용
+
+def test_query_on_group_column(tmp_path):
+    db = _grouped(tmp_path)
+    db.append('t', pd.DataFrame({'base_dt': ['20210106'], 'sym_cd': ['000010'], 'v': [3.0], 'x': [8], 'nm': ['b']}))
+    assert db.read('t', query='x > 7').v.tolist() == [3.0]
+    assert db.read('t', 'v', query='nm = "a" | base_dt >= "20210105" & x > 0').v.tolist() == [1.0, 3.0]
+    assert db.positions('t', 'nm in ["a", "b"]').tolist() == [0, 2]
+    assert pd.concat(db.read_chunks('t', query='x >= 7', chunksize=1, by='sym_cd')).v.tolist() == [1.0, 3.0]
+    db.remove('t', 'x = 7')
+    data = db.read('t')
+    assert data.v.tolist() == [2.0, 3.0]
+    assert data.nm.tolist()[1] == 'b'
+
+
+# 메타데이터가 없는 예전 테이블: 달력처럼 읽기만 하는 곳에서는 파일에 메타데이터를 쓰지 않음
+
+def test_meta_without_save_leaves_file(tmp_path):
+    db = ut.DbTools('legacy', path=str(tmp_path) + '/')
+    db.put('holidays', pd.DataFrame({'h_day': ['2021-01-01', '2021-02-11']}))
+    db.open()
+    del db.store.get_storer('holidays').attrs.db_meta
+    db.close()
+    assert db.meta('holidays', save=False)['nrows'] == 2
+    assert ut.Calendar('legacy', path=str(tmp_path) + '/').days('M')[0] == np.datetime64('2000-01-31')
+    db.open()
+    assert 'db_meta' not in db.store.get_storer('holidays').attrs
+    db.close()
+    assert 'updated' in db.meta('holidays')
+
+
+# compact 인코딩: 날짜는 int32, 사전 컬럼은 값 목록의 코드로 저장하고 읽을 때 결측값까지 원래 값으로 복원
+
+def test_compact_round_trip(tmp_path):
+    data = pd.DataFrame({'base_dt': ['20210104', None, '20210105'], 'sym_cd': ['000010', '000020', '000010'],
+                         'mkt_cd': ['STK', None, 'KSQ'], 'v': [1.0, np.nan, 3.0]})
+    more = pd.DataFrame({'base_dt': ['20210106'], 'sym_cd': ['000030'], 'mkt_cd': ['KNX'], 'v': [4.0]})
+    db = ut.DbTools('compact', path=str(tmp_path) + '/', compact=True)
+    db.put('t', data)
+    db.append('t', more)
+
+    db.open()
+    stored = db.store.select('t')
+    db.close()
+    assert stored.base_dt.tolist() == [20210104, 0, 20210105, 20210106]
+    assert stored.mkt_cd.tolist() == [0, -1, 1, 2]
+    assert stored.sym_cd.dtype == np.int32
+    pd.testing.assert_frame_equal(db.read('t').reset_index(drop=True), pd.concat([data, more], ignore_index=True))
+    assert db.read('t', ['mkt_cd'], query='base_dt >= "20210105"').mkt_cd.tolist() == ['KSQ', 'KNX']
+
+
+# upsert: 키가 같은 행은 교체하고, scope 조건에 해당하는 기존 행은 새 데이터에 없으면 삭제
+
+def test_upsert_scope(tmp_path):
+    db = ut.DbTools('upsert', path=str(tmp_path) + '/', compact=True)
+    db.put('t', _frame(['20210104', '20210105']))
+    keys = ['sym_cd', 'base_dt']
+
+    db.upsert('t', _frame(['20210105'], symbols=2).assign(v=-1.0), keys, scope='base_dt = "20210105"')
+    data = db.read('t')
+    assert data.groupby('base_dt').size().tolist() == [3, 2]
+    assert data[data.base_dt == '20210105'].v.tolist() == [-1.0, -1.0]
+    assert db.registry('t').last_dt.tolist() == [20210105, 20210105, 20210104]
+
+    # scope가 없으면 일치하지 않는 기존 행은 남기고 새 키는 추가
+    db.upsert('t', _frame(['20210105', '20210106'], symbols=1).assign(v=-2.0), keys)
+    data = db.read('t')
+    assert len(data) == 6
+    assert data[data.sym_cd == '000000'].v.tolist() == [0.0, -2.0, -2.0]
+    assert db.meta('t')['nrows'] == 6
+    assert db.last('t', 'base_dt') == '20210106'
+
+
+# 영업일 계산: 배열 입력 결과가 날짜(구간)별 스칼라 계산 결과와 같음
+
+def test_calendar_batch_matches_scalar():
+    dates = ['2021-01-01', '2021-01-04', '2021-02-13', '2021-12-31']
+    shifted = ut.calendar.shift(dates, [1, -1, 0, 2])
+    assert list(shifted) == [ut.calendar.shift(d, n).to_datetime64() for d, n in zip(dates, [1, -1, 0, 2])]
+    assert ut.calendar.count_between(dates[:-1], dates[1:], 'M').tolist() == \
+        [ut.calendar.count_between(s, e, 'M') for s, e in zip(dates[:-1], dates[1:])]
+
+    ranges = [['2021-01', '2021-03'], ['2020-12-15', '2021-02-10'], '2021-05', '20210514']
+    start, end = (np.concatenate(b) for b in zip(*[ut._workdays_range(r) for r in ranges]))
+    for last, freq in [(True, 'D'), (True, 'M'), (True, 'ME'), (True, 'Q'), (True, 'Y'),
+                       (False, 'D'), (False, 'M'), (False, 'Q'), (False, 'Y')]:
+        first, final = ut.workdays_offset_batch(start, end, last, freq)
+        for i, r in enumerate(ranges):
+            expected = ut.workdays_offset(r, last, freq)
+            if len(expected):
+                assert (first[i], final[i]) == (expected[0].to_datetime64(), expected[-1].to_datetime64())
+            else:
+                assert np.isnat(first[i]) and np.isnat(final[i])
@@ -1,140 +1,2052 @@
 import pandas as pd
+import numpy as np
+import tables
+import collections
+import contextlib
+import threading
+import functools
+import shutil
+import pickle
+import json
+import time
+import ast
+import re
 import os
+import perf
 
 
 # 데이터베이스 In / Out 관련
 
+def _locked(func):
+    # DbTools.lock을 잡은 상태에서 실행 (HDF5 파일 접근을 스레드 간에 직렬화)
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        with DbTools.lock:
+            return func(*args, **kwargs)
+    return wrapper
+
+
+class ReadCache:
+    """
+    DbTools.read(cached=True) 결과를 메모리에 보관하는 LRU 캐시 (바이트 용량 제한).
+    키는 (파일, 테이블, 컬럼, 조건, start, stop)이며, 항목마다 저장 당시 테이블의 마지막 쓰기 시각(db_meta['updated'])을
+    함께 보관해서 다른 프로세스나 다른 객체가 테이블을 바꾼 경우에도 오래된 결과를 돌려주지 않음.
+    같은 객체로 쓰기가 일어나면 해당 테이블 항목을 바로 삭제함
+    """
+
+    def __init__(self, max_bytes=512 * 2 ** 20):
+        self.max_bytes = max_bytes
+        self.nbytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._items = collections.OrderedDict()
+
+    @staticmethod
+    def key(path, table, col, query, start, stop):
+        col = tuple(col) if isinstance(col, (list, tuple)) else col
+        return path, '/' + table.strip('/'), col, query, start, stop
+
+    def get(self, key, stamp):
+        if key in self._items and self._items[key][2] != stamp:
+            # 저장 후 테이블이 바뀐 항목
+            self.nbytes -= self._items.pop(key)[1]
+        if key not in self._items:
+            self.misses += 1
+            return None
+        self.hits += 1
+        self._items.move_to_end(key)
+        return self._items[key][0].copy()
+
+    def put(self, key, data, stamp):
+        nbytes = int(data.memory_usage(deep=True).sum()) if isinstance(data, pd.DataFrame) \
+            else int(data.memory_usage(deep=True))
+        if nbytes > self.max_bytes:
+            return
+        if key in self._items:
+            self.nbytes -= self._items.pop(key)[1]
+        self._items[key] = (data.copy(), nbytes, stamp)
+        self.nbytes += nbytes
+        while self.nbytes > self.max_bytes:
+            self.nbytes -= self._items.popitem(last=False)[1][1]
+            self.evictions += 1
+
+    def invalidate(self, path, table=None):
+        table = '/' + table.strip('/') if table else None
+        for key in [k for k in self._items if k[0] == path and (table is None or k[1] == table)]:
+            self.nbytes -= self._items.pop(key)[1]
+
+    def clear(self):
+        self._items.clear()
+        self.nbytes = 0
+
+    def stats(self):
+        total = self.hits + self.misses
+        return {'hits': self.hits, 'misses': self.misses, 'hit_ratio': self.hits / total if total else 0.0,
+                'evictions': self.evictions, 'entries': len(self._items), 'bytes': self.nbytes,
+                'max_bytes': self.max_bytes}
+
+
 class DbTools:
 
-    def __init__(self, file):
-        path = os.path.dirname(__file__) + '/external_files/hdf_data/'
-        self.store = pd.HDFStore(path + file + '.h5')
+    # 세션 중인 파일별 공유 핸들 {파일경로: [HDFStore, 중첩 깊이]}
+    _sessions = {}
+
+    # 모든 DbTools 객체가 공유하는 읽기 캐시 (read(cached=True)로 읽은 결과만 보관, 크기는 cache.max_bytes)
+    cache = ReadCache(256 * 2 ** 20)
+
+    # upsert 등 여러 번의 쓰기를 묶어 처리하는 동안 인덱스/메타데이터 갱신을 미루는지 여부
+    _deferred = False
+
+    # 미루는 동안 append한 행의 종목 등록부 (remove에서 지운 행의 첫/마지막 base_dt를 대신하는지 확인)
+    _appended = None
+
+    # 완전 정렬 인덱스(CSI)를 유지하고 메타데이터에 경계값을 기록할 키 컬럼
+    key_cols = ['base_dt', 'base_mt', 'sym_cd', 'quarter', 'h_day']
+
+    # compact 저장 시 int32로 저장할 날짜 문자열 컬럼과 그 형식 (읽을 때 같은 형식의 문자열로 복원)
+    date_formats = {'base_dt': '%Y%m%d', 'base_mt': '%Y-%m', 'h_day': '%Y-%m-%d', 'quarter': '%Y%m', 'year': '%Y'}
+
+    # compact 저장 시 사전 인코딩(int32 코드 + 값 목록)으로 저장할 문자열 컬럼
+    dict_cols = ['sym_cd', 'sym_nm', 'mkt_cd', 'sec_krx']
+
+    # 종목 목록, 사전 값 목록 등 속성(attrs)에 담기에 큰 보조 데이터를 저장하는 경로
+    side_root = '/db_meta'
+
+    # HDF5 라이브러리는 스레드 안전하지 않으므로 공개 메서드는 호출 단위로 이 잠금을 잡음
+    # (여러 번의 호출을 하나의 작업으로 묶어야 할 때는 with DbTools.lock: 으로 감쌈)
+    lock = threading.RLock()
+
+    # put/remove로 빈 공간이 생긴 파일 경로 (maintain에서 repack_threshold 확인 대상)
+    _freed = set()
+
+    # 자동 repack을 하지 않는 최소 파일 크기 (작은 파일은 HDF5 메타데이터 비중이 커서 빈 공간 비율이 과대평가됨)
+    repack_min_bytes = 16 * 2 ** 20
+
+    # 압축 프로파일 {이름: (complib, complevel)}
+    profiles = {None: (None, None),
+                'lz4': ('blosc:lz4', 5),
+                'zstd': ('blosc:zstd', 5),
+                'max': ('blosc:zstd', 9)}
+
+    def __init__(self, file, path=None, compact=False, profile=None, repack_threshold=None):
+        """
+        Parameters
+        ----------
+        file : str
+            HDF5 파일명 (external_files/hdf_data/<file>.h5)
+        path : str, optional
+            파일이 위치한 디렉터리 (기본값은 external_files/hdf_data/)
+        compact : bool
+            True이면 put으로 새로 만드는 테이블의 날짜 컬럼은 int32로, 종목/업종 등 문자열 컬럼은
+            사전 인코딩하여 저장 (기존 테이블은 생성 당시의 저장 형식을 따름)
+        profile : str, optional
+            압축 프로파일 ('lz4', 'zstd', 'max'). None이면 압축하지 않음
+        repack_threshold : float, optional
+            put/remove 후 maintain을 호출했을 때 빈 공간 비율(free_space의 reclaimable_ratio)이 이 값 이상이면 repack
+            (repack_min_bytes보다 작은 파일은 제외)
+        """
+        path = path if path else os.path.dirname(__file__) + '/external_files/hdf_data/'
+        self.path = os.path.abspath(path + file + '.h5')
+        self.compact = compact
+        self.complib, self.complevel = self.profiles[profile]
+        self.repack_threshold = repack_threshold
+        self.store = pd.HDFStore(self.path)
         self.close()
 
+    def _invalidate(self, table):
+        DbTools.cache.invalidate(self.path, table)
+
+    def _stamp(self, table):
+        # 캐시 항목의 유효성 확인용 마지막 쓰기 시각 (메타데이터가 없는 테이블은 None으로 캐시하지 않음)
+        attrs = self.store.get_storer(table).attrs
+        return attrs.db_meta.get('updated') if 'db_meta' in attrs else None
+
+    @property
+    def in_session(self):
+        return self.path in DbTools._sessions
+
     def open(self):
-        self.store.open()
+        # 세션 중이면 같은 파일의 공유 핸들을 그대로 사용
+        if self.in_session:
+            self.store = DbTools._sessions[self.path][0]
+        else:
+            self.store.open()
 
     def close(self):
-        self.store.close()
+        if not self.in_session:
+            self.store.close()
+
+    @contextlib.contextmanager
+    def session(self):
+        """
+        파일 핸들 하나를 열어둔 채로 여러 번의 읽기/쓰기를 처리하는 세션(컨텍스트 매니저).
+        같은 파일을 가리키는 DbTools 객체들은 세션 동안 핸들을 공유하며,
+        중첩된 세션은 가장 바깥 세션이 끝날 때 한 번만 flush 후 파일을 닫음
+
+        Examples
+        --------
+        >>> with raw.session():
+        ...     raw.remove('holidays', 'h_day>="2021"')
+        ...     raw.append('holidays', df_h)
+        """
+        with DbTools.lock:
+            if self.in_session:
+                DbTools._sessions[self.path][1] += 1
+            else:
+                self.store.open()
+                DbTools._sessions[self.path] = [self.store, 1]
+            self.store = DbTools._sessions[self.path][0]
+
+        try:
+            yield self
+        finally:
+            with DbTools.lock:
+                entry = DbTools._sessions[self.path]
+                entry[1] -= 1
+                if entry[1] == 0:
+                    del DbTools._sessions[self.path]
+                    if entry[0].is_open:
+                        entry[0].flush(fsync=True)
+                    entry[0].close()
+
+    @classmethod
+    def flush_sessions(cls):
+        """세션 중인 모든 파일의 쓰기 내용을 디스크에 반영 (세션이 끝나기 전에 완료 여부를 기록해야 할 때 사용)"""
+        with cls.lock:
+            for store, _ in cls._sessions.values():
+                if store.is_open:
+                    store.flush(fsync=True)
 
     @property
+    @perf.traced('db')
+    @_locked
     def tables(self):
         self.open()
-        table = self.store.keys()
+        table = [key for key in self.store.keys() if not key.startswith(self.side_root + '/')]
         self.close()
         return table
 
+    @perf.traced('db')
+    @_locked
     def put(self, table, data):
+        self._invalidate(table)
+        DbTools._freed.add(self.path)
         self.open()
-        self.store.put(table, data, 't', data_columns=True)
+        if self._side(table) in self.store:
+            self.store.remove(self._side(table))
+        schema = self._new_schema(data)
+        stored, schema = self._encode(data, schema)
+        self.store.put(table, stored, 't', data_columns=True, index=False,
+                       complib=self.complib, complevel=self.complevel)
+        self._set_schema(table, schema)
+        self._index(table)
+        self._set_meta(table, self._frame_meta(data))
         self.close()
 
+    @perf.traced('db')
+    @_locked
     def append(self, table, data):
+        self._invalidate(table)
         self.open()
-        self.store.append(table, data, 't', data_columns=True)
+        exists = table in self.store
+        # 기존 메타데이터는 추가하기 전에 읽음 (등록부가 없는 기존 테이블은 이때 한 번 스캔해서 만듦)
+        meta = self._get_meta(table) if exists and 'db_meta' in self.store.get_storer(table).attrs else None
+        groups = self._groups(table) if exists else {}
+        for group, columns in groups.items():
+            self._write_group(group, data.reindex(columns=columns), append=True)
+        data = data.drop(columns=[c for columns in groups.values() for c in columns], errors='ignore')
+        stored, schema = self._encode(data, self._schema(table) if exists else self._new_schema(data))
+        self.store.append(table, stored, 't', data_columns=True, index=False,
+                          complib=self.complib, complevel=self.complevel)
+        self._set_schema(table, schema)
+        self._index(table)
+        if meta is not None:
+            new = self._frame_meta(data)
+            if self._deferred and 'registry' in new:
+                self._appended = self._merge_registry(self._appended, new['registry'])
+            self._set_meta(table, self._merge_meta(meta, new))
+        else:
+            self._set_meta(table, self._scan_meta(table))
         self.close()
 
+    @perf.traced('db')
+    def append_chunks(self, table, chunks, batch_rows=200000, checkpoint=None):
+        """
+        데이터프레임 조각들을 받는 대로 batch_rows행 이상씩 모아 테이블에 추가 (전체 결과를 메모리에 모으지 않음).
+        조각 하나는 나누지 않고 한 배치에 저장되며, 배치마다 파일에 반영(flush)되므로
+        중간에 멈추더라도 그 전까지 저장된 조각들은 온전히 남아 있음
+
+        Parameters
+        ----------
+        table : str
+            테이블명 (없으면 첫 배치로 생성)
+        chunks : iterable of pd.DataFrame
+            데이터프레임 조각들 (제너레이터 등)
+        batch_rows : int
+            한 번에 저장할 최소 행 수
+        checkpoint : str, optional
+            주어지면 배치를 이 컬럼 순으로 정렬해서 저장하고, 배치가 파일에 반영된 뒤 이 컬럼의 최대값을
+            완료 표시로 기록 (checkpoint 메서드로 조회). 조각들은 이 컬럼의 오름차순으로 들어와야 하며,
+            완료 표시보다 큰 값의 행은 중간에 멈춘 배치의 일부일 수 있음
+
+        Returns
+        -------
+        int (저장한 행 수)
+        """
+        buffer, rows, total = [], 0, 0
+
+        def flush():
+            data = pd.concat(buffer, ignore_index=True)
+            if checkpoint:
+                data = data.sort_values(checkpoint, kind='stable', ignore_index=True)
+            self.append(table, data)
+            if self.in_session:
+                self.store.flush(fsync=True)
+            if checkpoint:
+                self.set_checkpoint(table, {checkpoint: data[checkpoint].max()})
+            buffer.clear()
+
+        for chunk in chunks:
+            if chunk.empty:
+                continue
+            buffer.append(chunk)
+            rows += len(chunk)
+            if rows >= batch_rows:
+                flush()
+                total, rows = total + rows, 0
+        if buffer:
+            flush()
+            total += rows
+        # 배치마다 점진 갱신된 인덱스는 마지막에 한 번만 완전 정렬 인덱스로 다시 만듦
+        if total:
+            self.rebuild_indexes(table)
+        return total
+
+    @_locked
+    def checkpoint(self, table):
+        """append_chunks(checkpoint=)로 마지막으로 완료된 배치의 {컬럼: 최대값} (기록이 없으면 None)"""
+        self.open()
+        attrs = self.store.get_storer(table).attrs
+        value = dict(attrs.db_checkpoint) if 'db_checkpoint' in attrs else None
+        self.close()
+        return value
+
+    @_locked
+    def set_checkpoint(self, table, value):
+        """완료 표시를 기록 (None이면 삭제). 적재가 모두 끝난 테이블의 완료 표시를 지울 때 사용"""
+        self.open()
+        attrs = self.store.get_storer(table).attrs
+        if value is None:
+            if 'db_checkpoint' in attrs:
+                del attrs.db_checkpoint
+        else:
+            attrs.db_checkpoint = value
+        if self.in_session:
+            self.store.flush(fsync=True)
+        self.close()
+
+    @perf.traced('db')
+    @_locked
+    def rename(self, table, name):
+        """테이블(보조 노드 포함)의 이름을 바꿈. 데이터를 다시 쓰지 않고 노드만 옮김"""
+        self._invalidate(table)
+        self._invalidate(name)
+        self.open()
+        handle = self.store._handle
+        if name in self.store:
+            self.close()
+            raise ValueError(f'이미 있는 테이블입니다: {name}')
+        side = self._side(table)
+        if side in self.store:
+            if self._side(name) in self.store:
+                handle.remove_node(self._side(name), recursive=True)
+            handle.move_node(side, newparent=self.side_root, newname=name.strip('/'), createparents=True)
+        handle.move_node('/' + table.strip('/'), newparent='/', newname=name.strip('/'))
+        # 컬럼 그룹 경로도 옮긴 보조 노드 경로로 바꿈
+        attrs = self.store.get_storer(name).attrs
+        if 'db_groups' in attrs:
+            groups = {group: self._side(name) + group[len(side):] for group in attrs.db_groups}
+            for group, moved in groups.items():
+                # compact로 저장된 컬럼 그룹의 사전 값 목록
+                if self._side(group) in self.store:
+                    parent, new = self._side(moved).rsplit('/', 1)
+                    handle.move_node(self._side(group), newparent=parent, newname=new, createparents=True)
+            attrs.db_groups = {groups[group]: columns for group, columns in attrs.db_groups.items()}
+        self.close()
+
+    @perf.traced('db')
+    @_locked
     def remove(self, table, query=None):
+        self._invalidate(table)
+        DbTools._freed.add(self.path)
         self.open()
-        self.store.remove(table, where=query)
+        if query is None:
+            self.store.remove(table)
+            if self._side(table) in self.store:
+                self.store.remove(self._side(table))
+            self.close()
+            return
+
+        where = self._where(table, query)
+        groups = self._groups(table)
+        attrs = self.store.get_storer(table).attrs
+        registry = self._get_meta(table).get('registry') if 'db_meta' in attrs else None
+        if groups or registry is not None:
+            # 컬럼 그룹 테이블도 기준 테이블과 같은 행 위치(좌표)를 지워서 행 정렬을 유지
+            where = self._coordinates(table, query)
+
+        # 좌표가 비어 있으면 HDFStore.remove는 테이블 전체를 지우므로 건너뜀
+        if isinstance(where, str) or len(where):
+            if registry is not None:
+                # 등록부는 지울 행이 속한 종목만 다시 계산
+                removed = self._frame_registry(self._decode_registry(table, self.store.select(
+                    table, where=where, columns=self._registry_columns(table))))
+            for group in groups:
+                self.store.remove(group, where=where)
+            self.store.remove(table, where=where)
+            if registry is not None:
+                registry = self._drop_registry(table, registry, removed)
+            if self._deferred:
+                if registry is not None:
+                    self._put_registry(table, registry)
+            else:
+                self._set_meta(table, self._scan_meta(table, registry))
         self.close()
 
-    def read(self, table, col=None, query=None, start=None, stop=None):
-        self.store.open()
-        data = self.store.select_column(table, col, start, stop) if isinstance(col, str) and not query \
-            else self.store.select(table, query, start, stop, col)
+    @perf.traced('db')
+    @_locked
+    def upsert(self, table, data, keys, scope=None):
+        """
+        keys 컬럼 값이 일치하는 기존 행은 data의 행으로 교체하고, 일치하지 않는 행은 추가함
+        (remove 후 append를 하나의 세션에서 처리하며, 새 행을 먼저 추가한 뒤 기존 행을 지우므로
+        중간에 중단되더라도 데이터가 사라지지 않음)
+
+        Parameters
+        ----------
+        table : str
+            테이블명
+        data : pd.DataFrame
+            새로 저장할 데이터 (keys가 중복되면 마지막 행을 사용)
+        keys : list
+            행을 식별하는 키 컬럼 (예: ['sym_cd', 'base_dt'])
+        scope : str, optional
+            교체 범위 조건 (HDF where 구문). 주어지면 이 조건에 해당하는 기존 행은 키 일치 여부와 관계없이 삭제
+        """
+        data = data.drop_duplicates(keys, keep='last')
+
+        with self.session():
+            if table not in self.store:
+                self.append(table, data)
+                return
+
+            coords = self._match_coordinates(table, data, keys)
+            if scope:
+                scoped = self._coordinates(table, scope)
+                coords = np.union1d(coords, scoped)
+            if not len(coords):
+                self.append(table, data)
+                return
+
+            # 추가/삭제마다 인덱스를 다시 만들지 않고 마지막에 한 번만 갱신
+            with self._deferred_index(table):
+                self.append(table, data)
+                if len(coords):
+                    self.remove(table, coords)
+
+    def _match_coordinates(self, table, data, keys):
+        """data의 keys와 일치하는 기존 행의 위치(좌표)를 해시 조인으로 찾음"""
+        if data.empty:
+            return np.array([], dtype='int64')
+
+        # 날짜 키가 있으면 들어온 데이터의 구간으로 먼저 범위를 좁힘 (키 인덱스 사용)
+        date_key = next((k for k in keys if k in self.date_formats), None)
+        where = None
+        if date_key:
+            where = self._where(table, f'{date_key} >= "{data[date_key].min()}" & '
+                                       f'{date_key} <= "{data[date_key].max()}"')
+
+        coords = self.store.select_as_coordinates(table, where)
+        if not len(coords):
+            return np.array([], dtype='int64')
+        saved = self._decode(table, self.store.select(table, where=coords, columns=keys))
+        hit = pd.MultiIndex.from_frame(saved[keys]).isin(pd.MultiIndex.from_frame(data[keys]))
+        return np.asarray(coords)[hit]
+
+    @perf.traced('db')
+    @_locked
+    def read(self, table, col=None, query=None, start=None, stop=None, cached=False):
+        # cached=True이면 같은 인자로 읽은 결과를 DbTools.cache에서 재사용 (테이블이 바뀌었으면 다시 읽음)
+        self.open()
+        key = ReadCache.key(self.path, table, col, query, start, stop)
+        stamp = self._stamp(table) if cached else None
+        data = DbTools.cache.get(key, stamp) if stamp is not None else None
+        if data is None:
+            if isinstance(col, str) and not query:
+                data = self._select_column(table, col, start, stop)
+            elif self._grouped_query(table, query):
+                data = self._select(table, self._coordinates(table, query, start, stop), columns=col)
+            else:
+                data = self._select(table, self._where(table, query), start, stop, col)
+            if stamp is not None:
+                DbTools.cache.put(key, data, stamp)
         self.close()
         return data
 
+    @perf.traced('db')
+    @_locked
+    def add_columns(self, table, data, on):
+        """
+        기존 테이블을 다시 쓰지 않고 새 컬럼들을 별도의 컬럼 그룹 테이블로 저장.
+        컬럼 그룹은 기준 테이블과 행 단위로 정렬되어 있으며, read 시 필요한 경우에만 읽어서 옆으로 붙임
+
+        Parameters
+        ----------
+        table : str
+            기준 테이블명
+        data : pd.DataFrame
+            키 컬럼(on)과 새 컬럼들을 담은 데이터 (키가 없는 행의 새 컬럼은 결측값으로 저장)
+        on : list
+            기준 테이블과 data를 맞출 키 컬럼 (예: ['base_dt', 'sym_cd'])
+        """
+        self._invalidate(table)
+
+        with self.session():
+            groups = self._groups(table)
+            saved = self.store.get_storer(table).table.colnames
+            columns = [c for c in data.columns if c not in on]
+            duplicated = [c for c in columns if c in saved or any(c in cols for cols in groups.values())]
+            if duplicated:
+                raise ValueError(f'{table} 테이블에 이미 있는 컬럼입니다: {duplicated}')
+
+            # 기준 테이블의 키 컬럼만 읽어서 새 컬럼을 행 순서에 맞춤
+            keys = self._decode(table, self.store.select(table, columns=on))
+            aligned = keys.merge(data.drop_duplicates(on, keep='last'), how='left', on=on)
+            aligned.index = keys.index
+
+            group = self._side(table, f'cols_{len(groups) + 1}')
+            self._write_group(group, aligned[columns])
+            groups[group] = columns
+            attrs = self.store.get_storer(table).attrs
+            attrs.db_groups = groups
+            if 'db_meta' in attrs:
+                attrs.db_meta = {**attrs.db_meta, 'updated': time.time_ns()}
+
+    def _groups(self, table):
+        attrs = self.store.get_storer(table).attrs
+        return dict(attrs.db_groups) if 'db_groups' in attrs else {}
+
+    def _write_group(self, group, data, append=False):
+        if append:
+            stored, schema = self._encode(data, self._schema(group))
+            # 컬럼 그룹은 add_columns 당시의 자료형(결측값이 있으면 보통 float64)으로 저장되어 있으므로,
+            # 정수 값이나 빠진 컬럼(reindex로 생긴 결측값)도 저장된 자료형으로 맞춰서 추가
+            stored = stored.astype(self.store.select(group, stop=0).dtypes.to_dict())
+            self.store.append(group, stored, 't', data_columns=True, index=False,
+                              complib=self.complib, complevel=self.complevel)
+        else:
+            stored, schema = self._encode(data, self._new_schema(data))
+            self.store.put(group, stored, 't', data_columns=True, index=False,
+                           complib=self.complib, complevel=self.complevel)
+        self._set_schema(group, schema)
+
+    def _select_column(self, table, col, start=None, stop=None):
+        group = next((g for g, cols in self._groups(table).items() if col in cols), table)
+        return self._decode(group, self.store.select_column(group, col, start, stop))
+
+    def _grouped_query(self, table, query):
+        # 조건식이 컬럼 그룹의 컬럼을 참조하는지 여부
+        if not isinstance(query, str) or not query:
+            return False
+        grouped = {c for cols in self._groups(table).values() for c in cols}
+        return bool(grouped & set(re.findall(r'[A-Za-z_]\w*', query)))
+
+    def _coordinates(self, table, query, start=None, stop=None):
+        """
+        조건식(HDF where)에 맞는 행 위치. 컬럼 그룹의 컬럼은 HDF where로 조건을 걸 수 없으므로,
+        조건식에 쓰인 컬럼만 기준 테이블과 컬럼 그룹에서 읽어 합친 뒤 pandas로 조건을 적용
+        """
+        if not self._grouped_query(table, query):
+            where = self._where(table, query)
+            return np.asarray(self.store.select_as_coordinates(table, where, start, stop), dtype='int64')
+
+        names = set(re.findall(r'[A-Za-z_]\w*', query))
+        grouped = [c for cols in self._groups(table).values() for c in cols]
+        columns = [c for c in self.store.get_storer(table).table.colnames + grouped if c in names and c != 'index']
+        data = self._select(table, None, start, stop, columns)
+        coords = np.arange(*slice(start, stop).indices(self.store.get_storer(table).nrows), dtype='int64')
+        # HDF where의 = 비교는 pandas 조건식의 ==
+        mask = data.reset_index(drop=True).eval(re.sub(r'(?<![=<>!])=(?!=)', '==', query))
+        return coords[np.asarray(mask, dtype=bool)]
+
+    def _select(self, table, where=None, start=None, stop=None, columns=None):
+        """
+        기준 테이블과 컬럼 그룹 테이블을 같은 행 위치로 읽어서 합침
+        (where는 저장 형식으로 바꾼 조건식 또는 행 위치. 컬럼 그룹의 컬럼 조건은 _coordinates로 행 위치를 먼저 구함)
+        """
+        groups = self._groups(table)
+        wanted = {g: [c for c in cols if columns is None or c in columns] for g, cols in groups.items()}
+        wanted = {g: cols for g, cols in wanted.items() if cols}
+        if not wanted:
+            return self._decode(table, self.store.select(table, where, start, stop, columns))
+
+        grouped = [c for cols in groups.values() for c in cols]
+        base_cols = [c for c in columns if c not in grouped] if columns is not None else None
+        coords = self.store.select_as_coordinates(table, where, start, stop)
+        base = self._decode(table, self.store.select(table, coords, columns=base_cols))
+        if base_cols is not None:
+            base = base[base_cols]
+
+        parts = [base] + [self._decode(g, self.store.select(g, coords, columns=cols)).set_axis(base.index)
+                          for g, cols in wanted.items()]
+        data = pd.concat(parts, axis=1)
+        return data[list(columns)] if columns is not None else data
+
+    @perf.traced('db')
+    @_locked
+    def meta(self, table, save=True):
+        """
+        테이블 메타데이터 (데이터를 읽지 않고 쓰기 시점에 갱신된 값을 반환)
+
+        Parameters
+        ----------
+        save : bool
+            메타데이터가 없는 (예전에 만든) 테이블이면 전체를 읽어서 만든 메타데이터를 파일에 저장할지 여부.
+            False이거나 파일에 쓸 수 없으면 저장하지 않고 반환만 함 (이때 updated는 없음)
+
+        Returns
+        -------
+        dict
+            nrows - 행 개수
+            first / last - 키 컬럼별 첫 행 / 마지막 행의 값
+            min / max - 키 컬럼별 최소값 / 최대값
+            n_symbols - 고유 종목(sym_cd) 수
+            updated - 마지막으로 쓰기가 일어난 시각 (ns)
+        """
+        self.open()
+        attrs = self.store.get_storer(table).attrs
+        if 'db_meta' in attrs:
+            meta = attrs.db_meta
+        elif save and os.access(self.path, os.W_OK):
+            self._set_meta(table, self._scan_meta(table))
+            meta = attrs.db_meta
+        else:
+            meta = {k: v for k, v in self._scan_meta(table).items() if k not in ['symbols', 'registry']}
+        self.close()
+        return meta
+
+    @perf.traced('db')
+    @_locked
+    def symbols(self, table):
+        """테이블에 저장된 고유 종목코드 배열 (쓰기 시점에 갱신된 메타데이터를 사용하므로 테이블을 읽지 않음)"""
+        self.meta(table)
+        self.open()
+        symbols = self._get_meta(table).get('symbols', np.array([], dtype=str))
+        self.close()
+        return symbols
+
+    @perf.traced('db')
+    @_locked
+    def registry(self, table):
+        """
+        종목 등록부. 테이블에 저장된 종목별 요약으로, append 때마다 들어온 데이터만으로 갱신되므로
+        종목 유무나 신규 종목 확인에 테이블을 읽지 않음 (행 삭제 후에는 경계값이 바뀐 종목만 다시 읽음)
+
+        Returns
+        -------
+        pd.DataFrame (index: sym_cd, 정렬됨)
+            first_dt / last_dt - 종목의 첫 / 마지막 base_dt를 yyyymmdd 정수(int32)로 (base_dt 컬럼이 있는 테이블)
+            nrows - 종목의 행 수
+            sym_obj - 한 번이라도 분석대상(sym_obj)이었는지 여부 (sym_obj 컬럼이 있는 테이블)
+        """
+        self.meta(table)
+        self.open()
+        registry = self._get_meta(table).get('registry')
+        self.close()
+        return registry
+
+    def first(self, table, col):
+        """테이블 첫 행의 컬럼값 (read(table, col, stop=1).iloc[0]과 동일)"""
+        return self.meta(table)['first'][col]
+
+    def last(self, table, col):
+        """테이블 마지막 행의 컬럼값 (read(table, col, start=-1).iloc[0]과 동일)"""
+        return self.meta(table)['last'][col]
+
+    @contextlib.contextmanager
+    def _deferred_index(self, table):
+        # 블록 안의 쓰기는 인덱스/메타데이터 갱신을 미뤘다가 끝날 때 한 번만 처리
+        t = self.store.get_storer(table).table
+        t.autoindex = False
+        self._deferred = True
+        try:
+            yield
+        finally:
+            self._deferred = False
+            self._appended = None
+            t.autoindex = True
+            t.reindex_dirty()
+            self._index(table)
+            # 등록부는 append/remove에서 갱신된 값을 그대로 사용 (테이블 전체를 다시 읽지 않음)
+            attrs = self.store.get_storer(table).attrs
+            registry = self._get_meta(table).get('registry') if 'db_meta' in attrs else None
+            self._set_meta(table, self._scan_meta(table, registry))
+
+    def _index(self, table, rebuild=False):
+        # 키 컬럼에 인덱스가 없으면 완전 정렬 인덱스(CSI)로 생성. 이후 append는 PyTables가 인덱스를 점진적으로
+        # 갱신하므로(조회에는 그대로 사용, 완전 정렬 상태는 아님) 매번 다시 만들지 않고,
+        # 완전 정렬 상태로 다시 만드는 것(테이블 크기에 비례)은 rebuild=True일 때만 함 (append_chunks 끝, maintain)
+        if self._deferred:
+            return
+        columns = self.store.get_storer(table).table.colnames
+        keys = [c for c in self.key_cols if c in columns]
+        if keys:
+            self.store.create_table_index(table, columns=keys, optlevel=9, kind='full')
+            if rebuild:
+                cols = self.store.get_storer(table).table.cols
+                for c in keys:
+                    if not cols._f_col(c).index.is_csi:
+                        cols._f_col(c).reindex()
+
+    @perf.traced('db')
+    @_locked
+    def rebuild_indexes(self, table=None):
+        """
+        append로 점진 갱신된 키 컬럼 인덱스를 완전 정렬 인덱스(CSI)로 다시 만듦 (이미 CSI인 인덱스는 건너뜀).
+        CSI는 index_positions(정렬 순서 부분 읽기), repack의 재정렬, 메타데이터 재계산에서 사용
+
+        Parameters
+        ----------
+        table : str, optional
+            테이블명 (None이면 파일의 모든 테이블)
+        """
+        names = [table] if table else self.tables
+        with self.session():
+            for name in names:
+                if self.store.get_storer(name).is_table:
+                    self._index(name, rebuild=True)
+
+    def _side(self, table, name=None):
+        key = self.side_root + '/' + table.strip('/')
+        return key + '/' + name if name else key
+
+    # 사전 값 목록과 종목 등록부는 utf-8 고정 길이 문자열의 연속 배열(Array)/테이블 노드로 저장
+    # (pandas의 object 저장은 값 목록마다 큰 청크의 VLArray를 만들어 작은 테이블은 파일이 오히려 커짐)
+
+    def _get_side(self, table, name):
+        key = self._side(table, name)
+        if key not in self.store:
+            return np.array([], dtype=object)
+        node = self.store._handle.get_node(key)
+        if 'pandas_type' in node._v_attrs:
+            # 이전 형식(pandas Series)으로 저장된 값 목록
+            return self.store.get(key).to_numpy(dtype=object)
+        return np.char.decode(node.read(), 'utf-8').astype(object)
+
+    def _put_side(self, table, name, values):
+        # 값 목록은 뒤에 추가만 되므로 길이가 같으면 다시 쓰지 않음
+        key = self._side(table, name)
+        if key in self.store:
+            node = self.store._handle.get_node(key)
+            if 'pandas_type' not in node._v_attrs and len(node) == len(values):
+                return
+            self._remove_side(key)
+        where, name = key.rsplit('/', 1)
+        self.store._handle.create_array(where, name, obj=self._fixed_bytes(values), createparents=True)
+
+    def _remove_side(self, key):
+        if key in self.store:
+            self.store._handle.remove_node(key, recursive=True)
+
+    @staticmethod
+    def _fixed_bytes(values):
+        return np.array([str(v).encode('utf-8') for v in values], dtype=bytes) if len(values) \
+            else np.array([], dtype='S1')
+
+    def _get_meta(self, table):
+        meta = dict(self.store.get_storer(table).attrs.db_meta)
+        if 'n_symbols' in meta:
+            if self._side(table, 'registry') in self.store:
+                meta['registry'] = self._get_registry(table)
+            else:
+                # 등록부가 생기기 전에 만든 테이블은 한 번만 전체를 읽어서 만듦
+                meta['registry'] = self._scan_registry(table)
+                self._put_registry(table, meta['registry'])
+            meta['symbols'] = meta['registry'].index.to_numpy(dtype=str)
+        return meta
+
+    def _set_meta(self, table, meta):
+        # 종목 등록부는 크기가 커서 별도 노드에 저장
+        if 'registry' in meta:
+            self._put_registry(table, meta['registry'])
+        meta = {k: v for k, v in meta.items() if k not in ['symbols', 'registry']}
+        meta['updated'] = time.time_ns()
+        self.store.get_storer(table).attrs.db_meta = meta
+
+    def _get_registry(self, table):
+        key = self._side(table, 'registry')
+        node = self.store._handle.get_node(key)
+        if 'pandas_type' in node._v_attrs:
+            return self._registry_dtypes(self.store.get(key))
+        rows = node.read()
+        index = pd.Index(np.char.decode(rows['sym_cd'], 'utf-8').astype(object), name='sym_cd')
+        return self._registry_dtypes(pd.DataFrame({c: rows[c] for c in rows.dtype.names if c != 'sym_cd'},
+                                                  index=index))
+
+    def _put_registry(self, table, registry):
+        key = self._side(table, 'registry')
+        self._remove_side(self._side(table, 'symbols'))
+        self._remove_side(key)
+        rows = np.rec.fromarrays([self._fixed_bytes(registry.index)] + [registry[c].to_numpy() for c in registry],
+                                 names=['sym_cd'] + list(registry.columns))
+        where, name = key.rsplit('/', 1)
+        # 등록부는 매번 통째로 다시 쓰므로 청크 하나에 모두 담음
+        self.store._handle.create_table(where, name, obj=rows, chunkshape=(max(len(rows), 1),), createparents=True)
+
+    # 종목 등록부 (종목별 첫/마지막 base_dt, 행 수, 분석대상 여부)
+
+    @staticmethod
+    def _frame_registry(data):
+        # 날짜는 yyyymmdd 정수(int32)로 집계 (문자열 min/max는 groupby가 파이썬 객체 비교로 처리되어 느림)
+        data = data[data.sym_cd.notna()]
+        agg = {'nrows': ('sym_cd', 'size')}
+        if 'base_dt' in data.columns:
+            data = data.assign(base_dt=DbTools._date_numbers(data.base_dt))
+            agg.update(first_dt=('base_dt', 'min'), last_dt=('base_dt', 'max'))
+        if 'sym_obj' in data.columns:
+            data = data.assign(sym_obj=data.sym_obj.astype(str) == 'True')
+            agg['sym_obj'] = ('sym_obj', 'any')
+        registry = data.groupby(data.sym_cd.astype(str)).agg(**agg)
+        registry.index.name = 'sym_cd'
+        return DbTools._registry_dtypes(registry)
+
+    @staticmethod
+    def _merge_registry(registry, new):
+        # 종목 수만큼만 계산 (테이블 전체 행 수와 무관)
+        if registry is None:
+            return new
+        agg = {'nrows': 'sum', 'first_dt': 'min', 'last_dt': 'max', 'sym_obj': 'any'}
+        merged = pd.concat([registry, new])
+        merged = merged.groupby(level=0).agg({c: agg[c] for c in merged.columns})
+        return DbTools._registry_dtypes(merged)
+
+    @staticmethod
+    def _registry_dtypes(registry):
+        # 이전 형식(날짜 문자열)으로 저장된 등록부도 정수 날짜로 맞춤
+        dtypes = {'nrows': 'int64', 'first_dt': 'int32', 'last_dt': 'int32', 'sym_obj': bool}
+        registry.index = registry.index.astype(object)
+        for c in ['first_dt', 'last_dt']:
+            if c in registry.columns and not pd.api.types.is_integer_dtype(registry[c]):
+                registry[c] = DbTools._date_numbers(registry[c])
+        return registry.astype({c: dtypes[c] for c in registry.columns})
+
+    def _drop_registry(self, table, registry, removed):
+        """
+        remove한 행의 등록부(removed)를 빼서 등록부를 갱신. 지운 행에 종목의 첫/마지막 base_dt나 분석대상 행이
+        있었고 같은 세션에서 append한 행(_appended)이 대신하지 않는 종목만 테이블에서 다시 읽음
+        """
+        registry = registry.copy()
+        registry['nrows'] -= removed.nrows.reindex(registry.index, fill_value=0)
+        registry = registry[registry.nrows > 0]
+        removed = removed[removed.index.isin(registry.index)]
+        current = registry.loc[removed.index]
+        appended = self._appended if self._appended is not None else removed.iloc[:0]
+        appended = appended[appended.index.isin(removed.index)]
+
+        # 지운 경계값/분석대상 행을 append한 행이 대신하는 종목은 다시 읽지 않음
+        dirty = pd.Series(False, index=removed.index)
+        if 'first_dt' in removed.columns:
+            first = pd.Series(False, index=removed.index)
+            first[appended.index] = appended.first_dt <= current.first_dt[appended.index]
+            last = pd.Series(False, index=removed.index)
+            last[appended.index] = appended.last_dt >= current.last_dt[appended.index]
+            dirty |= (removed.first_dt == current.first_dt) & ~first
+            dirty |= (removed.last_dt == current.last_dt) & ~last
+        if 'sym_obj' in removed.columns:
+            obj = pd.Series(False, index=removed.index)
+            obj[appended.index] = appended.sym_obj
+            dirty |= removed.sym_obj & ~obj
+
+        if dirty.any():
+            rescanned = self._scan_registry(table, dirty.index[dirty])
+            registry = pd.concat([registry.drop(dirty.index[dirty]), rescanned]).sort_index()
+        return self._registry_dtypes(registry)
+
+    def _registry_columns(self, table):
+        return [c for c in ['sym_cd', 'base_dt', 'sym_obj'] if c in self.store.get_storer(table).table.colnames]
+
+    def _scan_registry(self, table, symbols=None):
+        # symbols가 주어지면 sym_cd 컬럼(compact 테이블은 int32 코드)만 전체를 읽고, 해당 종목의 행만 읽음
+        columns = self._registry_columns(table)
+        if symbols is None:
+            return self._frame_registry(self._decode_registry(table, self.store.select(table, columns=columns)))
+
+        schema = self._schema(table)
+        stored = self.store.select_column(table, 'sym_cd')
+        if schema and 'sym_cd' in schema['dicts']:
+            wanted = pd.Index(schema['dicts']['sym_cd']).get_indexer(symbols)
+        else:
+            wanted = np.asarray(symbols, dtype=object)
+        coords = np.flatnonzero(stored.isin(wanted).to_numpy())
+        if not len(coords):
+            return self._frame_registry(pd.DataFrame(columns=columns))
+        data = self.store.select(table, where=coords, columns=columns)
+        return self._frame_registry(self._decode_registry(table, data))
+
+    def _decode_registry(self, table, data):
+        # compact 테이블의 base_dt는 이미 정수 날짜이므로 문자열로 복원하지 않음
+        decoded = self._decode(table, data.drop(columns='base_dt', errors='ignore'))
+        return decoded.assign(base_dt=data.base_dt) if 'base_dt' in data.columns else decoded
+
+    def _frame_meta(self, data):
+        keys = [c for c in self.key_cols if c in data.columns]
+        meta = {'nrows': len(data),
+                'first': data[keys].iloc[0].to_dict() if len(data) else {},
+                'last': data[keys].iloc[-1].to_dict() if len(data) else {},
+                'min': {c: data[c].min() for c in keys} if len(data) else {},
+                'max': {c: data[c].max() for c in keys} if len(data) else {}}
+        if 'sym_cd' in data.columns:
+            meta['registry'] = self._frame_registry(data)
+            meta['symbols'] = meta['registry'].index.to_numpy(dtype=str)
+            meta['n_symbols'] = len(meta['symbols'])
+        return meta
+
+    @staticmethod
+    def _merge_meta(meta, new):
+        if not new['nrows']:
+            return meta
+        merged = {'nrows': meta['nrows'] + new['nrows'],
+                  'first': meta['first'] if meta['nrows'] else new['first'],
+                  'last': new['last'],
+                  'min': {c: min(v, meta['min'][c]) if c in meta['min'] else v for c, v in new['min'].items()},
+                  'max': {c: max(v, meta['max'][c]) if c in meta['max'] else v for c, v in new['max'].items()}}
+        if 'registry' in new:
+            merged['registry'] = DbTools._merge_registry(meta.get('registry'), new['registry'])
+            merged['symbols'] = merged['registry'].index.to_numpy(dtype=str)
+            merged['n_symbols'] = len(merged['symbols'])
+        return merged
+
+    def _scan_meta(self, table, registry=None):
+        # 인덱스와 경계 행만 읽어서 메타데이터를 다시 만듦 (삭제 후, 또는 메타데이터가 없는 기존 테이블)
+        # 종목 등록부는 registry가 주어지면 그대로 쓰고, 없으면 테이블 전체를 읽어서 만듦
+        storer = self.store.get_storer(table)
+        nrows = int(storer.nrows)
+        keys = [c for c in self.key_cols if c in storer.table.colnames]
+        meta = {'nrows': nrows, 'first': {}, 'last': {}, 'min': {}, 'max': {}}
+
+        schema = self._schema(table)
+        coded = schema['dicts'] if schema else {}
+
+        if nrows:
+            for c in keys:
+                meta['first'][c] = self._decode(table, self.store.select_column(table, c, stop=1)).iloc[0]
+                meta['last'][c] = self._decode(table, self.store.select_column(table, c, start=-1)).iloc[0]
+                index = storer.table.cols._f_col(c).index
+                if index is not None and index.is_csi and not index.dirty and c not in coded:
+                    lo, hi = index.read_sorted(0, 1), index.read_sorted(nrows - 1, nrows)
+                    bounds = self._decode(table, pd.Series(np.concatenate([lo, hi]), name=c))
+                    meta['min'][c], meta['max'][c] = [v.decode() if isinstance(v, bytes) else v for v in bounds]
+                else:
+                    values = self._decode(table, self.store.select_column(table, c).drop_duplicates())
+                    meta['min'][c], meta['max'][c] = values.min(), values.max()
+
+        if 'sym_cd' in keys:
+            meta['registry'] = registry if registry is not None else self._scan_registry(table)
+            meta['symbols'] = meta['registry'].index.to_numpy(dtype=str)
+            meta['n_symbols'] = len(meta['symbols'])
+        return meta
+
+    # compact 저장 형식(스키마) 관련
+
+    def _schema(self, table):
+        attrs = self.store.get_storer(table).attrs
+        if 'db_schema' not in attrs:
+            return None
+        schema = attrs.db_schema
+        return {'dates': schema['dates'], 'dicts': {c: self._get_side(table, 'dict_' + c) for c in schema['dicts']}}
+
+    def _set_schema(self, table, schema):
+        # 사전 값 목록은 별도 노드에, 컬럼 구성은 테이블 속성에 저장
+        if schema:
+            for c, values in schema['dicts'].items():
+                self._put_side(table, 'dict_' + c, values)
+            self.store.get_storer(table).attrs.db_schema = {'dates': schema['dates'], 'dicts': list(schema['dicts'])}
+
+    def _new_schema(self, data):
+        if not self.compact:
+            return None
+        text = [c for c in data.columns if data[c].dtype == object or pd.api.types.is_string_dtype(data[c])]
+        return {'dates': {c: self.date_formats[c] for c in text if c in self.date_formats},
+                'dicts': {c: np.array([], dtype=object) for c in text if c in self.dict_cols}}
+
+    @staticmethod
+    def _date_numbers(sr):
+        # 날짜 문자열에서 숫자만 남긴 int32 (이미 정수이면 그대로, 결측값은 0)
+        if pd.api.types.is_integer_dtype(sr):
+            return sr.astype('int32')
+        # 고유값(날짜 수)만 변환한 뒤 위치로 펼침
+        codes, uniq = pd.factorize(sr)
+        digits = pd.Series(uniq, dtype='string').str.replace(r'\D', '', regex=True)
+        numbers = pd.to_numeric(digits, errors='coerce').fillna(0).to_numpy(dtype='int32')
+        # 결측값(코드 -1)은 끝에 붙인 0을 가리킴
+        return pd.Series(np.append(numbers, np.int32(0))[codes], index=sr.index, name=sr.name)
+
+    @staticmethod
+    def _encode(data, schema):
+        """날짜 문자열은 숫자만 남긴 int32로, 사전 컬럼은 값 목록의 위치(int32 코드)로 바꿈 (결측값은 0 / -1)"""
+        if not schema:
+            return data, schema
+
+        data = data.copy()
+        dicts = dict(schema['dicts'])
+        for c in schema['dates']:
+            if c in data.columns:
+                data[c] = DbTools._date_numbers(data[c])
+        for c, values in dicts.items():
+            if c in data.columns:
+                new = pd.Index(data[c].dropna().unique()).difference(values, sort=False)
+                if len(new):
+                    values = dicts[c] = np.concatenate([values, np.asarray(new, dtype=object)])
+                data[c] = pd.Index(values).get_indexer(data[c]).astype('int32')
+        return data, {'dates': schema['dates'], 'dicts': dicts}
+
+    def _decode(self, table, data):
+        """_encode로 저장된 컬럼을 원래의 문자열 형식으로 복원"""
+        schema = self._schema(table)
+        if not schema:
+            return data
+
+        def decode(sr):
+            if sr.name in schema['dates']:
+                # 고유값(날짜 수)만큼만 문자열을 만든 뒤 위치로 펼침
+                uniq, inv = np.unique(sr.to_numpy(), return_inverse=True)
+                text = pd.Series(uniq).astype(str)
+                for pos, token in self._date_tokens(schema['dates'][sr.name]):
+                    text = text.str[:pos] + token + text.str[pos:] if token else text
+                text = text.where(uniq != 0, None).to_numpy(dtype=object)
+                return pd.Series(text[inv], index=sr.index, name=sr.name)
+            if sr.name in schema['dicts']:
+                values = np.append(schema['dicts'][sr.name], [np.nan])
+                return pd.Series(values[sr.to_numpy()], index=sr.index, name=sr.name)
+            return sr
+
+        if isinstance(data, pd.Series):
+            return decode(data)
+        return data.apply(decode) if len(data.columns) else data
+
+    @staticmethod
+    def _date_tokens(fmt):
+        # '%Y-%m-%d' -> [(4, '-'), (7, '-')] : 숫자 문자열에 구분자를 끼워넣을 위치
+        widths = {'%Y': 4, '%m': 2, '%d': 2}
+        tokens, pos = [], 0
+        for part in re.split(r'(%[Ymd])', fmt):
+            if part in widths:
+                pos += widths[part]
+            elif part:
+                tokens.append((pos, part))
+                pos += len(part)
+        return tokens
+
+    def _where(self, table, query):
+        """
+        조건식의 날짜/사전 컬럼 비교값을 저장 형식으로 바꿈.
+        ('base_dt >= "2021"' -> 'base_dt >= 20210000', 'sym_cd in ["005930"]' -> 'sym_cd in [12]')
+        """
+        if not isinstance(query, str) or not query or table not in self.store:
+            return query
+        schema = self._schema(table)
+        if not schema:
+            return query
+
+        def date_value(col, op, text):
+            digits = re.sub(r'\D', '', text)
+            width = sum({'%Y': 4, '%m': 2, '%d': 2}[t] for t in re.findall(r'%[Ymd]', schema['dates'][col]))
+            if len(digits) == width or not digits:
+                return op, int(digits or 0)
+            # 앞부분만 주어진 날짜는 문자열 비교와 결과가 같도록 경계값과 연산자를 조정
+            bound = int(digits) * 10 ** (width - len(digits))
+            return {'>=': ('>=', bound), '>': ('>=', bound), '<=': ('<', bound), '<': ('<', bound),
+                    '=': ('=', -1), '==': ('=', -1), '!=': ('>=', 0)}[op]
+
+        def code(col, text):
+            loc = pd.Index(schema['dicts'][col]).get_indexer([text])[0]
+            return int(loc) if loc >= 0 else -2
+
+        def compare(m):
+            col, op, text = m.group(1), m.group(2), m.group(3)[1:-1]
+            if col in schema['dates']:
+                op, value = date_value(col, op, text)
+                return f'{col} {op} {value}'
+            if col in schema['dicts']:
+                return f'{col} {op} {code(col, text)}'
+            return m.group(0)
+
+        def isin(m):
+            col, neg, values = m.group(1), m.group(2) or '', ast.literal_eval('[' + m.group(3) + ']')
+            if col in schema['dicts']:
+                values = [code(col, str(v)) for v in values]
+            elif col in schema['dates']:
+                values = [date_value(col, '=', str(v))[1] for v in values]
+            else:
+                return m.group(0)
+            return f'{col} {neg}in {values}'
+
+        query = re.sub(r'(\w+)\s+(not\s+)?in\s+\[([^\]]*)\]', isin, query)
+        return re.sub(r'(\w+)\s*(>=|<=|==|!=|=|>|<)\s*("[^"]*"|\'[^\']*\')', compare, query)
+
+    def read_chunks(self, table, col=None, query=None, chunksize=100000, by=None):
+        """
+        테이블을 한 번에 읽지 않고 일정 크기의 데이터프레임 조각으로 나누어 순차 반환하는 제너레이터
+
+        Parameters
+        ----------
+        table : str
+            테이블명
+        col : str or list, optional
+            읽어올 컬럼 (None이면 전체 컬럼)
+        query : str, optional
+            HDF where 조건 (조각을 나누기 전에 적용됨)
+        chunksize : int
+            행 개수 기준 조각 크기 (by가 주어지면 무시)
+        by : str, optional
+            'base_mt', 'base_dt' 등 조각을 나눌 기준 컬럼. 기준 컬럼 값 하나당 조각 하나를 반환
+
+        Yields
+        ------
+        pd.DataFrame
+        """
+        col = [col] if isinstance(col, str) else col
+
+        # 읽을 범위(행 위치 / 파티션 값)만 먼저 정하고, 조각마다 잠금과 세션을 잡았다가 yield 전에 놓음
+        # (호출한 쪽이 중간에 반복을 멈추거나 제너레이터를 버려도 다른 스레드의 DbTools 호출이 막히지 않음.
+        #  조각 사이에 다른 스레드가 같은 테이블에 쓰면 그 이후 조각에는 변경 내용이 반영될 수 있음)
+        with DbTools.lock, self.session():
+            grouped = self._grouped_query(table, query)
+            if by is None:
+                coords = self._coordinates(table, query) if query else None
+                nrows = len(coords) if query else self.store.get_storer(table).nrows
+            elif grouped:
+                # 컬럼 그룹 조건은 행 위치를 먼저 구하고 파티션 값별로 나눔
+                coords = self._coordinates(table, query)
+                values = self.store.select_column(table, by).to_numpy()[coords]
+                partitions = pd.Series(values).drop_duplicates()
+            # 파티션 값은 저장 형식 그대로 조건식에 사용
+            elif query:
+                query = self._where(table, query)
+                partitions = self.store.select(table, query, columns=[by])[by].drop_duplicates()
+            else:
+                partitions = self.store.select_column(table, by).drop_duplicates()
+
+        if by is None:
+            for i in range(0, nrows, chunksize):
+                with DbTools.lock, self.session():
+                    if coords is None:
+                        chunk = self._select(table, start=i, stop=i + chunksize, columns=col)
+                    else:
+                        chunk = self._select(table, coords[i:i + chunksize], columns=col)
+                yield chunk
+            return
+
+        for value in partitions.sort_values():
+            if grouped:
+                with DbTools.lock, self.session():
+                    chunk = self._select(table, coords[values == value], columns=col)
+                yield chunk
+                continue
+            value = f'"{value}"' if isinstance(value, str) else value
+            where = f'{by} = {value}' if not query else f'({query}) & {by} = {value}'
+            with DbTools.lock, self.session():
+                chunk = self._select(table, where, columns=col)
+            yield chunk
+
+    @perf.traced('db')
+    def unique(self, table, col, query=None, chunksize=500000):
+        """조각 단위로 읽으면서 컬럼의 고유값을 구함 (등장 순서 유지)"""
+        values = [chunk[col].drop_duplicates() for chunk in self.read_chunks(table, col, query, chunksize)]
+        if not values:
+            return pd.Series(name=col, dtype='object')
+        return pd.concat(values).drop_duplicates().reset_index(drop=True)
+
+    # 행 위치(좌표) 기준 부분 읽기 (화면에 보이는 구간만 읽는 테이블 뷰어 등에서 사용)
+
+    def _order_values(self, table, col):
+        # 정렬 기준 컬럼 값. 사전 컬럼은 코드를 값 목록의 순위로, 날짜 결측값(0)은 최대값으로 바꿔 원래 값의 순서와 같게 함
+        group = next((g for g, cols in self._groups(table).items() if col in cols), table)
+        values = self.store.select_column(group, col).to_numpy()
+        schema = self._schema(group)
+        if schema and col in schema['dicts']:
+            words = schema['dicts'][col]
+            rank = np.empty(len(words) + 1, dtype='int64')
+            rank[np.argsort(words.astype(str), kind='stable')] = np.arange(len(words))
+            rank[-1] = len(words)
+            values = rank[values]
+        elif schema and col in schema['dates']:
+            values = np.where(values == 0, np.iinfo(values.dtype).max, values)
+        return pd.Series(values)
+
+    @perf.traced('db')
+    @_locked
+    def positions(self, table, query=None, sort=None, ascending=True):
+        """
+        조건식을 만족하는 행의 위치를 sort 컬럼 순서로 반환.
+        조건식은 HDF where로 처리하고, 정렬은 sort 컬럼 하나만 읽어서 하므로 나머지 컬럼은 읽지 않음
+
+        Parameters
+        ----------
+        table : str
+            테이블명
+        query : str, optional
+            HDF where 조건 (read와 같은 형식)
+        sort : str, optional
+            정렬 기준 컬럼 (None이면 저장된 순서)
+        ascending : bool
+            오름차순 여부 (같은 값은 저장된 순서 유지, 결측값은 오름차순이면 마지막 / 내림차순이면 처음)
+
+        Returns
+        -------
+        np.ndarray (int64)
+        """
+        with self.session():
+            if query:
+                positions = self._coordinates(table, query)
+            else:
+                positions = np.arange(self.store.get_storer(table).nrows, dtype='int64')
+            if sort is not None and len(positions):
+                key = self._order_values(table, sort).take(positions).reset_index(drop=True)
+                positions = positions[key.sort_values(kind='stable').index.to_numpy()]
+                positions = positions if ascending else positions[::-1].copy()
+        return positions
+
+    @perf.traced('db')
+    @_locked
+    def index_positions(self, table, col, start=None, stop=None, ascending=True):
+        """
+        col 순서로 정렬했을 때 start ~ stop 번째 행의 위치. 키 컬럼의 완전 정렬 인덱스(CSI)에서 필요한 구간만 읽으므로
+        테이블 전체를 정렬하지 않음 (같은 값의 행 순서는 정해지지 않음)
+
+        Returns
+        -------
+        np.ndarray (int64) or None
+            col에 CSI 인덱스가 없거나 저장값의 순서가 원래 값의 순서와 다르면(사전 컬럼) None
+        """
+        with self.session():
+            t = self.store.get_storer(table).table
+            schema = self._schema(table)
+            if col not in t.colindexes or (schema and col in schema['dicts']):
+                return None
+            index = t.colindexes[col]
+            if not index.is_csi or index.dirty:
+                return None
+            start, stop, _ = slice(start, stop).indices(t.nrows)
+            if stop <= start:
+                return np.array([], dtype='int64')
+            if ascending:
+                return index.read_indices(start, stop).astype('int64')
+            return index.read_indices(t.nrows - stop, t.nrows - start)[::-1].astype('int64')
+
+    @perf.traced('db')
+    @_locked
+    def read_rows(self, table, positions, col=None):
+        """
+        행 위치 목록(positions, index_positions의 결과 등)의 행들을 주어진 순서대로 읽음
+
+        Parameters
+        ----------
+        table : str
+            테이블명
+        positions : array-like of int
+            행 위치
+        col : str or list, optional
+            읽어올 컬럼 (None이면 전체 컬럼)
+
+        Returns
+        -------
+        pd.DataFrame
+        """
+        positions = np.asarray(positions, dtype='int64')
+        col = [col] if isinstance(col, str) else col
+        with self.session():
+            if not len(positions):
+                return self._select(table, start=0, stop=0, columns=col)
+            # HDF5는 좌표를 오름차순으로 읽으므로 정렬해서 읽은 뒤 요청 순서로 되돌림
+            unique = np.unique(positions)
+            data = self._select(table, unique, columns=col)
+        return data.iloc[np.searchsorted(unique, positions)]
+
+    # 저장소 유지보수 (빈 공간/청크 현황, 재정렬/재압축 후 파일 교체)
+
+    @staticmethod
+    def _leaves(group):
+        # 숨김 노드(컬럼 인덱스)를 포함한 하위 데이터 노드 전체
+        for node in list(group._v_children.values()) + list(group._v_hidden.values()):
+            if isinstance(node, tables.Group):
+                yield from DbTools._leaves(node)
+            else:
+                yield node
+
+    @staticmethod
+    def _disk_bytes(leaf):
+        # VLArray(이전 형식의 사전 값 목록 등)는 size_on_disk를 지원하지 않아 HDF5 저장 크기를 직접 조회하고,
+        # 가변 길이 내용은 HDF5 전역 힙에 따로 저장되므로 내용 크기를 더함 (객체는 pickle 크기)
+        size = int(leaf._get_storage_size())
+        if isinstance(leaf, tables.VLArray):
+            if leaf.atom.kind == 'object':
+                size += sum(len(pickle.dumps(row, pickle.HIGHEST_PROTOCOL)) for row in leaf.read())
+            else:
+                size += sum(np.asarray(row).nbytes for row in leaf.read())
+        return size
+
+    @_locked
+    def free_space(self):
+        """
+        파일 크기와 실제 데이터가 차지하는 크기. 행을 지우거나 테이블을 다시 써도 HDF5 파일은 줄어들지 않으므로
+        그 차이(free_bytes)가 재사용되지 않는 빈 공간임. 다만 HDF5 자체 메타데이터와 인덱스 생성 과정에서 생기는
+        여유 공간은 repack 직후에도 남으므로, 마지막 repack 직후의 빈 공간을 뺀 값을 reclaimable_bytes로 따로 계산함
+
+        Returns
+        -------
+        dict
+            file_bytes, used_bytes, free_bytes, free_ratio, reclaimable_bytes, reclaimable_ratio
+        """
+        self.open()
+        if self.in_session:
+            self.store.flush()
+        root = self.store._handle.root
+        used = sum(self._disk_bytes(leaf) for leaf in self._leaves(root))
+        baseline = root._v_attrs.db_repack['free_bytes'] if 'db_repack' in root._v_attrs else 0
+        self.close()
+        size = os.path.getsize(self.path)
+        free = max(size - used, 0)
+        return {'file_bytes': size, 'used_bytes': used, 'free_bytes': free,
+                'free_ratio': free / size if size else 0.0, 'reclaimable_bytes': max(free - baseline, 0),
+                'reclaimable_ratio': max(free - baseline, 0) / size if size else 0.0}
+
+    @_locked
+    def stats(self):
+        """
+        테이블별 저장 현황
+
+        Returns
+        -------
+        pd.DataFrame
+            table - 테이블명, nrows - 행 수, live_bytes - 행 데이터 크기(압축 전, 컬럼 그룹 포함),
+            data_bytes / index_bytes / meta_bytes - 데이터 / 컬럼 인덱스 / 보조 노드가 파일에서 차지하는 크기,
+            chunk_rows - 청크당 행 수, chunks - 청크 수, complib / complevel - 압축 방식
+        """
+        rows = []
+        names = self.tables
+        self.open()
+        handle = self.store._handle
+        for table in names:
+            t = self.store.get_storer(table).table
+            groups = [self.store.get_storer(g).table for g in self._groups(table)]
+            data = index = 0
+            for leaf in self._leaves(handle.get_node(table)):
+                size = self._disk_bytes(leaf)
+                index, data = (index + size, data) if '/_i_' in leaf._v_pathname else (index, data + size)
+            meta = 0
+            if self._side(table) in self.store:
+                for leaf in self._leaves(handle.get_node(self._side(table))):
+                    size = self._disk_bytes(leaf)
+                    if any(leaf._v_pathname.startswith(g._v_parent._v_pathname + '/') for g in groups):
+                        index, data = (index + size, data) if '/_i_' in leaf._v_pathname else (index, data + size)
+                    else:
+                        meta += size
+            rows.append({'table': table, 'nrows': int(t.nrows),
+                         'live_bytes': int(sum(x.nrows * x.rowsize for x in [t] + groups)),
+                         'data_bytes': data, 'index_bytes': index, 'meta_bytes': meta,
+                         'chunk_rows': int(t.chunkshape[0]), 'chunks': -(-int(t.nrows) // int(t.chunkshape[0])),
+                         'complib': t.filters.complib, 'complevel': t.filters.complevel})
+        self.close()
+        return pd.DataFrame(rows)
+
+    def _sort_key(self, leaf):
+        # 완전 정렬 인덱스(CSI)가 있는 첫 번째 키 컬럼 (컬럼 그룹이 있는 테이블은 행 정렬을 유지해야 하므로 제외)
+        if leaf.name != 'table' or 'db_groups' in leaf._v_parent._v_attrs:
+            return None
+        indexes = leaf.colindexes
+        return next((c for c in self.key_cols if c in indexes and indexes[c].is_csi and not indexes[c].dirty), None)
+
+    def _copy_group(self, src, dst, profile, sort):
+        sorted_tables = []
+        for name, node in src._v_children.items():
+            if isinstance(node, tables.Group):
+                group = dst._v_file.create_group(dst, name)
+                node._v_attrs._f_copy(group)
+                sorted_tables += self._copy_group(node, group, profile, sort)
+                continue
+            filters = node.filters if profile is None else \
+                tables.Filters(complevel=self.profiles[profile][1] or 0, complib=self.profiles[profile][0])
+            if isinstance(node, tables.Table):
+                key = self._sort_key(node) if sort else None
+                node.copy(dst, name, filters=filters, chunkshape=None, sortby=key, checkCSI=key is not None,
+                          propindexes=True)
+                if key:
+                    sorted_tables.append(src._v_pathname)
+            else:
+                node.copy(dst, name, filters=filters)
+        return sorted_tables
+
+    @perf.traced('db')
+    @_locked
+    def repack(self, profile=None, sort=True):
+        """
+        파일 전체를 새 파일로 다시 써서 빈 공간을 없애고, 테이블은 행 수에 맞게 청크 크기를 다시 정하고
+        키 컬럼 순으로 재정렬한 뒤 원래 파일과 교체함 (새 파일을 다 쓴 뒤 os.replace로 한 번에 바꾸므로
+        중간에 실패해도 원래 파일은 그대로 남음). 세션 중에는 실행할 수 없음
+
+        Parameters
+        ----------
+        profile : str, optional
+            다시 압축할 프로파일 ('lz4', 'zstd', 'max'). None이면 노드별 기존 압축을 유지
+        sort : bool
+            True이면 완전 정렬 인덱스가 있는 첫 번째 키 컬럼(key_cols 순서) 기준으로 행을 재정렬
+            (컬럼 그룹이 있는 테이블은 재정렬하지 않음)
+
+        Returns
+        -------
+        dict
+            before / after - 교체 전후 파일 크기, sorted - 재정렬한 테이블
+        """
+        if self.in_session:
+            raise RuntimeError('세션 중에는 repack할 수 없습니다')
+        DbTools._freed.discard(self.path)
+        before = os.path.getsize(self.path)
+        tmp = self.path + '.repack'
+
+        try:
+            with tables.open_file(self.path, 'r') as src, tables.open_file(tmp, 'w') as dst:
+                src.root._v_attrs._f_copy(dst.root)
+                sorted_tables = self._copy_group(src.root, dst.root, profile, sort)
+            with open(tmp, 'rb+') as f:
+                os.fsync(f.fileno())
+            os.replace(tmp, self.path)
+        finally:
+            if os.path.exists(tmp):
+                os.remove(tmp)
+
+        DbTools.cache.invalidate(self.path)
+        # 행 순서가 바뀐 테이블은 첫 행/마지막 행 메타데이터를 다시 만들고, repack 직후의 빈 공간을 기록
+        self.open()
+        for table in sorted_tables:
+            self._set_meta(table, self._scan_meta(table))
+        self.store._handle.root._v_attrs.db_repack = {'time': time.time_ns(), 'free_bytes': 0}
+        self.close()
+        free = self.free_space()['free_bytes']
+        self.open()
+        self.store._handle.root._v_attrs.db_repack = {'time': time.time_ns(), 'free_bytes': free}
+        self.close()
+        return {'before': before, 'after': os.path.getsize(self.path), 'sorted': sorted_tables}
+
+    def maintain(self):
+        """
+        append로 점진 갱신된 키 컬럼 인덱스를 완전 정렬 인덱스로 다시 만들고(rebuild_indexes),
+        put/remove 이후 되찾을 수 있는 빈 공간 비율이 repack_threshold 이상이면 repack.
+        쓰기 작업과 분리된 유지보수 호출로, 갱신 작업이 모두 끝난 뒤 호출함 (세션 중에는 건너뜀).
+        실패해도 원래 파일은 그대로 남으므로 예외를 올리지 않고 메시지만 출력
+
+        Returns
+        -------
+        bool (repack 여부)
+        """
+        if self.in_session:
+            return False
+        try:
+            self.rebuild_indexes()
+            if self.repack_threshold is None or self.path not in DbTools._freed:
+                return False
+            DbTools._freed.discard(self.path)
+            space = self.free_space()
+            if space['file_bytes'] < self.repack_min_bytes or space['reclaimable_ratio'] < self.repack_threshold:
+                return False
+            print(f'{os.path.basename(self.path)} 빈 공간 {space["reclaimable_ratio"]:.0%} - repack 시작', end='...')
+            self.repack()
+            print('종료!')
+            return True
+        except Exception as e:
+            print(f'{os.path.basename(self.path)} 유지보수 실패 (원래 파일 유지): {e!r}')
+            return False
+
+
+class ArrowTools:
+    """
+    DbTools와 같은 인터페이스(tables, put, append, remove, read)를 제공하는 컬럼형 저장소.
+    테이블 하나를 Parquet 또는 Arrow IPC 파일들로 이루어진 디렉터리(데이터셋)로 저장하며,
+    'base_mt' 또는 연도(p_year) 기준 hive 파티션으로 나누어 저장함
+
+    Parameters
+    ----------
+    file : str
+        저장소 이름 (external_files/arrow_data/<file>/ 디렉터리에 저장)
+    fmt : str
+        'parquet' - Parquet 파일로 저장
+        'arrow' - Arrow IPC 파일로 저장 (메모리 맵을 통한 zero-copy 읽기 가능)
+    partition : str
+        'base_mt' - base_mt 컬럼이 있는 테이블은 월별로 파티션
+        'year' - 날짜 컬럼의 연도로 파티션 (base_dt 구간 조건으로 파티션 가지치기 가능)
+        None - 파티션 없음
+    """
+
+    date_cols = ['base_dt', 'h_day']
+    year_key = 'p_year'
+
+    def __init__(self, file, fmt='parquet', partition='base_mt', path=None):
+        import pyarrow
+        import pyarrow.compute
+        import pyarrow.dataset
+        import pyarrow.fs
+        self._pa = pyarrow
+        self._ds = pyarrow.dataset
+
+        path = path if path else os.path.dirname(__file__) + '/external_files/arrow_data/'
+        self.path = os.path.abspath(os.path.join(path, file))
+        self.fmt = fmt
+        self.partition = partition
+        self.fs = pyarrow.fs.LocalFileSystem(use_mmap=True)
+        os.makedirs(self.path, exist_ok=True)
+
+    @property
+    def tables(self):
+        return ['/' + name for name in sorted(os.listdir(self.path))
+                if os.path.isfile(os.path.join(self.path, name, '_schema.json'))]
+
+    def _dir(self, table):
+        return os.path.join(self.path, table.strip('/'))
+
+    def _schema(self, table):
+        with open(os.path.join(self._dir(table), '_schema.json')) as f:
+            return json.load(f)
+
+    def _partitioning(self, key):
+        if key is None:
+            return None
+        return self._ds.partitioning(self._pa.schema([(key, self._pa.string())]), flavor='hive')
+
+    def _dataset(self, table):
+        schema = self._schema(table)
+        return self._ds.dataset(self._dir(table), format='ipc' if self.fmt == 'arrow' else 'parquet',
+                                partitioning=self._partitioning(schema['key']), filesystem=self.fs)
+
+    def put(self, table, data):
+        self.remove(table)
+        self.append(table, data)
+
+    def append(self, table, data):
+        if not os.path.isfile(os.path.join(self._dir(table), '_schema.json')):
+            date_col = next((c for c in self.date_cols if c in data.columns), None)
+            if self.partition == 'base_mt' and 'base_mt' in data.columns:
+                key = 'base_mt'
+            elif self.partition and date_col:
+                key = self.year_key
+            else:
+                key = None
+            os.makedirs(self._dir(table), exist_ok=True)
+            with open(os.path.join(self._dir(table), '_schema.json'), 'w') as f:
+                json.dump({'columns': list(data.columns), 'key': key, 'date_col': date_col}, f)
+
+        schema = self._schema(table)
+        if schema['key'] == self.year_key:
+            data = data.assign(**{self.year_key: data[schema['date_col']].astype(str).str[:4]})
+        elif schema['key']:
+            data = data.astype({schema['key']: str})
+
+        ext = 'arrow' if self.fmt == 'arrow' else 'parquet'
+        self._ds.write_dataset(self._pa.Table.from_pandas(data, preserve_index=False), self._dir(table),
+                               format='ipc' if self.fmt == 'arrow' else 'parquet',
+                               partitioning=self._partitioning(schema['key']),
+                               basename_template=f'part-{time.time_ns()}-{{i}}.{ext}',
+                               existing_data_behavior='overwrite_or_ignore')
+
+    def remove(self, table, query=None):
+        if query is None:
+            shutil.rmtree(self._dir(table), ignore_errors=True)
+            return
+
+        dataset = self._dataset(table)
+        schema = self._schema(table)
+        expr = self._expression(query, dataset.schema, schema)
+        pc = self._pa.compute
+
+        # 조건에 해당할 수 있는 파티션의 파일만 골라서 다시 씀
+        for fragment in dataset.get_fragments(filter=expr):
+            data = fragment.to_table(schema=dataset.schema)
+            mask = self._ds.dataset(data).to_table(columns={'m': expr}).column('m')
+            keep = data.filter(pc.invert(pc.fill_null(mask, False)))
+            if keep.num_rows == data.num_rows:
+                continue
+            os.remove(fragment.path)
+            if keep.num_rows:
+                if schema['key']:
+                    keep = keep.drop_columns([schema['key']])
+                if self.fmt == 'arrow':
+                    with self._pa.ipc.new_file(fragment.path, keep.schema) as writer:
+                        writer.write_table(keep)
+                else:
+                    import pyarrow.parquet
+                    pyarrow.parquet.write_table(keep, fragment.path)
+
+    def read_arrow(self, table, col=None, query=None):
+        """pyarrow.Table 형태로 읽음 (Arrow IPC 저장소는 메모리 맵 기반 zero-copy)"""
+        dataset = self._dataset(table)
+        schema = self._schema(table)
+        columns = [col] if isinstance(col, str) else (col if col else schema['columns'])
+        expr = self._expression(query, dataset.schema, schema) if query else None
+        return dataset.to_table(columns=columns, filter=expr)
+
+    def read(self, table, col=None, query=None, start=None, stop=None):
+        if start is None and stop is None:
+            data = self.read_arrow(table, col, query)
+        else:
+            # HDFStore와 동일하게 행 위치(start, stop)로 먼저 자른 뒤 조건을 적용
+            dataset = self._dataset(table)
+            columns = [col] if isinstance(col, str) else (col if col else self._schema(table)['columns'])
+            data = dataset.take(self._pa.array(range(*slice(start, stop).indices(dataset.count_rows()))),
+                                columns=columns if not query else None)
+            if query:
+                expr = self._expression(query, dataset.schema, self._schema(table))
+                data = self._ds.dataset(data).to_table(columns=columns, filter=expr)
+
+        data = data.to_pandas()
+        return data[col] if isinstance(col, str) and not query else data
+
+    def _expression(self, query, arrow_schema, schema):
+        """
+        HDF where 구문('base_dt >= "20200101" & sym_cd in [...]')을 pyarrow 필터 식으로 변환.
+        연도 파티션 테이블은 날짜 컬럼 조건에서 연도 조건을 만들어 파티션 가지치기에 사용함
+        """
+        ds = self._ds
+        ops = {ast.Eq: '__eq__', ast.NotEq: '__ne__', ast.Gt: '__gt__', ast.GtE: '__ge__',
+               ast.Lt: '__lt__', ast.LtE: '__le__'}
+
+        def literal(field, node):
+            value = ast.literal_eval(node)
+            kind = arrow_schema.field(field).type
+            if self._pa.types.is_boolean(kind):
+                return value in (True, 'True', 'true', 1)
+            if self._pa.types.is_string(kind) or self._pa.types.is_large_string(kind):
+                return str(value)
+            return value
+
+        def convert(node):
+            if isinstance(node, ast.BoolOp):
+                exprs = [convert(v) for v in node.values]
+                return functools.reduce(lambda x, y: x & y if isinstance(node.op, ast.And) else x | y, exprs)
+            if isinstance(node, ast.UnaryOp) and isinstance(node.op, ast.Not):
+                return ~convert(node.operand)
+            if isinstance(node, ast.Compare) and len(node.ops) == 1 and isinstance(node.left, ast.Name):
+                name, op = node.left.id, type(node.ops[0])
+                if op in (ast.In, ast.NotIn):
+                    values = [literal(name, v) for v in node.comparators[0].elts]
+                    expr = ds.field(name).isin(values)
+                    if name == schema['date_col'] and schema['key'] == self.year_key:
+                        expr = expr & ds.field(self.year_key).isin([str(v)[:4] for v in values])
+                    return expr if op is ast.In else ~expr
+                value = literal(name, node.comparators[0])
+                expr = getattr(ds.field(name), ops[op])(value)
+                if name == schema['date_col'] and schema['key'] == self.year_key and op is not ast.NotEq:
+                    year_op = {ast.Gt: '__ge__', ast.Lt: '__le__'}.get(op, ops[op])
+                    expr = expr & getattr(ds.field(self.year_key), year_op)(str(value)[:4])
+                return expr
+            raise ValueError(f'지원하지 않는 조건식입니다: {query}')
+
+        # HDF 구문의 '=', '&', '|', '~'를 파이썬 연산자('==', and, or, not)로 바꾼 뒤 구문 분석
+        text = re.sub(r'(?<![<>!=])=(?!=)', '==', query)
+        text = text.replace('&', ' and ').replace('|', ' or ').replace('~', ' not ')
+        return convert(ast.parse(text, mode='eval').body)
+
+
+def migrate_to_arrow(file, fmt='parquet', partition='base_mt', chunksize=500000):
+    """기존 HDF5 저장소(external_files/hdf_data/<file>.h5)의 모든 테이블을 ArrowTools 저장소로 옮김"""
+    source = DbTools(file)
+    target = ArrowTools(file, fmt, partition)
+
+    with source.session():
+        for table in source.tables:
+            print(f'{table} 테이블 변환 시작', end='...')
+            target.remove(table)
+            for chunk in source.read_chunks(table, chunksize=chunksize):
+                target.append(table, chunk)
+            print('종료!')
+
+    return target
+
 
 # 영업일을 적용한 Time-Series Index 관련
 
-# 1) 휴장일 포함한 판다스 영업일 offset 객체 생성
-holidays = DbTools('inp_raw').read('holidays').h_day
-BD = pd.offsets.CustomBusinessDay(holidays=holidays)
-BM = pd.offsets.CustomBusinessMonthEnd(holidays=holidays)
+class Calendar:
+    """
+    휴장일을 반영한 영업일 달력.
+    처음 사용할 때 holidays 테이블로 만들어지며, 만든 결과는 numpy 배열 파일(.npz)로 저장해 두었다가
+    다음부터는 바로 불러옴. holidays 테이블이 바뀌었거나 연도가 바뀐 경우에만 다시 만듦
 
+    주기별('D', 'M', 'Q', 'Y')로 모든 날짜 -> 영업일 번호 조회표를 만들어 두고 shift, count_between, roll을
+    배열 인덱싱만으로 계산함 (스칼라와 배열 입력 모두 가능)
+    """
 
-# 2) 2000년 이후 주기별 영업일 DatetimeIndex 생성
-all_workdays = pd.date_range('2000-01-01', str(pd.Timestamp.today().year)+'-12-31', freq=BD)
-all_month_end_workdays = pd.date_range('2000-01-01', str(pd.Timestamp.today().year) + '-12-31', freq=BM)
-all_quarter_end_workdays = all_month_end_workdays[2::3]
-all_year_end_workdays = all_month_end_workdays[11::12]
+    start = '2000-01-01'
 
+    def __init__(self, file='inp_raw', table='holidays', path=None):
+        self.db_path = path if path else os.path.dirname(__file__) + '/external_files/hdf_data/'
+        self.file = file
+        self.table = table
+        self.cache_path = os.path.join(self.db_path, f'calendar_{file}.npz')
+        self._data = None
+        self._days = {}
+        self._months = {}
+        self._ordinals = {}
 
-def workdays_offset(date_range, last=True, freq='D'):
-    """입력받은 날짜 구간을 영업일로 변화 후, 구간을 이동시키거나 주기를 변경하여 영업일 인덱스(workdays DatetimeIndex)를 반환"""
+    def _signature(self):
+        # holidays 테이블의 메타데이터(갱신 시각, 행 수, 경계값)와 달력의 마지막 연도로 변경 여부를 판단
+        # (달력을 읽기만 하는 경우에도 파일이 바뀌지 않도록 메타데이터가 없어도 저장하지 않음)
+        if not os.path.isfile(os.path.join(self.db_path, self.file + '.h5')):
+            return None
+        meta = DbTools(self.file, path=self.db_path).meta(self.table, save=False)
+        return repr((meta.get('updated'), meta['nrows'], meta['min'], meta['max'], pd.Timestamp.today().year))
+
+    def _build(self):
+        holidays = DbTools(self.file, path=self.db_path).read(self.table).h_day
+        holidays = pd.DatetimeIndex(holidays).values.astype('datetime64[D]')
+        end = np.datetime64(str(pd.Timestamp.today().year) + '-12-31')
+        dates = np.arange(np.datetime64(self.start), end + 1)
+        workdays = dates[np.is_busday(dates, holidays=holidays)]
+
+        # 다음 영업일과 월이 달라지는 영업일 = 월말 영업일
+        months = _month_ordinal(workdays)
+        month_end = workdays[np.append(months[1:] != months[:-1], True)]
+        return {'holidays': holidays, 'workdays': workdays, 'month_end': month_end}
+
+    def _load(self):
+        if self._data is not None:
+            return self._data
+
+        signature = self._signature()
+        if os.path.isfile(self.cache_path):
+            with np.load(self.cache_path) as cache:
+                if signature is None or str(cache['signature']) == signature:
+                    self._data = {k: cache[k] for k in ['holidays', 'workdays', 'month_end']}
+                    return self._data
+
+        if signature is None:
+            raise FileNotFoundError(f'{self.file}.h5 파일과 저장된 영업일 달력이 모두 없습니다')
+        self._data = self._build()
+        np.savez(self.cache_path, signature=signature, **self._data)
+        return self._data
+
+    def reset(self):
+        """저장된 달력을 버리고 다음 사용 시 holidays 테이블로 다시 만듦"""
+        self._data = None
+        self._days = {}
+        self._months = {}
+        self._ordinals = {}
+        for name in ['holidays', 'busdaycalendar', 'BD', 'BM', 'all_workdays', 'all_month_end_workdays']:
+            self.__dict__.pop(name, None)
+        if os.path.isfile(self.cache_path):
+            os.remove(self.cache_path)
+
+    @functools.cached_property
+    def holidays(self):
+        return pd.Series(pd.DatetimeIndex(self._load()['holidays']).strftime('%Y-%m-%d'), name='h_day')
+
+    @functools.cached_property
+    def busdaycalendar(self):
+        return np.busdaycalendar(holidays=self._load()['holidays'])
+
+    @functools.cached_property
+    def BD(self):
+        return pd.offsets.CustomBusinessDay(calendar=self.busdaycalendar)
+
+    @functools.cached_property
+    def BM(self):
+        return pd.offsets.CustomBusinessMonthEnd(calendar=self.busdaycalendar)
+
+    @functools.cached_property
+    def all_workdays(self):
+        return pd.DatetimeIndex(self.days('D'))
+
+    @functools.cached_property
+    def all_month_end_workdays(self):
+        return pd.DatetimeIndex(self.days('M'))
+
+    def days(self, freq='D'):
+        """주기별 영업일 배열 (datetime64[D]) - 'D' 영업일, 'M'(='ME') 월말, 'Q' 분기말, 'Y' 연말"""
+        if freq not in self._days:
+            data = self._load()
+            self._days.update({'D': data['workdays'], 'M': data['month_end'], 'ME': data['month_end'],
+                               'Q': data['month_end'][2::3], 'Y': data['month_end'][11::12]})
+        return self._days[freq]
+
+    def months(self, freq='D'):
+        """days(freq)의 각 영업일이 속한 월 번호 배열 (1970년 1월 = 0)"""
+        if freq not in self._months:
+            self._months[freq] = _month_ordinal(self.days(freq))
+        return self._months[freq]
+
+    @property
+    def all_quarter_end_workdays(self):
+        return pd.DatetimeIndex(self.days('Q'))
+
+    @property
+    def all_year_end_workdays(self):
+        return pd.DatetimeIndex(self.days('Y'))
+
+    # 영업일 번호 계산
+
+    @property
+    def _origin(self):
+        # 조회표의 첫 칸에 해당하는 날짜 (달력 시작 전날이므로 항상 영업일 개수 0)
+        return np.datetime64(self.start, 'D') - 1
+
+    def _ordinal_table(self, freq):
+        # 달력 시작 전날부터 마지막 영업일까지 날짜별로 '그 날짜 이하인 days(freq) 영업일 개수'를 담은 조회표
+        freq = 'M' if freq == 'ME' else freq
+        if freq not in self._ordinals:
+            dates = np.arange(self._origin, self.days('D')[-1] + 1)
+            self._ordinals[freq] = np.searchsorted(self.days(freq), dates, 'right').astype('int32')
+        return self._ordinals[freq]
+
+    def ordinal(self, date, freq='D'):
+        """
+        date 당일 또는 직전의 영업일이 days(freq)에서 몇 번째인지 반환 (0부터, 직전 영업일이 없으면 -1)
+
+        Parameters
+        ----------
+        date : str, Timestamp, datetime64 또는 이들의 배열
+        freq : str
+            'D' 영업일, 'M'(='ME') 월말, 'Q' 분기말, 'Y' 연말
+
+        Returns
+        -------
+        int 또는 np.ndarray
+        """
+        date, scalar = _to_days(date)
+        table = self._ordinal_table(freq)
+        pos = np.clip((date - self._origin).astype('int64'), 0, len(table) - 1)
+        result = table[pos].astype('int64') - 1
+        return int(result) if scalar else result
+
+    def _position(self, date, freq, roll):
+        # date를 roll 방향의 영업일로 맞춘 뒤 days(freq)에서의 위치
+        date, scalar = _to_days(date)
+        if roll == 'backward':
+            pos = self.ordinal(date, freq)
+        elif roll == 'forward':
+            pos = self.ordinal(date - 1, freq) + 1
+        else:
+            raise ValueError(f"roll은 'backward' 또는 'forward'여야 합니다: {roll}")
+        return pos, scalar
+
+    def _take(self, freq, pos, scalar):
+        days = self.days(freq)
+        if np.any((pos < 0) | (pos >= len(days))):
+            raise IndexError('영업일 달력의 범위를 벗어난 날짜입니다')
+        return pd.Timestamp(days[pos]) if scalar else days[pos]
+
+    def roll(self, date, freq='D', roll='backward'):
+        """
+        date를 freq 주기의 영업일로 맞춤 (date가 해당 영업일이면 그대로)
+
+        Parameters
+        ----------
+        date : str, Timestamp, datetime64 또는 이들의 배열
+        freq : str
+            'D' 영업일, 'M'(='ME') 월말, 'Q' 분기말, 'Y' 연말
+        roll : str
+            'backward'는 date 당일 또는 이전, 'forward'는 date 당일 또는 이후의 가장 가까운 영업일
+
+        Returns
+        -------
+        Timestamp 또는 np.ndarray (datetime64[D])
+        """
+        return self._take(freq, *self._position(date, freq, roll))
+
+    def shift(self, date, n, freq='D', roll='backward'):
+        """
+        date를 roll로 영업일에 맞춘 뒤 freq 주기의 영업일 n개만큼 이동 (n은 정수 또는 정수 배열)
+
+        ex) shift('2024-02-10', 1) -> 토요일인 02-10을 직전 영업일(02-09)로 맞춘 뒤 그 다음 영업일
+            shift(today, -1, roll='forward') -> 오늘 이전의 마지막 영업일
+
+        Returns
+        -------
+        Timestamp 또는 np.ndarray (datetime64[D])
+        """
+        pos, scalar = self._position(date, freq, roll)
+        return self._take(freq, pos + np.asarray(n), scalar and np.ndim(n) == 0)
+
+    def count_between(self, start, end, freq='D'):
+        """
+        start 초과 end 이하 구간에 포함된 freq 주기의 영업일 개수 (end가 start보다 앞이면 음수)
+
+        Returns
+        -------
+        int 또는 np.ndarray
+        """
+        return self.ordinal(end, freq) - self.ordinal(start, freq)
+
+
+# 1) 휴장일 포함한 영업일 달력 (BD, BM 등 영업일 offset 객체와 주기별 영업일 DatetimeIndex는 처음 사용할 때 생성)
+calendar = Calendar()
+
+
+# 2) 기존 모듈 속성(ut.BD, ut.all_workdays 등)으로도 접근할 수 있도록 달력 속성을 연결
+def __getattr__(name):
+    if name in ['holidays', 'BD', 'BM', 'all_workdays', 'all_month_end_workdays',
+                'all_quarter_end_workdays', 'all_year_end_workdays']:
+        return getattr(calendar, name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+def _to_days(date):
+    # 스칼라/배열 날짜 입력 -> (datetime64[D] 배열, 스칼라 입력 여부)
+    if isinstance(date, np.ndarray) and date.dtype.kind == 'M':
+        return date.astype('datetime64[D]'), date.ndim == 0
+    if isinstance(date, str):
+        # 'YYYYMMDD'와 'YYYY-MM-DD'는 pandas 변환 없이 바로 처리
+        date = date[:4] + '-' + date[4:6] + '-' + date[6:] if len(date) == 8 else date
+        return np.datetime64(date, 'D'), True
+    if isinstance(date, pd.Timestamp):
+        return date.to_datetime64().astype('datetime64[D]'), True
+    scalar = np.ndim(date) == 0
+    return np.asarray(pd.to_datetime(date), dtype='datetime64[D]'), scalar
+
+
+def _month_ordinal(days):
+    # datetime64 배열 -> 1970년 1월부터 센 월 번호 (1970-01 = 0)
+    return np.asarray(days, dtype='datetime64[D]').astype('datetime64[M]').astype('int64')
+
+
+def _offset_positions(start, end, last=True, freq='D'):
+    """
+    workdays_offset의 핵심 계산. 영업일 구간 [start, end] 배열을 받아 결과가 담길 영업일 배열의 주기와
+    그 배열(calendar.days(주기))에서의 결과 구간 위치 [i0, i1)를 반환 (모두 searchsorted로 계산)
+    """
+    workdays = calendar.days('D')
+    start = np.asarray(start, dtype='datetime64[D]')
+    end = np.asarray(end, dtype='datetime64[D]')
+
+    # 구간에 포함된 첫 영업일(f)과 마지막 영업일(l)의 위치와 월 번호
+    f = calendar.ordinal(start - 1) + 1
+    l = calendar.ordinal(end)
+    mf = _month_ordinal(workdays[np.clip(f, 0, len(workdays) - 1)])
+    ml = _month_ordinal(workdays[np.clip(l, 0, len(workdays) - 1)])
+
+    # 월 번호 m이 속한 분기/연도의 마지막 월 번호
+    def q_end(m):
+        return m - m % 3 + 2
+
+    def y_end(m):
+        return m - m % 12 + 11
+
+    if not last and freq == 'D':
+        return 'D', f, l + 1
+
+    if last:
+        bounds = {'D': ('D', mf - 1, ml - 1),
+                  'ME': ('M', mf - 1, ml - 1),
+                  'M': ('M', mf - 2, ml - 2),
+                  'Q': ('Q', q_end(mf - 1) - 3, q_end(ml - 1) - 3),
+                  'Y': ('Y', y_end(mf - 1) - 12, y_end(ml - 1) - 12)}
+    else:
+        bounds = {'M': ('M', mf, ml),
+                  'Q': ('Q', q_end(mf), q_end(ml)),
+                  'Y': ('Y', y_end(mf), y_end(ml))}
+    if freq not in bounds:
+        raise ValueError(f'지원하지 않는 주기입니다: freq={freq}, last={last}')
+
+    target, lo, hi = bounds[freq]
+    months = calendar.months(target)
+    return target, np.searchsorted(months, lo, 'left'), np.searchsorted(months, hi, 'right')
+
+
+def workdays_offset_batch(start, end, last=True, freq='D'):
+    """
+    workdays_offset의 배열 입출력 버전
+
+    Parameters
+    ----------
+    start, end : array-like (datetime64)
+        영업일로 변환할 날짜 구간들의 시작일/종료일 배열
+    last, freq :
+        workdays_offset과 동일
+
+    Returns
+    -------
+    (np.ndarray, np.ndarray)
+        구간별 결과 영업일 인덱스의 첫날/마지막날 배열 (datetime64[D], 결과가 없으면 NaT)
+    """
+    target, i0, i1 = _offset_positions(start, end, last, freq)
+    days = calendar.days(target)
+    empty = i1 <= i0
+    first = np.where(empty, np.datetime64('NaT'), days[np.clip(i0, 0, len(days) - 1)])
+    final = np.where(empty, np.datetime64('NaT'), days[np.clip(i1 - 1, 0, len(days) - 1)])
+    return first.astype('datetime64[D]'), final.astype('datetime64[D]')
+
+
+def date_offset_batch(start, end, last=True, freq='D', start_offset=0):
+    """
+    date_offset의 배열 입출력 버전 (start, end는 workdays_offset_batch와 동일)
+
+    Returns
+    -------
+    (np.ndarray, np.ndarray)
+        구간별 새로운 시작일/종료일 배열 (datetime64[D])
+    """
+    if freq not in ['D', 'M', 'Q', 'Y']:
+        raise KeyError(freq)
+
+    target, i0, i1 = _offset_positions(start, end, last, freq)
+    days = calendar.days(target)
+    if freq == 'Q' and start_offset in ['1Y', '2Y']:
+        # 결과 첫 분기말이 속한 연도에서 1년(2년) 전 3월말 영업일
+        years = days[np.clip(i0, 0, len(days) - 1)].astype('datetime64[Y]').astype('int64') - int(start_offset[0])
+        pos = np.searchsorted(calendar.months('Q'), years * 12 + 2, 'left')
+        outside = calendar.months('Q')[np.clip(pos, 0, len(days) - 1)] != years * 12 + 2
+    else:
+        pos = i0 - int(start_offset)
+        outside = pos < 0
+    if np.any(outside | (i1 <= i0) | (i0 >= len(days))):
+        raise IndexError('영업일 달력의 범위를 벗어난 구간입니다')
+    return days[pos], days[i1 - 1]
+
+
+def _workdays_range(date_range):
+    # workdays_offset/date_offset의 입력 형식(연월, 날짜, [시작, 종료], None)을 영업일 구간 [시작일, 종료일]로 변환
+    all_workdays = calendar.all_workdays
 
-    # 입력된 날짜 구간(date_range)을 영업일 기준으로 변환
     if isinstance(date_range, (str, int)):
         date_range = str(date_range)
         if len(date_range) == 7:
-            workdays = all_workdays[all_workdays.slice_indexer(date_range, date_range)].strftime('%Y%m%d')
-            date_range = [workdays[0], workdays[-1]]
+            loc = all_workdays.slice_indexer(date_range, date_range)
+            loc = slice(loc.start, loc.stop)
         else:
-            last_workday = all_workdays[all_workdays.slice_indexer(end=date_range)][-1].strftime('%Y%m%d')
-            date_range = [last_workday, last_workday]
+            stop = all_workdays.slice_indexer(end=date_range).stop
+            loc = slice(stop - 1, stop)
 
     elif isinstance(date_range, (list, tuple)):
-        start, end = (str(date_range[0]), str(date_range[1]))
-        workdays = all_workdays[all_workdays.slice_indexer(start, end)].strftime('%Y%m%d')
-        date_range = [workdays[0], workdays[-1]]
+        loc = all_workdays.slice_indexer(str(date_range[0]), str(date_range[1]))
 
     else:
-        workdays = all_workdays[all_workdays.slice_indexer(start='2000-02')].strftime('%Y%m%d')
-        date_range = [workdays[0], workdays[-1]]
-
-    # date_range 구간 내 모든 영업일의 인덱스 산출
-    workdays = all_workdays[all_workdays.slice_indexer(date_range[0], date_range[1])]
-
-    # 기간을 전월말 기준으로 이동시키거나(=last) 주기를 변경한(=freq) 영업일 인덱스 산출
-    months = workdays.to_period('M').drop_duplicates().strftime('%Y-%m')
-    quarters = workdays.to_period('Q').drop_duplicates().strftime('%Y-%m')
-    years = workdays.to_period('Y').drop_duplicates().strftime('%Y-%m')
-    last_months = (workdays.to_period('M').drop_duplicates() - 1).strftime('%Y-%m')
-    last_months_1 = (workdays.to_period('M').drop_duplicates() - 2).strftime('%Y-%m')
-    last_quarters = ((workdays.to_period('M').drop_duplicates() - 1).asfreq('Q')
-                     .drop_duplicates() - 1).strftime('%Y-%m')
-    last_years = ((workdays.to_period('M').drop_duplicates() - 1).asfreq('Y')
-                  .drop_duplicates() - 1).strftime('%Y-%m')
+        loc = all_workdays.slice_indexer(start='2000-02')
 
-    if last:
-        if freq == 'D':
-            return all_workdays[all_workdays.slice_indexer(last_months[0], last_months[-1])]
-        if freq == 'ME':
-            return all_month_end_workdays[all_month_end_workdays.slice_indexer(last_months[0], last_months[-1])]
-        if freq == 'M':
-            return all_month_end_workdays[all_month_end_workdays.slice_indexer(last_months_1[0], last_months_1[-1])]
-        if freq == 'Q':
-            return all_quarter_end_workdays[all_quarter_end_workdays.slice_indexer(last_quarters[0],
-                                                                                   last_quarters[-1])]
-        if freq == 'Y':
-            return all_year_end_workdays[all_year_end_workdays.slice_indexer(last_years[0],
-                                                                             last_years[-1])]
-    else:
-        if freq == 'D':
-            return workdays
-        if freq == 'M':
-            return all_month_end_workdays[all_month_end_workdays.slice_indexer(months[0], months[-1])]
-        if freq == 'Q':
-            return all_quarter_end_workdays[all_quarter_end_workdays.slice_indexer(quarters[0], quarters[-1])]
-        if freq == 'Y':
-            return all_year_end_workdays[all_year_end_workdays.slice_indexer(years[0], years[-1])]
+    days = calendar.days('D')[loc]
+    return days[[0]], days[[-1]]
 
 
-def date_offset(date, last=True, freq='D', start_offset=0):
-    """구간을 전월말로 이동시키거나, 주기를 변경하거나, 시작일을 앞당긴 새로운 구간을 생성"""
+def workdays_offset(date_range, last=True, freq='D'):
+    """입력받은 날짜 구간을 영업일로 변화 후, 구간을 이동시키거나 주기를 변경하여 영업일 인덱스(workdays DatetimeIndex)를 반환"""
+    start, end = _workdays_range(date_range)
+    try:
+        target, i0, i1 = _offset_positions(start, end, last, freq)
+    except ValueError:
+        return None
 
-    base_workdays = workdays_offset(date, last, freq)
-    all_list = {'D': all_workdays, 'M': all_month_end_workdays,
-                'Q': all_quarter_end_workdays, 'Y': all_year_end_workdays}
-    all_days = all_list[freq]
+    all_days = {'D': calendar.all_workdays, 'M': calendar.all_month_end_workdays,
+                'Q': calendar.all_quarter_end_workdays, 'Y': calendar.all_year_end_workdays}
+    return all_days[target][i0[0]:i1[0]]
 
-    if freq == 'Q' and start_offset == '1Y':
-        start = all_days[all_days.get_loc(str(base_workdays[0].year - 1) + '-03')][0]
-    elif freq == 'Q' and start_offset == '2Y':
-        start = all_days[all_days.get_loc(str(base_workdays[0].year - 2) + '-03')][0]
-    else:
-        start = all_days[all_days.get_loc(base_workdays[0]) - int(start_offset)]
 
-    return [start.strftime('%Y%m%d'), base_workdays[-1].strftime('%Y%m%d')]
+def date_offset(date, last=True, freq='D', start_offset=0):
+    """구간을 전월말로 이동시키거나, 주기를 변경하거나, 시작일을 앞당긴 새로운 구간을 생성"""
+    start, end = _workdays_range(date)
+    start, end = date_offset_batch(start, end, last, freq, start_offset)
+    return [str(start[0]).replace('-', ''), str(end[0]).replace('-', '')]
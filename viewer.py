@@ -0,0 +1,315 @@
+import sys
+import collections
+import pandas as pd
+import numpy as np
+from PyQt5.QtWidgets import *
+from PyQt5.QtCore import Qt, QAbstractTableModel, QModelIndex
+import util as ut
+
+
+# 큰 테이블을 화면에 보이는 구간(쪽)만 읽어서 보여주는 테이블 뷰어
+#  - DbTools 테이블은 조건식(HDF where)과 정렬을 DB 쪽에서 처리하고, 쪽 단위로 필요한 행만 읽음
+#  - 최근에 본 쪽만 캐시에 남기므로 테이블 크기와 관계없이 메모리 사용량이 일정함
+
+class PagedSource:
+    """
+    쪽(page) 단위로 행을 읽어오는 데이터 원본의 공통 부분 (최근에 읽은 쪽 캐시, 조건식/정렬 상태)
+
+    Parameters
+    ----------
+    page_size : int
+        한 쪽의 행 수
+    max_pages : int
+        캐시에 남겨둘 최대 쪽 수
+    """
+
+    def __init__(self, page_size=500, max_pages=8):
+        self.page_size = page_size
+        self.max_pages = max_pages
+        self.query = None
+        self.sort = None
+        self.ascending = True
+        self.rows = 0
+        self.columns = []
+        self._pages = collections.OrderedDict()
+
+    def set_query(self, query):
+        """조건식을 바꾸고 행 수를 다시 구함 (잘못된 조건식이면 예외가 발생하며 이전 상태를 유지)"""
+        query = query.strip() if query else None
+        previous = self.query
+        self.query = query
+        try:
+            self.refresh()
+        except Exception:
+            self.query = previous
+            self.refresh()
+            raise
+
+    def set_sort(self, sort, ascending=True):
+        """정렬 기준 컬럼을 바꿈 (None이면 저장된 순서)"""
+        self.sort = sort
+        self.ascending = ascending
+        self.refresh()
+
+    def refresh(self):
+        """캐시를 비우고 현재 조건식/정렬로 행 수와 읽기 방식을 다시 정함 (원본 데이터가 바뀐 경우에도 호출)"""
+        self._pages.clear()
+        self._plan()
+
+    def page(self, n):
+        """n번째 쪽의 데이터프레임 (캐시에 없으면 원본에서 읽음)"""
+        if n in self._pages:
+            self._pages.move_to_end(n)
+            return self._pages[n]
+        start = n * self.page_size
+        data = self._fetch(start, min(start + self.page_size, self.rows))
+        self._pages[n] = data
+        while len(self._pages) > self.max_pages:
+            self._pages.popitem(last=False)
+        return data
+
+    def row(self, i):
+        return self.page(i // self.page_size), i % self.page_size
+
+    def _plan(self):
+        raise NotImplementedError
+
+    def _fetch(self, start, stop):
+        raise NotImplementedError
+
+
+class DbSource(PagedSource):
+    """
+    DbTools 테이블 원본. 조건식은 HDF where로, 정렬은 키 컬럼이면 CSI 인덱스로, 그 외에는
+    정렬 컬럼 하나만 읽어서 처리하고, 각 쪽은 해당 행 위치만 읽음
+
+    Examples
+    --------
+    >>> source = DbSource(raw, 'daily')
+    >>> source.set_query('base_dt >= "20210101" & sym_cd == "005930"')
+    >>> source.set_sort('base_dt', ascending=False)
+    >>> source.page(0)
+    """
+
+    def __init__(self, db, table, page_size=500, max_pages=8):
+        super().__init__(page_size, max_pages)
+        self.db = db
+        self.table = table
+        self._positions = None
+        self._by_index = False
+        self.columns = list(db.read(table, stop=0, cached=True).columns)
+        self.refresh()
+
+    def _plan(self):
+        self._positions = None
+        self._by_index = False
+        if not self.query and self.sort is None:
+            # 저장된 순서 그대로면 행 수는 메타데이터에서, 각 쪽은 start/stop으로 읽음
+            self.rows = self.db.meta(self.table)['nrows']
+        elif not self.query and self.db.index_positions(self.table, self.sort, 0, 0) is not None:
+            self.rows = self.db.meta(self.table)['nrows']
+            self._by_index = True
+        else:
+            self._positions = self.db.positions(self.table, self.query, self.sort, self.ascending)
+            self.rows = len(self._positions)
+
+    def _fetch(self, start, stop):
+        if self._by_index:
+            positions = self.db.index_positions(self.table, self.sort, start, stop, self.ascending)
+            return self.db.read_rows(self.table, positions)
+        if self._positions is not None:
+            return self.db.read_rows(self.table, self._positions[start:stop])
+        return self.db.read(self.table, start=start, stop=stop, cached=True)
+
+
+class FrameSource(PagedSource):
+    """
+    메모리에 있는 데이터프레임 원본 (스크래핑 결과 등). 조건식은 DataFrame.query 형식
+
+    Examples
+    --------
+    >>> source = FrameSource(holidays)
+    >>> source.set_query('h_day >= "2021-01-01"')
+    """
+
+    def __init__(self, data, page_size=500, max_pages=8):
+        super().__init__(page_size, max_pages)
+        self.data = data
+        self._view = data
+        self.columns = list(data.columns)
+        self.refresh()
+
+    def _plan(self):
+        view = self.data.query(self.query) if self.query else self.data
+        if self.sort is not None:
+            view = view.sort_values(self.sort, ascending=self.ascending, kind='stable',
+                                    na_position='last' if self.ascending else 'first')
+        self._view = view
+        self.rows = len(view)
+
+    def _fetch(self, start, stop):
+        return self._view.iloc[start:stop]
+
+
+class PagedTableModel(QAbstractTableModel):
+    """
+    PagedSource를 QTableView에 연결하는 모델. 화면에 그려지는 셀이 속한 쪽만 원본에서 읽고,
+    헤더 클릭 정렬(sort)과 조건식(set_query)은 원본에 넘겨서 처리함
+    """
+
+    def __init__(self, source, parent=None):
+        super().__init__(parent)
+        self.source = source
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else self.source.rows
+
+    def columnCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.source.columns)
+
+    def data(self, index, role=Qt.DisplayRole):
+        if not index.isValid() or role not in (Qt.DisplayRole, Qt.TextAlignmentRole):
+            return None
+        page, i = self.source.row(index.row())
+        value = page.iat[i, index.column()]
+        if role == Qt.TextAlignmentRole:
+            numeric = isinstance(value, (int, float, np.number)) and not isinstance(value, bool)
+            return int((Qt.AlignRight if numeric else Qt.AlignLeft) | Qt.AlignVCenter)
+        return '' if pd.isna(value) else str(value)
+
+    def headerData(self, section, orientation, role=Qt.DisplayRole):
+        if role != Qt.DisplayRole:
+            return None
+        if orientation == Qt.Horizontal:
+            return str(self.source.columns[section])
+        # 행 번호 대신 저장된 인덱스 값을 표시
+        page, i = self.source.row(section)
+        return str(page.index[i])
+
+    def sort(self, column, order=Qt.AscendingOrder):
+        self.beginResetModel()
+        try:
+            sort = self.source.columns[column] if column >= 0 else None
+            self.source.set_sort(sort, order == Qt.AscendingOrder)
+        finally:
+            self.endResetModel()
+
+    def set_query(self, query):
+        self.beginResetModel()
+        try:
+            self.source.set_query(query)
+        finally:
+            self.endResetModel()
+
+    def refresh(self):
+        self.beginResetModel()
+        try:
+            self.source.refresh()
+        finally:
+            self.endResetModel()
+
+
+class TableViewer(QDialog):
+    """
+    조건식 입력창, 테이블, 행 수 표시줄로 이루어진 뷰어 창.
+    헤더를 클릭하면 정렬(세 번째 클릭에서 정렬 해제), 조건식 입력 후 Enter를 누르면 필터링
+    """
+
+    def __init__(self, source, title='', parent=None):
+        super().__init__(parent)
+        self.setAttribute(Qt.WA_DeleteOnClose)
+        self.setWindowTitle(title)
+        self.resize(900, 600)
+        self.model = PagedTableModel(source, self)
+
+        self.qbox = QLineEdit(self)
+        self.qbox.setPlaceholderText('조건식 (ex. base_dt >= "20210101" & sym_cd == "005930")')
+        self.qbox.returnPressed.connect(self.apply_query)
+
+        self.table = QTableView(self)
+        self.table.setModel(self.model)
+        # 행 높이를 고정해야 행 수가 많아도 전체 행의 높이를 계산하지 않음
+        self.table.verticalHeader().setSectionResizeMode(QHeaderView.Fixed)
+        self.table.verticalHeader().setDefaultSectionSize(22)
+        header = self.table.horizontalHeader()
+        header.setSortIndicator(-1, Qt.AscendingOrder)
+        header.sortIndicatorChanged.connect(self.sort_changed)
+        header.setSectionsClickable(True)
+        header.setSortIndicatorShown(True)
+
+        self.status = QLabel(self)
+        layout = QVBoxLayout(self)
+        layout.addWidget(self.qbox)
+        layout.addWidget(self.table)
+        layout.addWidget(self.status)
+        self.update_status()
+
+    def apply_query(self):
+        try:
+            self.model.set_query(self.qbox.text())
+        except Exception as e:
+            self.update_status(f'조건식 오류: {e}')
+            return
+        self.update_status()
+
+    def sort_changed(self, column, order):
+        # 같은 컬럼을 내림차순 다음에 다시 누르면 정렬 해제
+        source = self.model.source
+        if column >= 0 and source.sort == source.columns[column] and not source.ascending \
+                and order == Qt.AscendingOrder:
+            header = self.table.horizontalHeader()
+            header.blockSignals(True)
+            header.setSortIndicator(-1, Qt.AscendingOrder)
+            header.blockSignals(False)
+            column = -1
+        self.model.sort(column, order)
+        self.update_status()
+
+    def update_status(self, message=None):
+        source = self.model.source
+        text = f'{source.rows:,}행'
+        if source.query:
+            text += f' | 조건: {source.query}'
+        if source.sort is not None:
+            text += f' | 정렬: {source.sort} {"오름차순" if source.ascending else "내림차순"}'
+        self.status.setText(text if message is None else f'{text} | {message}')
+
+
+def view(data, table=None, title=None, parent=None, page_size=500):
+    """
+    데이터프레임 또는 DbTools 테이블을 뷰어 창으로 띄움
+
+    Parameters
+    ----------
+    data : pd.DataFrame or DbTools
+        보여줄 데이터프레임, 또는 테이블을 읽어올 DbTools 객체
+    table : str, optional
+        data가 DbTools이면 테이블명
+    title : str, optional
+        창 제목 (기본값은 테이블명)
+    page_size : int
+        한 번에 읽어오는 행 수
+
+    Returns
+    -------
+    TableViewer (parent가 없으면 창이 닫히기 전에 참조가 사라지지 않도록 호출한 쪽에서 보관)
+
+    Examples
+    --------
+    >>> w = viewer.view(raw, 'daily')
+    >>> w2 = viewer.view(raw.read('holidays'), title='휴장일')
+    """
+    if isinstance(data, ut.DbTools):
+        source = DbSource(data, table, page_size)
+    else:
+        source = FrameSource(data, page_size)
+    w = TableViewer(source, title if title else (table or ''), parent)
+    w.show()
+    return w
+
+
+if __name__ == '__main__':
+    # python viewer.py inp_raw daily
+    app = QApplication(sys.argv)
+    w = view(ut.DbTools(sys.argv[1]), sys.argv[2])
+    sys.exit(app.exec())